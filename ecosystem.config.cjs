@@ -1,5 +1,16 @@
 ﻿module.exports = {
     apps: [
+        {
+            name: 'refresh-service',
+            script: 'scripts/refresh_service.py',
+            args: '--port 3060',
+            cwd: 'd:/claudecode/exchangeusduzs',
+            interpreter: 'python',
+            watch: false,
+            autorestart: true,
+            max_restarts: 10,
+            restart_delay: 1000
+        },
         {
             name: 'server-3050',
             script: 'server.js',
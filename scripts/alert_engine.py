@@ -0,0 +1,217 @@
+"""
+Price alert evaluation for the Telegram bot (``/alert USD > 12800``).
+
+Alerts are indexed per (currency, operator) in two sorted threshold arrays:
+
+    armed     - alerts that have not fired; every one of them is on the
+                unsatisfied side of the last evaluated rate
+    disarmed  - alerts that fired, keyed by the rate at which they re-arm
+
+When a new rate arrives the triggered alerts are exactly the armed ones
+between the previous rate and the new one: for ``>`` the prefix of the armed
+array below the new rate, for ``<`` the suffix above it. One bisect finds the
+boundary and the slice is moved to ``disarmed``, so an evaluation costs
+O(log n + k) for k triggered alerts instead of a scan over every user.
+
+Hysteresis: a fired ``USD > 12800`` alert re-arms only once the rate drops
+below 12800 * (1 - HYSTERESIS), so a rate wobbling around the threshold does
+not notify on every refresh. The same bisect-and-slice on the disarmed
+array finds the alerts to re-arm.
+
+De-duplication: identical alerts of one user (same currency, operator and
+value) are one entry, so they notify once; several alerts of one user that
+fire together are returned together.
+
+The engine keeps the alert dicts it was given and updates their ``armed``
+and ``triggered_at`` fields in place; persisting them is up to the caller.
+"""
+
+import bisect
+import heapq
+from datetime import datetime
+from operator import itemgetter
+
+HYSTERESIS = 0.002
+
+OPERATORS = (">", ">=", "<", "<=")
+ABOVE = (">", ">=")
+
+
+def alert_key(user_id, alert):
+    return (str(user_id), alert["currency"].upper(), alert["operator"], float(alert["value"]))
+
+
+class _SortedIndex:
+    """Thresholds in ascending order with the alert key stored alongside each."""
+
+    __slots__ = ("levels", "keys")
+
+    def __init__(self):
+        self.levels = []
+        self.keys = []
+
+    def __len__(self):
+        return len(self.levels)
+
+    def add(self, level, key):
+        i = bisect.bisect_right(self.levels, level)
+        self.levels.insert(i, level)
+        self.keys.insert(i, key)
+
+    def extend(self, pairs):
+        """Add many ``(level, key)`` pairs: one linear merge instead of an insert each."""
+        if len(pairs) < 16:
+            for level, key in pairs:
+                self.add(level, key)
+            return
+        pairs.sort(key=itemgetter(0))
+        merged = list(heapq.merge(zip(self.levels, self.keys), pairs, key=itemgetter(0)))
+        self.levels = [level for level, _ in merged]
+        self.keys = [key for _, key in merged]
+
+    def remove(self, level, key):
+        lo = bisect.bisect_left(self.levels, level)
+        hi = bisect.bisect_right(self.levels, level)
+        for i in range(lo, hi):
+            if self.keys[i] == key:
+                del self.levels[i]
+                del self.keys[i]
+                return True
+        return False
+
+    def pop_below(self, rate, inclusive):
+        """Remove and return the keys with level < rate (<= if ``inclusive``)."""
+        i = (bisect.bisect_right if inclusive else bisect.bisect_left)(self.levels, rate)
+        taken = self.keys[:i]
+        del self.levels[:i], self.keys[:i]
+        return taken
+
+    def pop_above(self, rate, inclusive):
+        """Remove and return the keys with level > rate (>= if ``inclusive``)."""
+        i = (bisect.bisect_left if inclusive else bisect.bisect_right)(self.levels, rate)
+        taken = self.keys[i:]
+        del self.levels[i:], self.keys[i:]
+        return taken
+
+
+class AlertEngine:
+    def __init__(self, hysteresis=HYSTERESIS):
+        self.hysteresis = hysteresis
+        self.alerts = {}    # key -> alert dict
+        self._armed = {}    # (currency, operator) -> _SortedIndex of thresholds
+        self._disarmed = {}  # (currency, operator) -> _SortedIndex of re-arm levels
+        self.rearmed = []   # keys re-armed by the last evaluate()
+
+    @classmethod
+    def from_alerts(cls, alerts, **kwargs):
+        """Index ``[(user_id, alert), ...]``, sorting each array once."""
+        engine = cls(**kwargs)
+        pending = {}
+        for user_id, alert in alerts:
+            key = engine._register(user_id, alert)
+            if key is not None:
+                pending.setdefault((alert.get("armed", True), key[1:3]), []).append(key)
+        for (armed, slot), keys in pending.items():
+            if armed:
+                engine._index(engine._armed, slot).extend([(key[3], key) for key in keys])
+            else:
+                engine._index(engine._disarmed, slot).extend(
+                    [(engine._rearm_level(engine.alerts[key]), key) for key in keys])
+        return engine
+
+    def __len__(self):
+        return len(self.alerts)
+
+    def _rearm_level(self, alert):
+        if alert["operator"] in ABOVE:
+            return alert["value"] * (1 - self.hysteresis)
+        return alert["value"] * (1 + self.hysteresis)
+
+    def _index(self, table, slot):
+        index = table.get(slot)
+        if index is None:
+            index = table[slot] = _SortedIndex()
+        return index
+
+    def _register(self, user_id, alert):
+        if alert["operator"] not in OPERATORS:
+            raise ValueError(f"unknown operator {alert['operator']!r}")
+        key = alert_key(user_id, alert)
+        if key in self.alerts:
+            return None
+        self.alerts[key] = alert
+        return key
+
+    def add(self, user_id, alert):
+        """Index ``alert``; returns False if the user already has an identical one."""
+        key = self._register(user_id, alert)
+        if key is None:
+            return False
+        if alert.get("armed", True):
+            self._index(self._armed, key[1:3]).add(key[3], key)
+        else:
+            self._index(self._disarmed, key[1:3]).add(self._rearm_level(alert), key)
+        return True
+
+    def remove(self, user_id, alert):
+        key = alert_key(user_id, alert)
+        stored = self.alerts.pop(key, None)
+        if stored is None:
+            return False
+        if not self._index(self._armed, key[1:3]).remove(key[3], key):
+            self._index(self._disarmed, key[1:3]).remove(self._rearm_level(stored), key)
+        return True
+
+    def evaluate(self, rates, now=None):
+        """Apply new ``{currency: rate}`` values.
+
+        Returns ``{user_id: [(alert, rate), ...]}`` for the alerts that fired.
+        Fired alerts are disarmed; alerts whose re-arm level was crossed are
+        armed again (without firing in this call) and listed in ``rearmed``.
+        """
+        stamp = (now or datetime.now()).strftime("%Y-%m-%d %H:%M")
+        fired = {}
+        self.rearmed = []
+        for currency, rate in rates.items():
+            if rate is None:
+                continue
+            currency = currency.upper()
+            for operator in OPERATORS:
+                slot = (currency, operator)
+                disarmed = self._disarmed.get(slot)
+                if disarmed:
+                    if operator in ABOVE:
+                        rearmed = disarmed.pop_above(rate, inclusive=False)
+                    else:
+                        rearmed = disarmed.pop_below(rate, inclusive=False)
+                else:
+                    rearmed = []
+
+                armed = self._armed.get(slot)
+                if armed:
+                    if operator == ">":
+                        triggered = armed.pop_below(rate, inclusive=False)
+                    elif operator == ">=":
+                        triggered = armed.pop_below(rate, inclusive=True)
+                    elif operator == "<":
+                        triggered = armed.pop_above(rate, inclusive=False)
+                    else:
+                        triggered = armed.pop_above(rate, inclusive=True)
+                else:
+                    triggered = []
+
+                if triggered:
+                    for key in triggered:
+                        alert = self.alerts[key]
+                        alert["armed"] = False
+                        alert["triggered_at"] = stamp
+                        alert["triggered_rate"] = rate
+                        fired.setdefault(key[0], []).append((alert, rate))
+                    self._index(self._disarmed, slot).extend(
+                        [(self._rearm_level(self.alerts[key]), key) for key in triggered])
+                if rearmed:
+                    for key in rearmed:
+                        self.alerts[key]["armed"] = True
+                    self._index(self._armed, slot).extend([(key[3], key) for key in rearmed])
+                    self.rearmed += rearmed
+        return fired
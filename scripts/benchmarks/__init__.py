@@ -0,0 +1,18 @@
+"""
+Benchmarks for the scraper, merge and rate card code paths.
+
+Run from the ``scripts`` directory:
+
+    python -m benchmarks                      # all cases
+    python -m benchmarks parse_savings_html   # selected cases
+    python -m benchmarks --save-baseline      # also keep the result as the baseline
+    python -m benchmarks --compare            # diff against the saved baseline
+
+``fixtures/`` is a replay directory (see replay.py) holding one snapshot of
+every page the scraper fetches, plus ``rates.json`` for the merge and
+serialization cases. Refresh it with
+``scraper.py --scope all --force --record benchmarks/fixtures``.
+
+``python -m benchmarks.scale`` measures the parsers and news dedup on
+synthetic pages (``benchmarks.synth``) at several multiples of today's volume.
+"""
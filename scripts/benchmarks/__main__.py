@@ -0,0 +1,59 @@
+import argparse
+import os
+import sys
+
+from benchmarks.cases import CASES
+from benchmarks.harness import MIN_TIME, compare, load_results, measure, write_results
+
+RESULTS_DIR = os.path.join("metrics", "benchmarks")
+LATEST = os.path.join(RESULTS_DIR, "latest.json")
+BASELINE = os.path.join(RESULTS_DIR, "baseline.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Run the NeoUZS benchmarks")
+    parser.add_argument("cases", nargs="*", help=f"Cases to run (default: all of {', '.join(CASES)})")
+    parser.add_argument("--output", default=LATEST, help="Where to write the results JSON")
+    parser.add_argument("--min-time", type=float, default=MIN_TIME, help="Seconds to sample each case for")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Also write the results to {BASELINE}")
+    parser.add_argument("--compare", nargs="?", const=BASELINE, metavar="BASELINE",
+                        help=f"Compare against a results file (default {BASELINE})")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Median slowdown in percent reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit 1 if any case regressed")
+    parser.add_argument("--list", action="store_true", help="List the cases and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        print("\n".join(CASES))
+        return
+    unknown = [c for c in args.cases if c not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+
+    results = {}
+    for name in args.cases or CASES:
+        fn = CASES[name]()
+        if fn is None:
+            print(f"{name:<32} skipped (dependency not installed)")
+            continue
+        stats = measure(fn, min_time=args.min_time)
+        results[name] = stats
+        print(f"{name:<32} median {stats['median_ms']:>9.3f} ms   p95 {stats['p95_ms']:>9.3f} ms   "
+              f"peak alloc {stats['alloc_peak_kib']:>9.1f} KiB   ({stats['samples']} samples)")
+
+    write_results(args.output, results)
+    print(f"Results written to {args.output}")
+    if args.save_baseline:
+        write_results(BASELINE, results)
+        print(f"Baseline written to {BASELINE}")
+
+    if args.compare:
+        print()
+        regressions = compare(results, load_results(args.compare), args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
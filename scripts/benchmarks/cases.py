@@ -0,0 +1,216 @@
+"""
+Benchmark cases. Each case's setup runs once, untimed, and returns the
+callable that is measured (or ``None`` to skip the case, e.g. when an
+optional dependency is missing).
+"""
+
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+import merge_rates
+import replay
+import scraper
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+CASES = {}
+
+
+def case(name):
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+def fixture_page(url):
+    content = replay.load(FIXTURES, url)
+    if content is None:
+        raise FileNotFoundError(f"No fixture recorded for {url}")
+    return content
+
+
+def fixture_rates():
+    with open(os.path.join(FIXTURES, "rates.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@case("parse_bank_uz_content")
+def _parse_bank_uz_content():
+    config = scraper.CURRENCY_CONFIG["USD"]
+    content = fixture_page(config["bank_uz_url"])
+    cbu_rate = fixture_rates()["usd"]["cbu"]
+    return lambda: scraper.parse_bank_uz_content(content, "USD", cbu_rate, config)
+
+
+@case("parse_savings_html")
+def _parse_savings_html():
+    content = fixture_page(scraper.SAVINGS_URL)
+    return lambda: scraper.parse_savings_html(content)
+
+
+@case("parse_usd_savings_html")
+def _parse_usd_savings_html():
+    content = fixture_page(scraper.USD_SAVINGS_URL)
+    return lambda: scraper.parse_usd_savings_html(content)
+
+
+@case("news_pipeline")
+def _news_pipeline():
+    # Five RSS feeds plus the CBU, IMF and World Bank pages through the
+    # fetch -> parse pipeline, served from the fixtures; WorldNewsAPI off.
+    os.environ.pop("WORLDNEWS_API_KEY", None)
+    replay.configure(replay=FIXTURES)
+    loop = asyncio.new_event_loop()
+    return lambda: loop.run_until_complete(scraper.async_fetch_news(None, {}, force=True))
+
+
+@case("process_bank_reliability")
+def _process_bank_reliability():
+    return lambda: scraper.process_bank_reliability({}, force=True)
+
+
+@case("merge_rates")
+def _merge_rates():
+    rates = fixture_rates()
+    workdir = tempfile.mkdtemp(prefix="bench-merge-")
+    base = os.path.join(workdir, "rates.json")
+    shutil.copy(os.path.join(FIXTURES, "rates.json"), base)
+
+    inputs = []
+    for scope, keys in (("exchange", ("usd", "rub", "eur", "kzt", "gbp", "weather", "gold_bars")),
+                        ("news", ("news",)), ("savings", ("savings", "savings_usd")),
+                        ("reliability", ("bank_reliability",))):
+        path = os.path.join(workdir, f"{scope}.json")
+        with open(path, "w") as f:
+            json.dump({k: rates.get(k) for k in keys}, f, indent=2)
+        inputs.append(path)
+
+    argv = ["merge_rates.py", "--base", base, "--inputs", *inputs]
+
+    def run():
+        saved, sys.argv = sys.argv, argv
+        try:
+            merge_rates.main()
+        finally:
+            sys.argv = saved
+    return run
+
+
+@case("json_dump_rates")
+def _json_dump_rates():
+    rates = fixture_rates()
+    # What save_output writes.
+    return lambda: json.dumps(rates, indent=2)
+
+
+@case("json_dump_rates_compact")
+def _json_dump_rates_compact():
+    rates = fixture_rates()
+    # What the read API serves.
+    return lambda: json.dumps(rates, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+@case("generate_rate_card")
+def _generate_rate_card():
+    try:
+        from rate_card_generator import generate_rate_card
+    except ImportError:
+        return None
+    usd = fixture_rates()["usd"]
+
+    def run():
+        random.seed(0)
+        return generate_rate_card(currency="USD", rate=usd["cbu"], change=12.5,
+                                  best_buy=max(b["buy"] for b in usd["banks"]),
+                                  best_sell=min(b["sell"] for b in usd["banks"]))
+    return run
+
+
+@case("encode_rate_card")
+def _encode_rate_card():
+    try:
+        from card_cache import CARD_ENCODING
+        from rate_card_generator import encode_card, render_card_image
+    except ImportError:
+        return None
+    usd = fixture_rates()["usd"]
+    random.seed(0)
+    card = render_card_image(currency="USD", rate=usd["cbu"], change=12.5,
+                             best_buy=max(b["buy"] for b in usd["banks"]),
+                             best_sell=min(b["sell"] for b in usd["banks"]))
+    # The encoding the bot uploads.
+    return lambda: encode_card(card, **CARD_ENCODING)
+
+
+# How far the rate card glow drawn from one blurred mask may drift from the
+# multi-pass glow it replaced, per channel out of 255.
+GLOW_MAX_DIFF = 24
+GLOW_MEAN_DIFF = 0.5
+
+
+def _multipass_glow_text(img, draw, text, position, font, color, glow_color=None, glow_radius=5):
+    """rate_card_generator.draw_glow_text as it was before the single-mask glow."""
+    from PIL import Image, ImageDraw, ImageFilter
+
+    if glow_color is None:
+        glow_color = color
+    x, y = position
+    glow_layer = Image.new('RGBA', img.size, (0, 0, 0, 0))
+    glow_draw = ImageDraw.Draw(glow_layer)
+    for offset in range(glow_radius, 0, -1):
+        alpha = int(100 / offset)
+        glow_col = (*glow_color[:3], alpha)
+        for dx in range(-offset, offset + 1):
+            for dy in range(-offset, offset + 1):
+                if dx * dx + dy * dy <= offset * offset:
+                    glow_draw.text((x + dx, y + dy), text, font=font, fill=glow_col)
+    glow_layer = glow_layer.filter(ImageFilter.GaussianBlur(radius=glow_radius))
+    img.paste(glow_layer, (0, 0), glow_layer)
+    draw.text(position, text, font=font, fill=color)
+
+
+@case("rate_card_glow_diff")
+def _rate_card_glow_diff():
+    """Render every fixture currency's card and diff it against the multi-pass glow.
+
+    The slow reference renders happen once in setup; every run fails with
+    AssertionError if a card is further from them than GLOW_MAX_DIFF /
+    GLOW_MEAN_DIFF.
+    """
+    try:
+        from PIL import ImageChops, ImageStat
+        import rate_card_generator
+    except ImportError:
+        return None
+    rates = fixture_rates()
+    cards = []
+    for code in rate_card_generator.CURRENCY_INFO:
+        block = rates.get(code.lower())
+        if not block or not block.get("banks"):
+            continue
+        cards.append({"currency": code, "rate": block["cbu"], "change": -3.2,
+                      "best_buy": max(b["buy"] for b in block["banks"]),
+                      "best_sell": min(b["sell"] for b in block["banks"]),
+                      "fact_index": 3, "updated": "2026-01-01 10:00 GMT+5"})
+
+    current = rate_card_generator.draw_glow_text
+    rate_card_generator.draw_glow_text = _multipass_glow_text
+    try:
+        references = [rate_card_generator.render_card_image(**inputs).convert("RGB") for inputs in cards]
+    finally:
+        rate_card_generator.draw_glow_text = current
+
+    def run():
+        for inputs, reference in zip(cards, references):
+            diff = ImageChops.difference(rate_card_generator.render_card_image(**inputs).convert("RGB"), reference)
+            worst = max(high for _, high in diff.getextrema())
+            mean = sum(ImageStat.Stat(diff).mean) / 3
+            assert worst <= GLOW_MAX_DIFF and mean <= GLOW_MEAN_DIFF, (
+                f"{inputs['currency']} card differs from the multi-pass glow: max {worst}, mean {mean:.2f}")
+    return run
@@ -0,0 +1,128 @@
+"""Timing and allocation measurement, result files and baseline comparison."""
+
+import contextlib
+import datetime
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+MIN_SAMPLES = 5
+MAX_SAMPLES = 50
+MIN_TIME = 1.0
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def measure(fn, min_samples=MIN_SAMPLES, max_samples=MAX_SAMPLES, min_time=MIN_TIME, warmup=1):
+    """Time ``fn()`` until ``min_time`` has passed (within the sample bounds).
+
+    A garbage collection runs before every sample so one sample's cycles are
+    not charged to the next. Allocations come from one extra run under
+    tracemalloc: the peak and the net growth of traced memory during the call.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(warmup):
+            fn()
+
+        times = []
+        started = time.perf_counter()
+        while len(times) < max_samples and (len(times) < min_samples or time.perf_counter() - started < min_time):
+            gc.collect()
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+
+        gc.collect()
+        tracemalloc.start()
+        base, _ = tracemalloc.get_traced_memory()
+        fn()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    times.sort()
+    ms = [t * 1000 for t in times]
+    return {
+        "samples": len(ms),
+        "median_ms": round(statistics.median(ms), 4),
+        "p95_ms": round(percentile(ms, 95), 4),
+        "mean_ms": round(statistics.fmean(ms), 4),
+        "min_ms": round(ms[0], 4),
+        "stdev_ms": round(statistics.stdev(ms), 4) if len(ms) > 1 else 0.0,
+        "alloc_peak_kib": round((peak - base) / 1024, 1),
+        "alloc_retained_kib": round((current - base) / 1024, 1),
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def metadata():
+    return {
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def write_results(path, results):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"meta": metadata(), "results": results}, f, indent=2)
+
+
+def load_results(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def _delta(new, old):
+    if not old:
+        return None
+    return (new - old) / old * 100
+
+
+def compare(results, baseline, threshold=10.0):
+    """Print a comparison table; return the names of cases whose median regressed."""
+    regressions = []
+    print(f"{'case':<32} {'base ms':>10} {'now ms':>10} {'median':>8} {'p95':>8} {'alloc':>8}")
+    for name, now in results.items():
+        old = baseline.get(name)
+        if not old:
+            print(f"{name:<32} {'-':>10} {now['median_ms']:>10.3f}   (new)")
+            continue
+        d_median = _delta(now["median_ms"], old["median_ms"])
+        d_p95 = _delta(now["p95_ms"], old["p95_ms"])
+        d_alloc = _delta(now["alloc_peak_kib"], old["alloc_peak_kib"])
+        flag = ""
+        if d_median is not None and d_median > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif d_median is not None and d_median < -threshold:
+            flag = "  faster"
+        print(f"{name:<32} {old['median_ms']:>10.3f} {now['median_ms']:>10.3f} "
+              f"{_fmt(d_median):>8} {_fmt(d_p95):>8} {_fmt(d_alloc):>8}{flag}")
+    return regressions
+
+
+def _fmt(pct):
+    return "n/a" if pct is None else f"{pct:+.1f}%"
@@ -0,0 +1,217 @@
+"""
+Scaling curves: time and allocations of each parser, of news dedup and of
+the whole news pipeline as the input grows.
+
+    cd scripts
+    python -m benchmarks.scale                         # factors 1 3 10 30
+    python -m benchmarks.scale --factors 1 10 100 --min-time 0.5 parse_rss_feed merge_news
+
+For every factor, synth.py writes a replay directory with that many times
+today's volume and each case is measured against it with harness.measure.
+Results go to ``metrics/benchmarks/scale.json`` and ``scale.csv`` (one row
+per case and factor, ready to plot ms against n). The printed table shows
+``ms/n``, the cost per bank / card / entry, relative to the smallest factor:
+a flat 1.0x is linear, anything growing with n is superlinear.
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+import random
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+import replay
+import scraper
+from benchmarks import synth
+from benchmarks.harness import measure, write_results
+from models import NewsItem
+
+DEFAULT_FACTORS = [1, 3, 10, 30]
+OUTPUT = os.path.join("metrics", "benchmarks", "scale.json")
+
+# Share of official / WorldNewsAPI titles that repeat an RSS title.
+DUPLICATE_SHARE = 0.25
+
+SCALE_CASES = {}
+
+
+def scale_case(name):
+    def register(setup):
+        SCALE_CASES[name] = setup
+        return setup
+    return register
+
+
+@contextmanager
+def rss_entries(n):
+    """Let parse_rss_feed read ``n`` entries per feed instead of RSS_ENTRIES_PER_FEED."""
+    saved, scraper.RSS_ENTRIES_PER_FEED = scraper.RSS_ENTRIES_PER_FEED, n
+    try:
+        yield
+    finally:
+        scraper.RSS_ENTRIES_PER_FEED = saved
+
+
+def page(directory, url):
+    content = replay.load(directory, url)
+    if content is None:
+        raise FileNotFoundError(f"{url} was not generated in {directory}")
+    return content
+
+
+# Each setup gets the replay directory and the counts it was generated with
+# and returns (n, bytes, fn): the input size the case scales with, the bytes
+# it parses and the callable to measure.
+
+@scale_case("parse_bank_uz_content")
+def _parse_bank_uz_content(directory, counts):
+    config = scraper.CURRENCY_CONFIG["USD"]
+    content = page(directory, config["bank_uz_url"])
+    return counts["banks"], len(content), lambda: scraper.parse_bank_uz_content(
+        content, "USD", config["fallback_rate"], config)
+
+
+@scale_case("parse_savings_html")
+def _parse_savings_html(directory, counts):
+    content = page(directory, scraper.SAVINGS_URL)
+    return counts["deposit_cards"], len(content), lambda: scraper.parse_savings_html(content)
+
+
+@scale_case("parse_usd_savings_html")
+def _parse_usd_savings_html(directory, counts):
+    content = page(directory, scraper.USD_SAVINGS_URL)
+    return counts["usd_cards_per_page"], len(content), lambda: scraper.parse_usd_savings_html(content)
+
+
+@scale_case("parse_rss_feed")
+def _parse_rss_feed(directory, counts):
+    source = scraper.NEWS_SOURCES[0]
+    content = page(directory, source["rss"])
+
+    def run():
+        with rss_entries(counts["rss_entries"]):
+            return scraper.parse_rss_feed(content, source)
+    return counts["rss_entries"], len(content), run
+
+
+@scale_case("parse_cbu_news_html")
+def _parse_cbu_news_html(directory, counts):
+    content = page(directory, scraper.CBU_NEWS_URL)
+    return counts["official_links"], len(content), lambda: scraper.parse_cbu_news_html(content)
+
+
+def news_item(i, title, source):
+    return NewsItem(
+        id=f"{source}-{i}", title=title, summary=title, full_content="", source=source,
+        source_url=f"https://example.uz/{source}/{i}", category="General", language="EN",
+        published_at="", published_ts=float(i), image_url=None, is_breaking=False,
+        reliability_tier="", reliability_score=0, reliability_label=None)
+
+
+@scale_case("merge_news")
+def _merge_news(directory, counts):
+    # Today: 5 feeds of RSS items, then WorldNewsAPI and the three official
+    # sources merged in with title dedup. A share of each extra list repeats
+    # an RSS title.
+    rng = random.Random(0)
+    rss = [news_item(i, f"{synth.sentence(rng, 8)} {i}", "rss")
+           for i in range(len(scraper.NEWS_SOURCES) * counts["rss_entries"])]
+    extras = []
+    for source in ("worldnews", "cbu", "imf", "wb"):
+        extra = []
+        for i in range(counts["official_links"]):
+            if rng.random() < DUPLICATE_SHARE:
+                title = rng.choice(rss).title
+            else:
+                title = f"{synth.sentence(rng, 9)} {source} {i}"
+            extra.append(news_item(i, title, source))
+        extras.append(extra)
+    n = len(rss) + sum(len(e) for e in extras)
+    return n, 0, lambda: scraper.merge_news(rss, extras)
+
+
+@scale_case("news_pipeline")
+def _news_pipeline(directory, counts):
+    os.environ.pop("WORLDNEWS_API_KEY", None)
+    loop = asyncio.new_event_loop()
+    size = sum(len(page(directory, s["rss"])) for s in scraper.NEWS_SOURCES)
+
+    def run():
+        replay.configure(replay=directory)
+        with rss_entries(counts["rss_entries"]):
+            return loop.run_until_complete(scraper.async_fetch_news(None, {}, force=True))
+    n = len(scraper.NEWS_SOURCES) * counts["rss_entries"] + 3 * counts["official_links"]
+    return n, size, run
+
+
+def print_table(rows):
+    print(f"{'case':<26} {'factor':>7} {'n':>7} {'KiB':>9} {'median ms':>11} {'p95 ms':>10} "
+          f"{'peak KiB':>10} {'ms/n':>9}")
+    first = {}
+    for r in rows:
+        per_n = r["median_ms"] / r["n"]
+        base = first.setdefault(r["case"], per_n)
+        print(f"{r['case']:<26} {r['factor']:>7g} {r['n']:>7} {r['bytes'] / 1024:>9.0f} "
+              f"{r['median_ms']:>11.3f} {r['p95_ms']:>10.3f} {r['alloc_peak_kib']:>10.1f} "
+              f"{per_n / base if base else 0:>8.2f}x")
+
+
+def write_csv(path, rows):
+    fields = ["case", "factor", "n", "bytes", "median_ms", "p95_ms", "mean_ms", "min_ms",
+              "stdev_ms", "samples", "alloc_peak_kib", "alloc_retained_kib"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.scale",
+                                     description="Measure how parsers and news dedup scale with input size")
+    parser.add_argument("cases", nargs="*", help=f"Cases to run (default: all of {', '.join(SCALE_CASES)})")
+    parser.add_argument("--factors", type=float, nargs="+", default=DEFAULT_FACTORS,
+                        help="Volume multipliers, see benchmarks.synth")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds to sample each point for")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=OUTPUT, help="Results JSON; the CSV goes next to it")
+    parser.add_argument("--keep", metavar="DIR", help="Keep the generated replay directories under DIR")
+    args = parser.parse_args()
+
+    unknown = [c for c in args.cases if c not in SCALE_CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+
+    rows = []
+    for factor in sorted(args.factors):
+        counts = synth.volume(factor)
+        if args.keep:
+            directory = os.path.join(args.keep, f"x{factor:g}")
+        else:
+            directory = tempfile.mkdtemp(prefix=f"scale-x{factor:g}-")
+        try:
+            synth.generate(directory, args.seed, **counts)
+            for name in args.cases or SCALE_CASES:
+                n, size, fn = SCALE_CASES[name](directory, counts)
+                stats = measure(fn, min_samples=3, min_time=args.min_time)
+                rows.append({"case": name, "factor": factor, "n": n, "bytes": size, **stats})
+                print(f"x{factor:<6g} {name:<26} n={n:<6} median {stats['median_ms']:>10.3f} ms")
+        finally:
+            replay.configure()
+            if not args.keep:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    print()
+    rows.sort(key=lambda r: (r["case"], r["factor"]))
+    print_table(rows)
+
+    write_results(args.output, rows)
+    csv_path = os.path.splitext(args.output)[0] + ".csv"
+    write_csv(csv_path, rows)
+    print(f"\nResults written to {args.output} and {csv_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Synthetic bank.uz pages, deposit listings, RSS feeds and official news pages
+in the markup the scraper parses, at any volume.
+
+    python -m benchmarks.synth recordings/x10 --factor 10
+    python scraper.py --scope all --force --replay recordings/x10 --output /tmp/x10.json
+
+``--factor`` multiplies today's volume (``BASE_VOLUME``: about 30 banks per
+currency, 40 UZS deposits, 5 USD deposit pages of 20 cards, 10 entries per
+RSS feed, 15 links per official news page). The individual counts can be
+overridden. Output is a replay directory (see replay.py), so the scraper,
+the profiler and ``benchmarks.scale`` read it exactly like recorded traffic.
+A fixed ``--seed`` gives byte-identical pages.
+"""
+
+import argparse
+import datetime
+import email.utils
+import html
+import json
+import random
+
+import replay
+import scraper
+from bank_mapping import BANK_DOMAINS, BANK_LOGOS
+
+BASE_VOLUME = {
+    "banks": 30,
+    "deposit_cards": 40,
+    "usd_pages": scraper.USD_SAVINGS_PAGES,
+    "usd_cards_per_page": 20,
+    "rss_entries": 10,
+    "official_links": 15,
+}
+
+# Published timestamps count back from here, so output does not depend on today.
+EPOCH = datetime.datetime(2025, 12, 1, 12, 0, tzinfo=datetime.timezone.utc)
+
+BANK_NAMES = list(dict.fromkeys([*BANK_LOGOS, *BANK_DOMAINS]))
+
+WORDS = ("markaziy", "bank", "kurs", "inflyatsiya", "eksport", "investitsiya", "soliq", "islohot",
+         "budjet", "kredit", "omonat", "ipoteka", "birja", "oltin", "neft", "savdo", "kompaniya",
+         "startap", "prezident", "qaror", "litsenziya", "iqtisodiyot", "o‘sish", "dollar")
+
+esc = html.escape
+
+
+def volume(factor=1, **overrides):
+    """BASE_VOLUME scaled by ``factor``, with explicit counts taking precedence."""
+    counts = {k: max(1, round(v * factor)) for k, v in BASE_VOLUME.items()}
+    counts["usd_pages"] = overrides.get("usd_pages") or BASE_VOLUME["usd_pages"]
+    counts.update({k: v for k, v in overrides.items() if v})
+    return counts
+
+
+def bank_name(i):
+    name = BANK_NAMES[i % len(BANK_NAMES)]
+    return name if i < len(BANK_NAMES) else f"{name} {i // len(BANK_NAMES) + 1}"
+
+
+def sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def page_chrome(body, title):
+    """Wrap ``body`` in a bank.uz-sized header, menu, inline state and footer."""
+    nav = "".join(f'<li class="menu-item"><a href="/uz/section-{i}/">Bo‘lim {i}</a></li>' for i in range(160))
+    foot = "".join(f'<a class="footer-link" href="/uz/page-{i}/">Sahifa {i}</a>' for i in range(80))
+    state = "<script>window.__DATA__=" + json.dumps({"k": ["x" * 40] * 200}) + ";</script>"
+    return (f'<!DOCTYPE html><html lang="uz"><head><meta charset="utf-8"><title>{esc(title)}</title>'
+            f'<link rel="stylesheet" href="/local/templates/main/style.css">{state}</head><body>'
+            f'<header class="header"><ul class="menu">{nav}</ul></header><main class="content">{body}</main>'
+            f'<footer class="footer">{foot}</footer></body></html>')
+
+
+def _rate_rows(quotes):
+    return "".join(
+        f'<div class="bc-inner-block-left-texts"><img src="/upload/logo{i}.png" alt="">'
+        f'<a href="/uz/banks/{i}/">{esc(name)}</a>'
+        f'<span class="green-date">{format(rate, ",.2f").replace(",", " ")} so\'m</span></div>'
+        for i, (name, rate) in enumerate(quotes))
+
+
+def currency_page(rng, cbu_rate, banks):
+    """A bank.uz currency page: an unrelated tab first, then ``banks`` buy/sell quotes around ``cbu_rate``."""
+    tabs = ""
+    for ref in (cbu_rate * 1.9, cbu_rate):
+        buys, sells = [], []
+        for i in range(banks):
+            spread = ref * rng.uniform(0.002, 0.01)
+            mid = ref * rng.uniform(0.995, 1.01)
+            buys.append((bank_name(i), round(mid - spread, 2)))
+            sells.append((bank_name(i), round(mid + spread, 2)))
+        tabs += (f'<div class="bc-inner-block"><div class="bc-inner-block-left">{_rate_rows(buys)}</div>'
+                 f'<div class="bc-inner-blocks-right">{_rate_rows(sells)}</div></div>')
+    return page_chrome(tabs, "Valyuta kurslari")
+
+
+def deposit_card(rng, i, usd=False):
+    rate = round(rng.uniform(1.5, 8) if usd else rng.uniform(14, 25), 1)
+    name = f"{rng.choice(['Omonat', 'Jamg‘arma', 'Onlayn omonat', 'Premium', 'Kelajak'])} {i}" + (" USD" if usd else "")
+    amount = f"{rng.choice([100, 500, 1000])} $" if usd else f"{rng.choice([100, 500, 1000])} 000 so'mdan"
+    online = '<span class="online_btn">Onlayn</span>' if rng.random() < 0.5 else "<span>Bankda</span>"
+    return (f'<div class="table-card-offers-bottom"><div class="table-card-offers-block1">'
+            f'<img src="/upload/bank.png"><span class="medium-text">{esc(bank_name(i))}</span>'
+            f'<div class="table-card-offers-block1-text"><a href="/uz/deposits/{i}/">{esc(name)}</a></div></div>'
+            f'<div class="table-card-offers-blocks-all">'
+            f'<div class="table-card-offers-block2"><span class="small-text">Stavka</span><span class="medium-text">{rate}%</span></div>'
+            f'<div class="table-card-offers-block3"><span class="small-text">Muddat</span>'
+            f'<span class="medium-text">{rng.choice(["6 oy", "12 oy", "13 oy", "1.5 yil", "24 oy"])}</span></div>'
+            f'<div class="table-card-offers-block4"><span class="small-text">Summa</span><span class="medium-text">{esc(amount)}</span></div>'
+            f'<div class="table-card-offers-block5">{online}</div></div></div>')
+
+
+def deposit_page(rng, cards, usd=False, first=0):
+    return page_chrome("".join(deposit_card(rng, first + i, usd) for i in range(cards)), "Omonatlar")
+
+
+def rss_feed(rng, source, entries, titles=None):
+    """An RSS 2.0 feed with ``entries`` items; ``titles`` optionally fixes the item titles."""
+    host = source["rss"].split("/")[2]
+    items = ""
+    for i in range(entries):
+        title = titles[i] if titles else sentence(rng, 8)
+        published = email.utils.format_datetime(EPOCH - datetime.timedelta(minutes=37 * i))
+        paragraphs = "".join(f"<p>{esc(sentence(rng, 30))}.</p>" for _ in range(rng.randint(3, 8)))
+        items += (f'<item><title>{esc(title)}</title><link>https://{host}/news/{i}/</link>'
+                  f'<pubDate>{published}</pubDate>'
+                  f'<description><![CDATA[<img src="https://{host}/img/{i}.jpg"><p>{esc(sentence(rng, 25))}</p>]]></description>'
+                  f'<content:encoded><![CDATA[{paragraphs}]]></content:encoded></item>')
+    return (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0" '
+            f'xmlns:content="http://purl.org/rss/1.0/modules/content/"><channel><title>{esc(source["name"])}</title>'
+            f'<link>{esc(source["rss"])}</link>{items}</channel></rss>')
+
+
+def official_news_page(rng, kind, links, titles=None):
+    """A CBU, IMF or World Bank news listing with ``links`` dated article links."""
+    body = ""
+    for i in range(links):
+        title = titles[i] if titles else sentence(rng, 9)
+        dt = EPOCH - datetime.timedelta(days=i)
+        if kind == "cbu":
+            href = f"/en/press_center/news/{dt.year}/{i}/"
+            date = f' <span class="date">{dt.day} {dt.strftime("%b")} {dt.year}</span>'
+        elif kind == "imf":
+            href, date = f"/en/News/Articles/{dt:%Y/%m/%d}/pr-{i}", ""
+        else:
+            href, date = f"/en/news/press-release/{dt:%Y/%m/%d}/item-{i}", ""
+        body += f'<div class="news-item"><a href="{href}">{esc(title)}</a>{date}</div>'
+    return page_chrome(body, kind.upper())
+
+
+def generate(directory, seed=0, **counts):
+    """Write one synthetic copy of every page the scraper fetches into ``directory``.
+
+    ``counts`` are the keys of BASE_VOLUME. Returns ``{url: bytes}`` sizes.
+    """
+    rng = random.Random(seed)
+    counts = {**BASE_VOLUME, **counts}
+    pages = {}
+
+    cbu = {code: cfg["fallback_rate"] for code, cfg in scraper.CURRENCY_CONFIG.items()}
+    pages["https://cbu.uz/common/json/"] = json.dumps([{"Ccy": c, "Rate": str(r)} for c, r in cbu.items()])
+    for code, cfg in scraper.CURRENCY_CONFIG.items():
+        pages[cfg["bank_uz_url"]] = currency_page(rng, cbu[code], counts["banks"])
+
+    pages[scraper.SAVINGS_URL] = deposit_page(rng, counts["deposit_cards"])
+    per_page = counts["usd_cards_per_page"]
+    for page in range(1, counts["usd_pages"] + 1):
+        url = scraper.USD_SAVINGS_URL if page == 1 else f"{scraper.USD_SAVINGS_URL}?PAGEN_3={page}"
+        pages[url] = deposit_page(rng, per_page, usd=True, first=(page - 1) * per_page)
+
+    for source in scraper.NEWS_SOURCES:
+        pages[source["rss"]] = rss_feed(rng, source, counts["rss_entries"])
+    for kind, url in (("cbu", scraper.CBU_NEWS_URL), ("imf", scraper.IMF_NEWS_URL),
+                      ("wb", scraper.WORLDBANK_NEWS_URL)):
+        pages[url] = official_news_page(rng, kind, counts["official_links"])
+
+    rows = "".join(f'<tr><td>{w} грамм</td><td>{format(w * 1_450_000, ",").replace(",", " ")} сўм</td></tr>'
+                   for w in (1, 2, 5, 10, 20, 50, 100))
+    pages[scraper.GOLD_BARS_URL] = page_chrome(
+        f'<table class="table-table-bordered"><tr><th>Vazn</th><th>Narx</th></tr>{rows}</table>', "Oltin")
+
+    sizes = {}
+    for url, text in pages.items():
+        body = text.encode("utf-8")
+        replay.save(directory, url, body)
+        sizes[url] = len(body)
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.synth",
+                                     description="Write synthetic scraper pages into a replay directory")
+    parser.add_argument("directory")
+    parser.add_argument("--factor", type=float, default=1.0, help="Multiplier on today's volume")
+    parser.add_argument("--seed", type=int, default=0)
+    for key in BASE_VOLUME:
+        parser.add_argument(f"--{key.replace('_', '-')}", type=int, dest=key,
+                            help=f"Override ({BASE_VOLUME[key]} at factor 1)")
+    args = parser.parse_args()
+
+    counts = volume(args.factor, **{k: getattr(args, k) for k in BASE_VOLUME})
+    sizes = generate(args.directory, args.seed, **counts)
+    print(f"Wrote {len(sizes)} pages ({sum(sizes.values()) / 1024:.0f} KiB) to {args.directory}: "
+          + ", ".join(f"{k}={v}" for k, v in counts.items()))
+    if counts["usd_pages"] != scraper.USD_SAVINGS_PAGES:
+        print(f"Note: scraper.py reads {scraper.USD_SAVINGS_PAGES} USD deposit pages; "
+              f"benchmarks.scale reads all {counts['usd_pages']}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Rate card cache for the Telegram bot.
+
+A card depends only on what is drawn on it (currency, rate, change, best
+buy/sell, fun fact, timestamp), and until the next scrape those are the
+same for every user. ``CardCache`` keys cards on a hash of exactly those
+inputs (plus CARD_ENCODING) and keeps
+
+    image    - the encoded card, in an in-memory LRU (MEMORY_ITEMS) and on
+               disk (DEFAULT_DIR, pruned to DISK_ITEMS files)
+    file_id  - the Telegram file_id returned by the first upload; later
+               replies send the id and no bytes
+
+Bump CARD_STYLE when rate_card_generator's drawing changes, so old cards
+on disk are not reused.
+
+``get`` and the writes touch the disk and are called through
+``asyncio.to_thread``; ``get_cached`` is memory only and safe on the loop.
+"""
+
+import collections
+import hashlib
+import json
+import os
+import threading
+
+CARD_STYLE = 2
+# How the bot's cards are encoded (rate_card_generator.encode_card). Telegram
+# re-encodes every photo to JPEG anyway, so a budgeted JPEG looks the same in
+# the chat as the PNG did at roughly half the upload.
+CARD_ENCODING = {"fmt": "jpeg", "size": "post", "max_bytes": 80_000}
+CARD_EXT = "img"
+MEMORY_ITEMS = 32
+DISK_ITEMS = 500
+DEFAULT_DIR = os.environ.get("RATE_CARD_CACHE") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "card_cache")
+
+
+def card_inputs(snapshot, view):
+    """Arguments of ``generate_rate_card`` for one currency of a RatesSnapshot.
+
+    Everything drawn on the card comes from the snapshot and the encoding from
+    CARD_ENCODING, so the bot and the scraper's pre-render stage compute the
+    same key for the same card.
+    """
+    return {
+        "currency": view.code,
+        "rate": view.cbu,
+        "change": view.change,
+        "best_buy": view.best_buy,
+        "best_sell": view.best_sell,
+        "fact_index": snapshot.version or 0,
+        "updated": snapshot.last_updated,
+        **CARD_ENCODING,
+    }
+
+
+def card_rates(snapshot):
+    """The rates drawn on a snapshot's cards, per currency.
+
+    Unlike ``card_inputs`` this leaves out the fun fact and timestamp, which
+    change with every snapshot; pre-rendering is only worth it when these do.
+    """
+    return {code: (view.cbu, view.change, view.best_buy, view.best_sell)
+            for code, view in snapshot.currencies.items()}
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class CardCache:
+    def __init__(self, directory=DEFAULT_DIR, memory_items=MEMORY_ITEMS, disk_items=DISK_ITEMS):
+        self.directory = str(directory)
+        self.memory_items = memory_items
+        self.disk_items = disk_items
+        self._memory = collections.OrderedDict()  # key -> {"image": bytes, "file_id": str or None}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(inputs):
+        """Cache key for the keyword arguments of ``generate_rate_card``."""
+        blob = json.dumps([CARD_STYLE, inputs], sort_keys=True, default=str)
+        return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+    def _path(self, key, ext):
+        return os.path.join(self.directory, f"{key}.{ext}")
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def get_cached(self, key):
+        """The entry for ``key`` if it is in memory, else None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            return entry
+
+    def get(self, key):
+        """The entry for ``key`` from memory or disk, else None."""
+        entry = self.get_cached(key)
+        if entry is not None:
+            return entry
+        try:
+            with open(self._path(key, CARD_EXT), "rb") as f:
+                image = f.read()
+        except OSError:
+            return None
+        try:
+            with open(self._path(key, "json"), "r", encoding="utf-8") as f:
+                file_id = json.load(f).get("file_id")
+        except (OSError, ValueError):
+            file_id = None
+        entry = {"image": image, "file_id": file_id}
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key, image):
+        self._remember(key, {"image": image, "file_id": None})
+        os.makedirs(self.directory, exist_ok=True)
+        _write_atomic(self._path(key, CARD_EXT), image)
+        self._prune()
+
+    def set_file_id(self, key, file_id):
+        """Remember (or, with None, forget) the Telegram file_id of an uploaded card."""
+        entry = self.get_cached(key)
+        if entry is not None:
+            entry["file_id"] = file_id
+        if os.path.exists(self._path(key, CARD_EXT)):
+            _write_atomic(self._path(key, "json"), json.dumps({"file_id": file_id}).encode("utf-8"))
+
+    def _prune(self):
+        try:
+            names = [n for n in os.listdir(self.directory) if n.endswith(f".{CARD_EXT}")]
+        except OSError:
+            return
+        if len(names) <= self.disk_items:
+            return
+        def mtime(name):
+            try:
+                return os.path.getmtime(os.path.join(self.directory, name))
+            except OSError:
+                return 0
+        for name in sorted(names, key=mtime)[:len(names) - self.disk_items]:
+            key = name[:-len(f".{CARD_EXT}")]
+            for ext in (CARD_EXT, "json"):
+                try:
+                    os.remove(self._path(key, ext))
+                except OSError:
+                    pass
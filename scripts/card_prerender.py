@@ -0,0 +1,74 @@
+"""
+Render the rate cards of a new rates snapshot before anyone asks for them.
+
+Run by scraper.py after an exchange scope (or a daemon rate refresh that moved
+the rates) has committed a snapshot: it reads the snapshot the bot will load,
+renders the card of every CURRENCY_INFO currency that has a CBU rate in
+parallel worker processes, and stores them in the card cache (card_cache.py)
+under the key the bot computes for that snapshot version. The bot does the
+same when it loads a snapshot whose rates moved (telegram_bot.prerender_cards),
+which finds these cards when both share the cache directory and renders them
+itself otherwise.
+
+Pillow is optional here: without it the stage is skipped.
+
+    python scripts/card_prerender.py    # pre-render the current snapshot
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from card_cache import CardCache, card_inputs
+from rates_cache import RatesCache
+from render_service import rate_card
+
+RATES_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "public", "rates.json")
+
+
+def prerender_cards(rates_path=RATES_FILE, cache=None, workers=None):
+    """Render the current snapshot's missing cards; returns a stats dict.
+
+    ``bytes``, ``encode_ms`` and ``over_budget`` sum the encode reports of the
+    cards rendered now (see render_service.rate_card).
+    """
+    started = time.perf_counter()
+    try:
+        from rate_card_generator import CURRENCY_INFO
+    except ImportError as e:
+        return {"skipped": f"rate cards unavailable ({e})"}
+
+    cache = cache or CardCache()
+    snapshot = RatesCache(rates_path, CURRENCY_INFO).refresh(force=True)
+    if snapshot.empty:
+        return {"skipped": "no rates snapshot"}
+
+    jobs = {}
+    for view in snapshot.currencies.values():
+        if not view.cbu:
+            continue
+        inputs = card_inputs(snapshot, view)
+        key = cache.key(inputs)
+        if cache.get(key) is None:
+            jobs[key] = inputs
+
+    reports = []
+    if jobs:
+        workers = min(workers or os.cpu_count() or 1, len(jobs))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {key: pool.submit(rate_card, **inputs) for key, inputs in jobs.items()}
+            for key, future in futures.items():
+                image, report = future.result()
+                cache.put(key, image)
+                reports.append(report)
+
+    return {"version": snapshot.version, "rendered": len(jobs),
+            "cached": sum(1 for v in snapshot.currencies.values() if v.cbu) - len(jobs),
+            "bytes": sum(r["bytes"] for r in reports),
+            "encode_ms": round(sum(r["ms"] for r in reports), 1),
+            "over_budget": sum(1 for r in reports if r["over_budget"]),
+            "seconds": round(time.perf_counter() - started, 3)}
+
+
+if __name__ == "__main__":
+    print(prerender_cards())
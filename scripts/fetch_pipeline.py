@@ -0,0 +1,112 @@
+"""
+Bounded fetch -> parse pipeline for the scraper's HTML/XML sources.
+
+Instead of gathering every download before parsing anything, pages flow
+through three stages:
+
+    fetchers (at most ``max_fetches`` in flight)
+        -> asyncio.Queue(maxsize=``queue_size``)
+        -> ``parse_workers`` workers, each parsing in the default thread pool
+
+Parsing of the first page starts while the others are still downloading, so
+network and CPU time overlap. A fetcher keeps its slot until the queue accepts
+its page, so when the parsers fall behind new downloads stop starting.
+
+One ``FetchPipeline`` per event loop (``shared()``) serves every source: the
+bank.uz page of each currency, savings, gold bars and the news feeds all
+queue on the same fetch slots and parse workers, so at most
+``max_fetches + queue_size + parse_workers`` raw pages are held in memory by
+the whole process, however many sources run at once.
+"""
+
+import asyncio
+import contextvars
+import weakref
+
+import tracing
+
+MAX_FETCHES = 6
+QUEUE_SIZE = 4
+PARSE_WORKERS = 2
+
+_pipelines = weakref.WeakKeyDictionary()  # event loop -> FetchPipeline
+
+
+def _parse(url, parse, content):
+    with tracing.span("parse", host=tracing.host_of(url), bytes=len(content),
+                      parser=getattr(parse, "func", parse).__name__):
+        return parse(content)
+
+
+class FetchPipeline:
+    def __init__(self, max_fetches=MAX_FETCHES, queue_size=QUEUE_SIZE, parse_workers=PARSE_WORKERS):
+        self.parse_workers = parse_workers
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.fetch_slots = asyncio.Semaphore(max_fetches)
+        self._active = 0
+        self._workers = []
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            url, parse, content, context, result = await self.queue.get()
+            try:
+                # Parsers run with the caller's context so their spans reach its tracer.
+                value = await loop.run_in_executor(None, context.run, _parse, url, parse, content)
+            except Exception as e:
+                print(f"Error parsing {url}: {e}")
+                value = None
+            finally:
+                self.queue.task_done()
+            if not result.done():
+                result.set_result(value)
+
+    async def _fetch_one(self, fetch, url, parse):
+        async with self.fetch_slots:
+            content = await fetch(url)
+            if not content:
+                print(f"Failed to fetch {url}.")
+                return None
+            result = asyncio.get_running_loop().create_future()
+            # Blocks while the queue is full (backpressure).
+            await self.queue.put((url, parse, content, contextvars.copy_context(), result))
+        return await result
+
+    async def fetch_and_parse(self, fetch, jobs):
+        if not jobs:
+            return []
+        # Parse workers live while any caller is using the pipeline.
+        self._active += 1
+        if not self._workers:
+            self._workers = [asyncio.ensure_future(self._consume()) for _ in range(self.parse_workers)]
+        try:
+            return await asyncio.gather(*(self._fetch_one(fetch, url, parse) for url, parse in jobs))
+        finally:
+            self._active -= 1
+            if not self._active:
+                for worker in self._workers:
+                    worker.cancel()
+                self._workers = []
+
+
+def shared():
+    """The FetchPipeline of the running event loop, created on first use."""
+    loop = asyncio.get_running_loop()
+    pipeline = _pipelines.get(loop)
+    if pipeline is None:
+        pipeline = _pipelines[loop] = FetchPipeline()
+    return pipeline
+
+
+async def fetch_and_parse(fetch, jobs, pipeline=None):
+    """Fetch and parse ``jobs``, a list of ``(url, parse)`` pairs.
+
+    ``fetch(url)`` is awaited and returns the raw content or None;
+    ``parse(content)`` is a blocking callable run in the thread pool.
+    Returns one result per job, in job order: None if the fetch failed or the
+    parser raised, otherwise whatever ``parse`` returned. Both failures are
+    logged here with the URL ("Failed to fetch" / "Error parsing"), so callers
+    only need to handle the None. Jobs share the loop's pipeline
+    (``shared()``) unless ``pipeline`` is given.
+    """
+    return await (pipeline or shared()).fetch_and_parse(fetch, jobs)
@@ -0,0 +1,106 @@
+"""
+Deferred imports for heavy dependencies, and a startup import profile.
+
+``lazy("feedparser")`` returns a stand-in that imports the real module the
+first time one of its attributes is used, so a run that never parses RSS
+never pays for feedparser. How long each deferred import took is recorded in
+``deferred_import_times``.
+
+``print_startup_profile("scraper")`` runs ``import scraper`` in a fresh
+interpreter with ``-X importtime`` and prints what the import itself costs,
+broken down per directly imported module. Both are shown by the
+``--startup-profile`` flag of scraper.py and telegram_bot.py.
+"""
+
+import importlib
+import os
+import subprocess
+import sys
+import time
+
+# module name -> seconds spent importing it on first use
+deferred_import_times = {}
+
+
+class LazyModule:
+    """Module proxy that imports ``name`` on first attribute access."""
+
+    __slots__ = ("_name", "_module")
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            started = time.perf_counter()
+            module = importlib.import_module(self._name)
+            deferred_import_times.setdefault(self._name, time.perf_counter() - started)
+            self._module = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy(name):
+    return LazyModule(name)
+
+
+def _parse_importtime(stderr, module):
+    """Return ``(total_us, [(cumulative_us, self_us, name), ...])`` for ``module``'s direct imports."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, raw_name = line[len("import time:"):].split("|")
+        depth = len(raw_name) - len(raw_name.lstrip())
+        rows.append((depth, int(cumulative_us), int(self_us), raw_name.strip()))
+
+    # -X importtime prints a module after everything it imported, children
+    # indented one level (two spaces) deeper.
+    for i, (depth, cumulative_us, _, name) in enumerate(rows):
+        if name == module:
+            children = []
+            for child_depth, child_cum, child_self, child_name in reversed(rows[:i]):
+                if child_depth <= depth:
+                    break
+                if child_depth == depth + 2:
+                    children.append((child_cum, child_self, child_name))
+            return cumulative_us, sorted(children, reverse=True)
+    return None, []
+
+
+def print_startup_profile(module, top=15):
+    """Print the per-module cost of ``import module`` in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    total_us, children = _parse_importtime(result.stderr, module)
+    if total_us is None:
+        print(f"--- Startup profile: 'import {module}' failed ---")
+        print(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "")
+        return
+    print(f"--- Startup profile: import {module} took {total_us / 1000:.1f} ms ---")
+    for cumulative_us, self_us, name in children[:top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+    if len(children) > top:
+        rest = sum(c[0] for c in children[top:])
+        print(f"  {rest / 1000:8.1f} ms  ({len(children) - top} more)")
+
+
+def print_deferred_imports():
+    """Print the deferred imports this process actually triggered."""
+    if not deferred_import_times:
+        print("--- Deferred imports: none loaded ---")
+        return
+    print("--- Deferred imports loaded during this run ---")
+    for name, seconds in sorted(deferred_import_times.items(), key=lambda kv: kv[1], reverse=True):
+        print(f"  {seconds * 1000:8.1f} ms  {name}")
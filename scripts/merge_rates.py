@@ -3,6 +3,8 @@ import os
 import argparse
 import datetime
 
+from snapshot_store import SnapshotStore
+
 OUTPUT_FILE = "public/rates.json"
 
 def main():
@@ -11,14 +13,22 @@ def main():
     parser.add_argument("--inputs", nargs='+', required=True, help="List of partial JSON files to merge")
     args = parser.parse_args()
 
-    # 1. Load Base Data
-    base_data = {}
-    if os.path.exists(args.base):
+    # 1. Load Partial Inputs
+    partials = []
+    for input_file in args.inputs:
+        if not os.path.exists(input_file):
+            print(f"Warning: Input file {input_file} not found. Skipping.")
+            continue
+
         try:
-            with open(args.base, "r") as f:
-                base_data = json.load(f)
+            with open(input_file, "r") as f:
+                partials.append((input_file, json.load(f)))
         except Exception as e:
-            print(f"Warning: Could not load base file {args.base}: {e}")
+            print(f"Error reading {input_file}: {e}")
+
+    # 2. Merge into the latest base snapshot under the writer lock
+    def merge(base_data):
+        if not base_data:
             # Ensure base structure exists if file missing
             base_data = {
                 "usd": None, "rub": None, "eur": None, "kzt": None, "gbp": None,
@@ -27,35 +37,21 @@ def main():
                 "bank_reliability": None
             }
 
-    # 2. Merge Inputs
-    for input_file in args.inputs:
-        if not os.path.exists(input_file):
-            print(f"Warning: Input file {input_file} not found. Skipping.")
-            continue
-
-        try:
-            with open(input_file, "r") as f:
-                partial_data = json.load(f)
-
+        for input_file, partial_data in partials:
             print(f"Merging {input_file}...")
             # Update keys
             for key, value in partial_data.items():
                 if value is not None:
                     base_data[key] = value
 
-        except Exception as e:
-            print(f"Error reading {input_file}: {e}")
-
-    # 3. Update Timestamp
-    base_data["last_updated"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+        # 3. Update Timestamp
+        base_data["last_updated"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+        return base_data
 
-    # 4. Save
-    if os.path.dirname(args.base):
-        os.makedirs(os.path.dirname(args.base), exist_ok=True)
-    with open(args.base, "w") as f:
-        json.dump(base_data, f, indent=2)
+    # 4. Save (versioned copy + atomically replaced base file)
+    version, _ = SnapshotStore(args.base).commit(merge)
 
-    print(f"Successfully merged {len(args.inputs)} files into {args.base}")
+    print(f"Successfully merged {len(partials)} files into {args.base} (version {version})")
 
 if __name__ == "__main__":
     main()
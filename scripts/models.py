@@ -0,0 +1,163 @@
+"""
+Typed in-memory records for scraped entities.
+
+Each record is a slotted class whose field order matches the key order the
+scraper writes to rates.json, so ``Record.from_dict(d).to_dict() == d`` for
+every entry we produce today. Optional fields are left unset (and omitted
+from ``to_dict``) instead of being stored as ``None``.
+
+Assigning an unknown attribute raises ``AttributeError``, constructing a
+record with a missing or unknown key raises ``TypeError``, and so does
+setting a field to a wrongly typed value, at construction or later, so key
+typos and bad values fail loudly instead of leaking into the JSON.
+"""
+
+from operator import attrgetter
+
+NUMBER = (int, float)
+OPTIONAL_STR = (str, type(None))
+
+_UNSET = object()
+
+
+class Record:
+    """Base class for slotted records. Subclasses set ``__slots__`` to their fields."""
+
+    __slots__ = ()
+    _optional = frozenset()
+    _types = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._fields = tuple(cls.__slots__)
+        cls._field_set = frozenset(cls._fields)
+        cls._required = tuple(f for f in cls._fields if f not in cls._optional)
+        cls._getter = attrgetter(*cls._fields)
+
+    def __init__(self, **values):
+        unknown = values.keys() - self._field_set
+        if unknown:
+            raise TypeError(f"{type(self).__name__}: unknown field(s) {sorted(unknown)}")
+        for name in self._required:
+            if name not in values:
+                raise TypeError(f"{type(self).__name__}: missing field '{name}'")
+        for name, value in values.items():
+            setattr(self, name, value)
+
+    def __setattr__(self, name, value):
+        expected = self._types.get(name)
+        if expected is not None and not isinstance(value, expected):
+            raise TypeError(
+                f"{type(self).__name__}.{name}: expected {_type_names(expected)}, "
+                f"got {type(value).__name__}"
+            )
+        object.__setattr__(self, name, value)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a record from a rates.json entry."""
+        return cls(**data)
+
+    def to_dict(self):
+        """Return the rates.json representation, preserving key order."""
+        if len(self._optional) == 0:
+            return dict(zip(self._fields, self._getter(self)))
+        out = {}
+        for name in self._fields:
+            value = getattr(self, name, _UNSET)
+            if value is not _UNSET:
+                out[name] = value
+        return out
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    __hash__ = None
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}={v!r}" for k, v in self.to_dict().items())
+        return f"{type(self).__name__}({fields})"
+
+
+def _type_names(expected):
+    if isinstance(expected, tuple):
+        return " | ".join(t.__name__ for t in expected)
+    return expected.__name__
+
+
+def to_dicts(records):
+    """Serialize a list of records for rates.json."""
+    return [r.to_dict() for r in records]
+
+
+def from_dicts(cls, items):
+    """Load a list of rates.json entries into records of ``cls``."""
+    return [cls.from_dict(item) for item in items or []]
+
+
+# ==================== RECORDS ====================
+
+class BankRate(Record):
+    """One bank's buy/sell quote in a currency block (``usd.banks[]``)."""
+
+    __slots__ = ("name", "buy", "sell", "logo", "is_mock", "featured")
+    _types = {
+        "name": str, "buy": NUMBER, "sell": NUMBER, "logo": str,
+        "is_mock": bool, "featured": bool,
+    }
+
+
+class Deposit(Record):
+    """A savings deposit offer (``savings.data[]`` and ``savings_usd.data[]``)."""
+
+    __slots__ = ("bank_name", "deposit_name", "rate", "duration", "min_amount",
+                 "is_online", "currency", "logo")
+    _optional = frozenset({"currency"})
+    _types = {
+        "bank_name": str, "deposit_name": str, "rate": NUMBER, "duration": str,
+        "min_amount": str, "is_online": bool, "currency": str, "logo": str,
+    }
+
+
+class NewsItem(Record):
+    """A news entry (``news.items[]``) from RSS, CBU, IMF, World Bank or WorldNewsAPI."""
+
+    __slots__ = ("id", "title", "summary", "full_content", "source", "source_url",
+                 "category", "language", "published_at", "published_ts", "image_url",
+                 "is_breaking", "is_official", "is_worldnews_api", "reliability_tier",
+                 "reliability_score", "reliability_label")
+    _optional = frozenset({"is_official", "is_worldnews_api"})
+    _types = {
+        "id": str, "title": str, "summary": str, "full_content": str, "source": str,
+        "source_url": str, "category": str, "language": str, "published_at": str,
+        "published_ts": NUMBER, "image_url": OPTIONAL_STR, "is_breaking": bool,
+        "is_official": bool, "is_worldnews_api": bool, "reliability_tier": str,
+        "reliability_score": NUMBER, "reliability_label": OPTIONAL_STR,
+    }
+
+
+class HistoryPoint(Record):
+    """A daily point in a CBU rate history or a Polygon price history."""
+
+    __slots__ = ("date", "rate", "price_usd", "price_usd_per_oz", "change_percent")
+    _optional = frozenset({"rate", "price_usd", "price_usd_per_oz", "change_percent"})
+    _types = {
+        "date": str, "rate": NUMBER, "price_usd": NUMBER,
+        "price_usd_per_oz": NUMBER, "change_percent": NUMBER,
+    }
+
+
+class BankReliability(Record):
+    """A scored bank row (``bank_reliability.banks[]``)."""
+
+    __slots__ = ("name", "score", "tier", "tier_label", "tier_color", "bank_type",
+                 "license_year", "cerr_rank", "cerr_category", "rank_change",
+                 "indicators", "logo", "overall_rank")
+    _optional = frozenset({"overall_rank"})
+    _types = {
+        "name": str, "score": NUMBER, "tier": str, "tier_label": str, "tier_color": str,
+        "bank_type": str, "license_year": int, "cerr_rank": int, "cerr_category": str,
+        "rank_change": int, "indicators": dict, "logo": str, "overall_rank": int,
+    }
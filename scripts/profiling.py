@@ -0,0 +1,189 @@
+"""
+CPU and memory profiling for scraper scopes (``scraper.py --profile cpu|mem``).
+
+cpu - cProfile over the event loop thread plus every job sent to the default
+      executor (parsers, reliability scoring, notifications), merged into one
+      ``.prof`` file and a text report sorted by cumulative and own time.
+
+mem - tracemalloc with per-stage peaks. Whenever a tracing span opens or
+      closes, the traced-memory peak since the previous event is credited to
+      every span that is still open, so a span's peak is the highest traced
+      memory seen while it ran, minus the level when it started. Stages that
+      overlap share those peaks. The report also lists the allocation sites
+      still alive when serialization starts, i.e. what the finished output
+      and anything leaked from parsing cost. Garbage cycles are collected
+      before every reading, so levels and snapshots count only live memory
+      (which makes this mode noticeably slower).
+
+Combine with ``--replay DIR`` so repeated runs parse exactly the same input.
+"""
+
+import cProfile
+import gc
+import io
+import os
+import pstats
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+
+TOP = 40
+TRACEMALLOC_FRAMES = 1
+
+
+class _ProfilingExecutor(ThreadPoolExecutor):
+    """Default executor that runs every job under its own cProfile.Profile."""
+
+    def __init__(self):
+        super().__init__(thread_name_prefix="profiled")
+        self.profiles = []
+        self._lock = threading.Lock()
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(self._profiled, fn, args, kwargs)
+
+    def _profiled(self, fn, args, kwargs):
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.disable()
+            with self._lock:
+                self.profiles.append(profile)
+
+
+class CpuProfiler:
+    kind = "cpu"
+
+    def start(self, loop):
+        self.executor = _ProfilingExecutor()
+        loop.set_default_executor(self.executor)
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+        self.executor.shutdown(wait=True)
+
+    def write(self, directory, label):
+        stats = pstats.Stats(self.profile)
+        for profile in self.executor.profiles:
+            stats.add(profile)
+        prof_path = os.path.join(directory, f"{label}-cpu.prof")
+        stats.dump_stats(prof_path)
+
+        out = io.StringIO()
+        for sort_key in ("cumulative", "tottime"):
+            out.write(f"===== Top {TOP} by {sort_key} =====\n")
+            pstats.Stats(prof_path, stream=out).strip_dirs().sort_stats(sort_key).print_stats(TOP)
+        report_path = os.path.join(directory, f"{label}-cpu.txt")
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write(out.getvalue())
+        return [report_path, prof_path]
+
+
+class MemProfiler:
+    kind = "mem"
+
+    def start(self, loop):
+        self._lock = threading.Lock()
+        self._open = {}
+        self.stages = {}
+        self.peak = 0
+        self.retained = None
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        tracing.add_observer(self)
+
+    def stop(self):
+        tracing.remove_observer(self)
+        with self._lock:
+            self._advance()
+        gc.collect()
+        self.final = _top_sites(tracemalloc.take_snapshot())
+        tracemalloc.stop()
+
+    def _advance(self):
+        # Credit the peak since the previous event to every open span.
+        _, peak = tracemalloc.get_traced_memory()
+        self.peak = max(self.peak, peak)
+        for entry in self._open.values():
+            entry[2] = max(entry[2], peak)
+        # Unreachable cycles (parse trees, tracebacks) would otherwise stay in
+        # the level a span starts from until the collector happens to run.
+        gc.collect()
+        tracemalloc.reset_peak()
+        return tracemalloc.get_traced_memory()[0]
+
+    def span_started(self, span):
+        with self._lock:
+            current = self._advance()
+            self._open[id(span)] = [span.stage, current, current]
+        if span.stage == "serialize" and self.retained is None:
+            gc.collect()
+            self.retained = _top_sites(tracemalloc.take_snapshot())
+            with self._lock:
+                # Don't charge the snapshot itself to the open spans.
+                tracemalloc.reset_peak()
+
+    def span_finished(self, span):
+        with self._lock:
+            self._advance()
+            stage, start, peak = self._open.pop(id(span))
+            stats = self.stages.setdefault(stage, {"spans": 0, "max_peak": 0, "total_peak": 0})
+            growth = max(0, peak - start)
+            stats["spans"] += 1
+            stats["max_peak"] = max(stats["max_peak"], growth)
+            stats["total_peak"] += growth
+
+    def write(self, directory, label):
+        lines = [f"Peak traced memory: {_mib(self.peak)}", "",
+                 "Per-stage peak (highest traced memory while the stage ran, above its starting level):",
+                 f"  {'stage':<12} {'spans':>6} {'max peak':>12} {'mean peak':>12}"]
+        for stage, s in sorted(self.stages.items(), key=lambda kv: kv[1]["max_peak"], reverse=True):
+            lines.append(f"  {stage:<12} {s['spans']:>6} {_mib(s['max_peak']):>12} "
+                         f"{_mib(s['total_peak'] / s['spans']):>12}")
+
+        for title, sites in (("Allocation sites alive when serialization started", self.retained),
+                             ("Allocation sites alive at the end of the run", self.final)):
+            if sites is not None:
+                lines += ["", f"{title} (top {TOP} by line):"] + sites
+
+        report_path = os.path.join(directory, f"{label}-mem.txt")
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return [report_path]
+
+
+def _top_sites(snapshot):
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    lines = []
+    for stat in snapshot.statistics("lineno")[:TOP]:
+        frame = stat.traceback[0]
+        lines.append(f"  {_mib(stat.size):>10} {stat.count:>8} blocks  {frame.filename}:{frame.lineno}")
+    return lines
+
+
+def _mib(n):
+    return f"{n / (1024 * 1024):.2f} MiB"
+
+
+PROFILERS = {"cpu": CpuProfiler, "mem": MemProfiler}
+
+
+def start(kind, loop):
+    profiler = PROFILERS[kind]()
+    profiler.start(loop)
+    return profiler
+
+
+def finish(profiler, directory, label):
+    """Stop ``profiler`` and write its reports to ``directory``; returns the paths."""
+    profiler.stop()
+    os.makedirs(directory, exist_ok=True)
+    return profiler.write(directory, label)
@@ -0,0 +1,149 @@
+"""
+Concurrent FCM fan-out helpers for rate alerts (see push_topics.py).
+
+``fan_out`` hands batches of tokens to a send callable with at most
+MAX_IN_FLIGHT batches in flight at once, and collects per-token failures in
+a FanOutReport; push_topics uses it to drive the topic management API.
+``send_messages`` sends a list of individual Messages with
+``send_each_async``, or the synchronous ``send_each`` in the default executor
+on SDKs that predate it.
+
+Tokens FCM reports as unregistered or belonging to another sender are
+tombstoned in ``fcm_tokens`` by ``remove_tokens`` (the web app uses the token
+as the document id), so the token cache's incremental sync sees them go.
+"""
+
+import asyncio
+import collections
+import time
+
+from lazy_imports import lazy
+
+messaging = lazy("firebase_admin.messaging")
+firestore = lazy("firebase_admin.firestore")
+
+TOKENS_COLLECTION = "fcm_tokens"
+BATCH_SIZE = 500        # FCM per-request limit
+MAX_IN_FLIGHT = 8
+WRITE_BATCH_SIZE = 500  # Firestore write batch limit
+
+# Per-token errors that mean the token will never work again: exception
+# types from sends, reasons from the topic management API.
+INVALID_TOKEN_ERRORS = {"UnregisteredError", "SenderIdMismatchError", "NOT_FOUND", "INVALID_ARGUMENT"}
+
+
+class FanOutReport:
+    """Outcome of one fan-out: counts, per-error totals and the tokens to drop."""
+
+    def __init__(self):
+        self.tokens = 0
+        self.batches = 0
+        self.sent = 0
+        self.failed = 0
+        self.errors = collections.Counter()
+        self.failed_tokens = []
+        self.invalid_tokens = []
+        self.removed = 0
+        self.seconds = 0.0
+
+    @property
+    def tokens_per_second(self):
+        return self.tokens / self.seconds if self.seconds else 0.0
+
+    def token_failed(self, token, exc):
+        """Count a failure; ``exc`` is an exception or a topic management reason string."""
+        if isinstance(exc, str):
+            name = exc
+        else:
+            name = type(exc).__name__ if exc is not None else "UnknownError"
+        self.failed += 1
+        self.failed_tokens.append(token)
+        self.errors[name] += 1
+        if name in INVALID_TOKEN_ERRORS:
+            self.invalid_tokens.append(token)
+
+    def to_dict(self):
+        return {"tokens": self.tokens, "batches": self.batches, "sent": self.sent,
+                "failed": self.failed, "invalid": len(self.invalid_tokens), "removed": self.removed,
+                "seconds": round(self.seconds, 3), "tokens_per_s": round(self.tokens_per_second, 1),
+                "errors": dict(self.errors)}
+
+    def summary(self):
+        text = (f"{self.sent}/{self.tokens} delivered in {self.batches} batches, {self.seconds:.2f}s "
+                f"({self.tokens_per_second:.0f} tokens/s); {self.failed} failed, "
+                f"{len(self.invalid_tokens)} invalid, {self.removed} removed")
+        if self.errors:
+            text += " [" + ", ".join(f"{k}: {v}" for k, v in self.errors.most_common()) + "]"
+        return text
+
+
+async def send_messages(messages):
+    """Send up to 500 individual Messages in one call and return the BatchResponse."""
+    send_async = getattr(messaging, "send_each_async", None)
+    if send_async is not None:
+        return await send_async(messages)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, messaging.send_each, messages)
+
+
+async def iter_batches(items, batch_size=BATCH_SIZE):
+    for i in range(0, len(items), batch_size):
+        yield items[i:i + batch_size]
+
+
+async def fan_out(token_batches, build_message, send, max_in_flight=MAX_IN_FLIGHT):
+    """Await ``send(build_message(tokens))`` for every batch of ``token_batches`` (an async iterable).
+
+    ``send`` returns a response with one ``.responses`` entry per token.
+
+    At most ``max_in_flight`` batches are sent concurrently. A batch that
+    fails as a whole counts every one of its tokens as failed.
+    """
+    report = FanOutReport()
+    slots = asyncio.Semaphore(max_in_flight)
+    started = time.perf_counter()
+
+    async def deliver(tokens):
+        try:
+            response = await send(build_message(tokens))
+        except Exception as e:
+            print(f"FCM batch of {len(tokens)} failed: {e}")
+            for token in tokens:
+                report.token_failed(token, e)
+        else:
+            for token, result in zip(tokens, response.responses):
+                if result.success:
+                    report.sent += 1
+                else:
+                    report.token_failed(token, result.exception)
+        finally:
+            slots.release()
+
+    tasks = []
+    try:
+        async for tokens in token_batches:
+            if not tokens:
+                continue
+            await slots.acquire()
+            report.tokens += len(tokens)
+            report.batches += 1
+            tasks.append(asyncio.ensure_future(deliver(tokens)))
+    finally:
+        await asyncio.gather(*tasks, return_exceptions=True)
+        report.seconds = time.perf_counter() - started
+    return report
+
+
+def remove_tokens(db, tokens, collection=TOKENS_COLLECTION):
+    """Tombstone ``tokens`` in ``collection`` (``deleted: true``, fresh ``updatedAt``)
+    in write batches, so incremental syncs see the removal; returns the count."""
+    removed = 0
+    ref = db.collection(collection)
+    for i in range(0, len(tokens), WRITE_BATCH_SIZE):
+        chunk = tokens[i:i + WRITE_BATCH_SIZE]
+        batch = db.batch()
+        for token in chunk:
+            batch.set(ref.document(token), {"deleted": True, "updatedAt": firestore.SERVER_TIMESTAMP}, merge=True)
+        batch.commit()
+        removed += len(chunk)
+    return removed
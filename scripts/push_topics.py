@@ -0,0 +1,131 @@
+"""
+Per-currency, per-direction FCM topics for rate alerts.
+
+Every alert kind has a topic named ``<currency>_<direction>``, such as
+``usd_buy_up`` or ``eur_sell_down``. An alert is published once to its
+topic and FCM delivers it to that topic's subscribers. Sending therefore
+costs one request per triggered topic, whatever the number of users, and a
+device only gets the alerts it asked for.
+
+The registry of who wants what is the token cache (token_cache.py). The web
+app writes the topics a device wants onto its fcm_tokens document as
+``topics: [...]``; devices that never chose get DEFAULT_TOPICS. Before
+publishing, the cache is synced and only tokens whose wanted topics differ
+from what FCM already has are sent to the topic management API, in batches
+of TOPIC_BATCH_SIZE through push_fanout.fan_out. Tokens that FCM rejects
+there are tombstoned like invalid tokens after a send.
+"""
+
+import asyncio
+import collections
+import time
+from functools import partial
+
+import push_fanout
+from lazy_imports import lazy
+
+messaging = lazy("firebase_admin.messaging")
+
+CURRENCIES = ("usd", "eur", "rub", "kzt")
+DIRECTIONS = ("buy_up", "sell_down")
+TOPIC_BATCH_SIZE = 1000  # FCM topic management limit
+SUBSCRIBE_IN_FLIGHT = 4
+
+
+def topic(currency, direction):
+    return f"{currency.lower()}_{direction}"
+
+
+ALL_TOPICS = tuple(topic(c, d) for c in CURRENCIES for d in DIRECTIONS)
+DEFAULT_TOPICS = ALL_TOPICS
+
+
+class _Result:
+    __slots__ = ("success", "exception")
+
+    def __init__(self, success, exception=None):
+        self.success = success
+        self.exception = exception
+
+
+class _TopicResponse:
+    """A TopicManagementResponse in the per-token shape push_fanout.fan_out reads."""
+
+    def __init__(self, size, response):
+        failed = {e.index: e.reason for e in response.errors}
+        self.responses = [_Result(i not in failed, failed.get(i)) for i in range(size)]
+
+
+async def _manage(topic_name, subscribe, tokens):
+    call = messaging.subscribe_to_topic if subscribe else messaging.unsubscribe_from_topic
+    response = await asyncio.to_thread(call, tokens, topic_name)
+    return _TopicResponse(len(tokens), response)
+
+
+async def apply_subscriptions(cache):
+    """Bring FCM's topic subscriptions in line with the registry; returns a stats dict."""
+    changes = cache.subscription_changes(DEFAULT_TOPICS, ALL_TOPICS)
+    pending = collections.defaultdict(list)
+    subscribed = {}
+    for token, wanted, current in changes:
+        subscribed[token] = set(current)
+        for name in wanted - current:
+            pending[(name, True)].append(token)
+        for name in current - wanted:
+            pending[(name, False)].append(token)
+
+    stats = {"tokens": len(changes), "subscribed": 0, "unsubscribed": 0, "failed": 0,
+             "errors": collections.Counter(), "invalid": []}
+    for (name, subscribe), tokens in sorted(pending.items()):
+        report = await push_fanout.fan_out(
+            push_fanout.iter_batches(tokens, TOPIC_BATCH_SIZE), lambda batch: batch,
+            send=partial(_manage, name, subscribe), max_in_flight=SUBSCRIBE_IN_FLIGHT)
+        failed = set(report.failed_tokens)
+        for token in tokens:
+            if token not in failed:
+                (subscribed[token].add if subscribe else subscribed[token].discard)(name)
+        stats["subscribed" if subscribe else "unsubscribed"] += report.sent
+        stats["failed"] += report.failed
+        stats["errors"].update(report.errors)
+        stats["invalid"] += report.invalid_tokens
+
+    # Tokens FCM has never heard of are not in any topic.
+    invalid = set(stats["invalid"])
+    for token in invalid:
+        subscribed[token] = set()
+    await asyncio.to_thread(cache.set_subscribed, subscribed)
+    stats["invalid"] = sorted(invalid)
+    return stats
+
+
+async def publish(alerts, title):
+    """Send one notification per topic; ``alerts`` is ``[(topic, line), ...]``."""
+    bodies = collections.defaultdict(list)
+    for name, line in alerts:
+        bodies[name].append(line)
+    messages = [messaging.Message(topic=name, notification=messaging.Notification(title=title, body="\n".join(lines)))
+                for name, lines in bodies.items()]
+    response = await push_fanout.send_messages(messages)
+    failed = {name: type(r.exception).__name__ for name, r in zip(bodies, response.responses) if not r.success}
+    return {"topics": len(messages), "published": len(messages) - len(failed), "failed_topics": failed}
+
+
+async def publish_alerts(db, cache, alerts, title):
+    """Sync the registry, update FCM subscriptions, then publish ``alerts`` to their topics."""
+    started = time.perf_counter()
+    sync = await asyncio.to_thread(cache.sync, db)
+    subscriptions = await apply_subscriptions(cache)
+    removed = 0
+    if subscriptions["invalid"]:
+        try:
+            removed = await asyncio.to_thread(push_fanout.remove_tokens, db, subscriptions["invalid"])
+            await asyncio.to_thread(cache.tombstone, subscriptions["invalid"])
+        except Exception as e:
+            print(f"Could not remove invalid FCM tokens: {e}")
+    published = await publish(alerts, title)
+    return {
+        "sync_mode": sync["mode"], "sync_read": sync["read"],
+        "subscription_changes": subscriptions["tokens"], "subscribed": subscriptions["subscribed"],
+        "unsubscribed": subscriptions["unsubscribed"], "subscription_failures": subscriptions["failed"],
+        "removed": removed, **published, "seconds": round(time.perf_counter() - started, 3),
+    }
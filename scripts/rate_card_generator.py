@@ -6,8 +6,11 @@ Generates stylish images for currency exchange rates.
 
 import io
 import math
+import os
 import random
+import time
 from datetime import datetime
+from functools import lru_cache
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
 
 # ==================== CONFIGURATION ====================
@@ -30,6 +33,56 @@ COLORS = {
 WIDTH = 800
 HEIGHT = 800
 
+# Output sizes for encode_card: name -> (width, height). Non-square sizes
+# centre the square card on a taller gradient canvas.
+SIZES = {
+    "post": (800, 800),      # Telegram / Instagram post
+    "story": (1080, 1920),   # Stories
+    "thumb": (320, 320),     # Thumbnails, link previews
+}
+
+# Output formats for encode_card
+FORMATS = ("png", "png8", "webp", "jpeg")
+DEFAULT_QUALITY = 85          # webp / jpeg without a byte budget
+QUALITY_RANGE = (40, 92)      # searched to meet a byte budget
+MIN_PALETTE = 16              # png8 halves its palette down to this to meet a budget
+
+# Neon glow: the text mask is dilated by GLOW_SPREAD * radius, blurred by
+# radius and drawn at GLOW_STRENGTH opacity (tuned to match the old
+# multi-pass glow)
+GLOW_SPREAD = 0.3
+GLOW_STRENGTH = 0.3
+
+# Font files tried for each face, best first, matched case-insensitively.
+# Impact is the original look on Windows (and on Linux with msttcorefonts,
+# which names Arial Bold "Arial_Bold.ttf"); DejaVu ships with this script
+# (fonts/) so Linux hosts always get a real TrueType font instead of PIL's
+# bitmap default.
+FONT_FACES = {
+    "bold": ["impact.ttf", "arialbd.ttf", "Arial_Bold.ttf", "DejaVuSans-Bold.ttf", "LiberationSans-Bold.ttf"],
+    "regular": ["impact.ttf", "arial.ttf", "DejaVuSans.ttf", "LiberationSans-Regular.ttf"],
+}
+
+# Directories searched for them: RATE_CARD_FONT_DIRS (os.pathsep separated)
+# first, then the usual system locations, then the bundled fonts.
+BUNDLED_FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts")
+SYSTEM_FONT_DIRS = [
+    "C:/Windows/Fonts",
+    "/usr/share/fonts/truetype/dejavu",
+    "/usr/share/fonts/truetype/liberation",
+    "/usr/share/fonts/truetype/msttcorefonts",
+    "/usr/share/fonts/dejavu",
+    "/usr/share/fonts/TTF",
+    "/Library/Fonts",
+    os.path.expanduser("~/.fonts"),
+]
+
+
+def font_dirs():
+    configured = os.environ.get("RATE_CARD_FONT_DIRS", "")
+    return [d for d in configured.split(os.pathsep) if d] + SYSTEM_FONT_DIRS + [BUNDLED_FONT_DIR]
+
+
 # Fun facts about Uzbekistan and currency
 FUN_FACTS = [
     "The UZS (So'm) was introduced in 1994, replacing the Soviet Ruble.",
@@ -130,6 +183,17 @@ def draw_sun(draw, width, height):
         draw.line([(sun_center_x - dx, y), (sun_center_x + dx, y)], fill=(r, g, b))
 
 
+@lru_cache(maxsize=4)
+def static_background(width, height):
+    """Gradient, sun and grid - identical on every card, so drawn once per size."""
+    img = Image.new('RGBA', (width, height), COLORS["bg_dark"])
+    draw = ImageDraw.Draw(img)
+    create_gradient_background(draw, width, height)
+    draw_sun(draw, width, height)
+    draw_grid(draw, width, height)
+    return img
+
+
 def draw_glow_text(img, draw, text, position, font, color, glow_color=None, glow_radius=5):
     """Draw text with neon glow effect."""
     if glow_color is None:
@@ -137,53 +201,75 @@ def draw_glow_text(img, draw, text, position, font, color, glow_color=None, glow
     
     x, y = position
     
-    # Create glow layer
-    glow_layer = Image.new('RGBA', img.size, (0, 0, 0, 0))
-    glow_draw = ImageDraw.Draw(glow_layer)
-    
-    # Draw multiple offset texts for glow
-    for offset in range(glow_radius, 0, -1):
-        alpha = int(100 / offset)
-        glow_col = (*glow_color[:3], alpha)
-        for dx in range(-offset, offset + 1):
-            for dy in range(-offset, offset + 1):
-                if dx * dx + dy * dy <= offset * offset:
-                    glow_draw.text((x + dx, y + dy), text, font=font, fill=glow_col)
-    
-    # Apply blur to glow
-    glow_layer = glow_layer.filter(ImageFilter.GaussianBlur(radius=glow_radius))
+    # Work only on the text's bounding box plus room for the glow
+    pad = glow_radius * 4
+    left, top, right, bottom = draw.textbbox(position, text, font=font)
+    box = (max(int(left) - pad, 0), max(int(top) - pad, 0),
+           min(int(right) + pad, img.width), min(int(bottom) + pad, img.height))
+    
+    # One text mask, widened and blurred, is the glow's alpha
+    mask = Image.new('L', (box[2] - box[0], box[3] - box[1]), 0)
+    ImageDraw.Draw(mask).text((x - box[0], y - box[1]), text, font=font, fill=255)
+    spread = int(glow_radius * GLOW_SPREAD)
+    if spread:
+        mask = mask.filter(ImageFilter.MaxFilter(2 * spread + 1))
+    mask = mask.filter(ImageFilter.GaussianBlur(radius=glow_radius))
+    mask = mask.point(lambda v: int(v * GLOW_STRENGTH))
     
     # Composite glow onto image
-    img.paste(glow_layer, (0, 0), glow_layer)
+    img.paste(tuple(glow_color[:3]), box, mask)
     
     # Draw main text
     draw.text(position, text, font=font, fill=color)
 
 
-def get_font(size, bold=False):
-    """Get font, fallback to default if custom font not available."""
-    # Try to use a good system font
-    font_names = [
-        "C:/Windows/Fonts/impact.ttf",      # Impact (bold, condensed)
-        "C:/Windows/Fonts/arialbd.ttf",     # Arial Bold
-        "C:/Windows/Fonts/arial.ttf",       # Arial Regular
-    ]
-    
-    for font_name in font_names:
+def _font_files(directory):
+    """Lower-cased file name -> file name for the fonts in ``directory``."""
+    try:
+        return {name.lower(): name for name in os.listdir(directory)}
+    except OSError:
+        return {}
+
+
+@lru_cache(maxsize=None)
+def find_font(face):
+    """Path of the first available font file for ``face``, or None."""
+    listings = [(directory, _font_files(directory)) for directory in font_dirs()]
+    for name in FONT_FACES[face]:
+        for directory, files in listings:
+            found = files.get(name.lower())
+            if found and os.path.isfile(os.path.join(directory, found)):
+                return os.path.join(directory, found)
+    return None
+
+
+@lru_cache(maxsize=32)
+def load_font(face, size):
+    """FreeTypeFont for ``face`` at ``size``, loaded once per process."""
+    path = find_font(face)
+    if path:
         try:
-            return ImageFont.truetype(font_name, size)
-        except (IOError, OSError):
-            continue
-    
+            return ImageFont.truetype(path, size)
+        except OSError:
+            pass
     # Fallback to default
-    return ImageFont.load_default()
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:  # Pillow < 10.1 has no sized default font
+        return ImageFont.load_default()
+
+
+def get_font(size, bold=False):
+    """Get font, fallback to default if no TrueType font is available."""
+    return load_font("bold" if bold else "regular", size)
 
 
 # ==================== MAIN GENERATOR ====================
 
-def generate_rate_card(currency: str, rate: float, change: float = 0, best_buy: float = 0, best_sell: float = 0) -> bytes:
+def render_card_image(currency: str, rate: float, change: float = 0, best_buy: float = 0, best_sell: float = 0,
+                      fact_index: int = None, updated: str = None) -> Image.Image:
     """
-    Generate a synthwave-styled rate card image.
+    Draw a synthwave-styled rate card (WIDTH x HEIGHT, RGBA).
     
     Args:
         currency: Currency code (USD, EUR, RUB, etc.)
@@ -191,19 +277,19 @@ def generate_rate_card(currency: str, rate: float, change: float = 0, best_buy:
         change: Rate change from yesterday
         best_buy: Best bank buy rate
         best_sell: Best bank sell rate
+        fact_index: Which fun fact to show (any int, wrapped); random if None
+        updated: Timestamp to print; the render time if None
+    
+    The same arguments (with fact_index and updated given) always produce
+    the same image, which is what lets the bot cache cards.
     
     Returns:
-        PNG image as bytes
+        PIL Image; see encode_card / generate_rate_card for bytes
     """
-    # Create image
-    img = Image.new('RGBA', (WIDTH, HEIGHT), COLORS["bg_dark"])
+    # Start from the cached background (gradient, sun, grid)
+    img = static_background(WIDTH, HEIGHT).copy()
     draw = ImageDraw.Draw(img)
     
-    # Draw background elements
-    create_gradient_background(draw, WIDTH, HEIGHT)
-    draw_sun(draw, WIDTH, HEIGHT)
-    draw_grid(draw, WIDTH, HEIGHT)
-    
     # Get fonts
     font_title = get_font(60, bold=True)
     font_rate = get_font(120, bold=True)
@@ -264,7 +350,10 @@ def generate_rate_card(currency: str, rate: float, change: float = 0, best_buy:
     
     # Fun fact box
     fact_y = 460
-    fact = random.choice(FUN_FACTS)
+    if fact_index is None:
+        fact = random.choice(FUN_FACTS)
+    else:
+        fact = FUN_FACTS[fact_index % len(FUN_FACTS)]
     
     # Wrap fact text
     max_chars = 50
@@ -293,7 +382,7 @@ def generate_rate_card(currency: str, rate: float, change: float = 0, best_buy:
         draw.text((50, fact_y + 35 + i * 26), line, font=font_fact, fill=COLORS["white"])
     
     # Timestamp and branding
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M GMT+5")
+    timestamp = updated or datetime.now().strftime("%Y-%m-%d %H:%M GMT+5")
     draw.text((30, HEIGHT - 50), f"Updated: {timestamp}", font=font_small, fill=(*COLORS["white"], 180))
     
     # NeoUZS branding
@@ -305,19 +394,135 @@ def generate_rate_card(currency: str, rate: float, change: float = 0, best_buy:
     # Website
     draw.text((30, HEIGHT - 30), "brklyn498.github.io/Neouzsusd", font=font_small, fill=(*COLORS["neon_cyan"], 150))
     
-    # Convert to bytes
+    return img
+
+
+# ==================== ENCODING ====================
+
+@lru_cache(maxsize=4)
+def _canvas(width, height):
+    canvas = Image.new('RGB', (width, height), COLORS["bg_dark"])
+    create_gradient_background(ImageDraw.Draw(canvas), width, height)
+    return canvas
+
+
+def fit_size(img, size):
+    """Scale the card to ``size`` (a SIZES name or (width, height))."""
+    width, height = SIZES[size] if isinstance(size, str) else size
+    if img.size == (width, height):
+        return img
+    side = min(width, height)
+    card = img.resize((side, side), Image.LANCZOS)
+    if (side, side) == (width, height):
+        return card
+    canvas = _canvas(width, height).copy()
+    canvas.paste(card, ((width - side) // 2, (height - side) // 2))
+    return canvas
+
+
+def _save(img, fmt, quality=None, colors=256, optimize=False):
     output = io.BytesIO()
-    img.convert('RGB').save(output, format='PNG', quality=95)
-    output.seek(0)
-    
+    if fmt == "png":
+        img.save(output, format='PNG', optimize=optimize)
+    elif fmt == "png8":
+        img.quantize(colors=colors).save(output, format='PNG', optimize=optimize)
+    elif fmt == "webp":
+        img.save(output, format='WEBP', quality=quality, method=4)
+    elif fmt == "jpeg":
+        img.save(output, format='JPEG', quality=quality, optimize=True, progressive=True)
+    else:
+        raise ValueError(f"unknown format {fmt!r}, expected one of {FORMATS}")
     return output.getvalue()
 
 
+def encode_card(img, fmt="png", size="post", max_bytes=None, optimize=False):
+    """
+    Encode a rendered card.
+    
+    Args:
+        img: Image from render_card_image
+        fmt: "png", "png8" (palette), "webp" or "jpeg"
+        size: A SIZES name or (width, height)
+        max_bytes: Byte budget. webp/jpeg pick the highest quality in
+            QUALITY_RANGE that fits, png8 halves its palette until it fits;
+            png is lossless and only reports whether it fit.
+        optimize: Let png/png8 search for the smallest encoding (~6% smaller,
+            ~4x slower: about 240 ms instead of 60 ms for a post-size PNG)
+    
+    Returns:
+        (bytes, report) where report has format, width, height, bytes,
+        quality, colors, encodes, ms and over_budget
+    """
+    started = time.perf_counter()
+    img = fit_size(img.convert('RGB'), size)
+    quality = colors = None
+    encodes = 1
+    
+    if fmt in ("webp", "jpeg"):
+        if max_bytes:
+            # Binary search for the highest quality within the budget
+            lo, hi = QUALITY_RANGE
+            data = quality = None
+            while lo <= hi:
+                mid = (lo + hi) // 2
+                candidate = _save(img, fmt, mid)
+                encodes += 1
+                if len(candidate) <= max_bytes:
+                    data, quality = candidate, mid
+                    lo = mid + 1
+                else:
+                    hi = mid - 1
+            encodes -= 1
+            if data is None:
+                quality = QUALITY_RANGE[0]
+                data = _save(img, fmt, quality)
+                encodes += 1
+        else:
+            quality = DEFAULT_QUALITY
+            data = _save(img, fmt, quality)
+    elif fmt == "png8":
+        colors = 256
+        data = _save(img, fmt, colors=colors, optimize=optimize)
+        while max_bytes and len(data) > max_bytes and colors > MIN_PALETTE:
+            colors //= 2
+            data = _save(img, fmt, colors=colors, optimize=optimize)
+            encodes += 1
+    else:
+        data = _save(img, fmt, optimize=optimize)
+    
+    report = {
+        "format": fmt, "width": img.width, "height": img.height, "bytes": len(data),
+        "quality": quality, "colors": colors, "encodes": encodes,
+        "ms": round((time.perf_counter() - started) * 1000, 1),
+        "over_budget": bool(max_bytes and len(data) > max_bytes),
+    }
+    return data, report
+
+
+def generate_rate_card(currency: str, rate: float, change: float = 0, best_buy: float = 0, best_sell: float = 0,
+                       fact_index: int = None, updated: str = None,
+                       fmt: str = "png", size="post", max_bytes: int = None, optimize: bool = False,
+                       with_report: bool = False):
+    """
+    Generate a synthwave-styled rate card image.
+    
+    Takes render_card_image's arguments plus encode_card's ``fmt``, ``size``,
+    ``max_bytes`` and ``optimize``.
+    
+    Returns:
+        Encoded image as bytes (PNG by default), or encode_card's
+        (bytes, report) with ``with_report``
+    """
+    img = render_card_image(currency, rate, change, best_buy, best_sell, fact_index, updated)
+    data, report = encode_card(img, fmt, size, max_bytes, optimize)
+    return (data, report) if with_report else data
+
+
 # ==================== TEST ====================
 
 if __name__ == "__main__":
     # Test generation
-    img_bytes = generate_rate_card(
+    card = render_card_image(
         currency="USD",
         rate=12780.50,
         change=+15.30,
@@ -325,7 +530,18 @@ if __name__ == "__main__":
         best_sell=12850
     )
     
+    # Every format at every size, unconstrained and with a 60 KB budget
+    print(f"{'format':<6} {'size':<6} {'budget':>8} {'bytes':>9} {'quality':>8} {'ms':>8}")
+    for size in SIZES:
+        for fmt in FORMATS:
+            for budget in (None, 60_000):
+                data, report = encode_card(card, fmt, size, budget)
+                setting = report["quality"] or report["colors"] or ""
+                print(f"{fmt:<6} {size:<6} {budget or '-':>8} {report['bytes']:>9} {setting:>8} {report['ms']:>8}"
+                      + ("  over budget" if report["over_budget"] else ""))
+    
     # Save test image
+    img_bytes = encode_card(card)[0]
     with open("test_rate_card.png", "wb") as f:
         f.write(img_bytes)
     
@@ -0,0 +1,277 @@
+"""
+Stale-while-revalidate read API for rates.json.
+
+Serves the latest snapshot from memory:
+
+    GET /api/rates          - full snapshot
+    GET /api/rates/{name}   - a scope ("exchange", "savings", "news",
+                              "reliability") or a single top-level key
+                              ("usd", "eur", "weather", "gold_bars", ...)
+
+Every view is serialized once per snapshot and compressed lazily, once per
+encoding, so a request is a dictionary lookup plus a header comparison.
+Responses carry a strong ETag and answer ``If-None-Match`` with 304. The
+body is negotiated as brotli (if the optional ``brotli`` package is
+installed), gzip or identity.
+
+When a scope is older than its TTL the stale data is served immediately and a
+background refresh is started through the refresh coordinator, which already
+collapses concurrent refreshes of the same scope into one run.
+"""
+
+import asyncio
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import time
+
+from aiohttp import web
+
+from scraper import OUTPUT_FILE, SOURCE_TTLS
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SCOPE_KEYS = {
+    "exchange": ("usd", "rub", "eur", "kzt", "gbp", "weather", "gold_bars",
+                 "gold_history", "silver_history", "bitcoin_history"),
+    "savings": ("savings", "savings_usd"),
+    "news": ("news",),
+    "reliability": ("bank_reliability",),
+}
+
+# How old a scope may get before a read triggers a background refresh.
+SCOPE_TTLS = {
+    "exchange": SOURCE_TTLS["rates"],
+    "savings": SOURCE_TTLS["savings"],
+    "news": SOURCE_TTLS["news"],
+    "reliability": SOURCE_TTLS["reliability"],
+}
+
+KEY_SCOPES = {key: scope for scope, keys in SCOPE_KEYS.items() for key in keys}
+
+# Seconds between mtime checks for writes made by other processes.
+WATCH_INTERVAL = 2.0
+
+
+class Representation:
+    """One serialized view with its ETag and lazily built compressed bodies."""
+
+    __slots__ = ("body", "etag", "_encoded")
+
+    def __init__(self, value):
+        self.body = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest()[:20] + '"'
+        self._encoded = {}
+
+    def encoded(self, encoding):
+        """Return ``(body, etag)`` for ``encoding`` ("br", "gzip" or "identity")."""
+        if encoding == "identity":
+            return self.body, self.etag
+        cached = self._encoded.get(encoding)
+        if cached is None:
+            if encoding == "br":
+                body = brotli.compress(self.body, quality=5)
+            else:
+                body = gzip.compress(self.body, compresslevel=6)
+            cached = (body, self.etag[:-1] + "-" + encoding + '"')
+            self._encoded[encoding] = cached
+        return cached
+
+
+class RatesStore:
+    """In-memory copy of rates.json with per-view cached representations."""
+
+    def __init__(self, path=OUTPUT_FILE):
+        self.path = path
+        self.data = {}
+        self.mtime = None
+        self.refreshed_at = {}
+        self._views = {}
+
+    def reload_if_changed(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self.mtime:
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"[rates_api] Failed to load {self.path}: {e}")
+            return False
+        self.data = data
+        self.mtime = mtime
+        self._views = {}
+        self.view(None).encoded("gzip")
+        return True
+
+    def mark_refreshed(self, scope):
+        scopes = SCOPE_KEYS if scope == "all" else (scope,)
+        now = time.time()
+        for s in scopes:
+            self.refreshed_at[s] = now
+
+    def view(self, name):
+        """Return the Representation for ``name`` (None for the full snapshot)."""
+        rep = self._views.get(name)
+        if rep is None:
+            if name is None:
+                value = self.data
+            elif name in SCOPE_KEYS:
+                value = {key: self.data.get(key) for key in SCOPE_KEYS[name]}
+            elif name in self.data:
+                value = self.data[name]
+            else:
+                return None
+            rep = Representation(value)
+            self._views[name] = rep
+        return rep
+
+    def updated_at(self, scope):
+        """Best known wall-clock time ``scope`` was last refreshed."""
+        stamps = [self.refreshed_at.get(scope)]
+        for key in SCOPE_KEYS[scope]:
+            block = self.data.get(key)
+            if isinstance(block, dict):
+                stamps.append(block.get("last_updated_ts"))
+        if scope == "exchange":
+            # Currency blocks carry no timestamp; fall back to the snapshot's.
+            try:
+                last = datetime.datetime.strptime(self.data.get("last_updated", ""), "%Y-%m-%d %H:%M")
+                stamps.append(last.timestamp())
+            except ValueError:
+                pass
+        stamps = [ts for ts in stamps if ts]
+        return max(stamps) if stamps else None
+
+    def stale_scopes(self, name):
+        if name is None:
+            scopes = SCOPE_KEYS
+        elif name in SCOPE_KEYS:
+            scopes = (name,)
+        elif name in KEY_SCOPES:
+            scopes = (KEY_SCOPES[name],)
+        else:
+            scopes = ()
+        now = time.time()
+        stale = []
+        for scope in scopes:
+            updated = self.updated_at(scope)
+            if updated is None or now - updated > SCOPE_TTLS[scope]:
+                stale.append(scope)
+        return stale
+
+
+def negotiate_encoding(accept_encoding):
+    """Pick "br", "gzip" or "identity" from an Accept-Encoding header."""
+    offered = {}
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        offered[token] = q
+    wildcard = offered.get("*", 0.0)
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if offered.get(encoding, wildcard) > 0:
+            return encoding
+    return "identity"
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    base = etag[1:-1]
+    for candidate in if_none_match.split(","):
+        tag = candidate.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        tag = tag.strip('"')
+        if tag == base or tag.rsplit("-", 1)[0] == base:
+            return True
+    return False
+
+
+# ==================== HTTP HANDLERS ====================
+
+def _revalidate(app, stale):
+    coordinator = app.get("coordinator")
+    if coordinator is None:
+        return
+    for scope in stale:
+        coordinator.refresh(scope, force=False)
+
+
+async def handle_rates(request):
+    store = request.app["rates_store"]
+    name = request.match_info.get("name")
+    rep = store.view(name)
+    if rep is None:
+        return web.json_response({"error": f"Unknown scope or key: {name}"}, status=404)
+
+    stale = store.stale_scopes(name)
+    if stale:
+        _revalidate(request.app, stale)
+
+    encoding = negotiate_encoding(request.headers.get("Accept-Encoding"))
+    body, etag = rep.encoded(encoding)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if stale:
+        headers["X-Rates-Stale"] = ",".join(stale)
+
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return web.Response(status=304, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return web.Response(body=body, content_type="application/json", charset="utf-8", headers=headers)
+
+
+async def _watch_rates_file(app):
+    store = app["rates_store"]
+
+    async def watch():
+        while True:
+            await asyncio.sleep(WATCH_INTERVAL)
+            store.reload_if_changed()
+
+    task = asyncio.ensure_future(watch())
+    yield
+    task.cancel()
+
+
+def setup(app, path=OUTPUT_FILE):
+    """Mount the read API on ``app``.
+
+    If the app has a refresh coordinator (see refresh_service.py), stale reads
+    schedule a background refresh and finished refreshes reload the snapshot.
+    """
+    store = RatesStore(path)
+    store.reload_if_changed()
+    app["rates_store"] = store
+    app.cleanup_ctx.append(_watch_rates_file)
+    app.router.add_get("/api/rates", handle_rates)
+    app.router.add_get("/api/rates/{name}", handle_rates)
+    return store
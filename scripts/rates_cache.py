@@ -0,0 +1,84 @@
+"""
+In-memory copy of the current rates snapshot for the Telegram bot.
+
+The bot used to ``json.load`` the whole rates.json (news, savings and all)
+on every /rates, /usd, /banks and button press, and then re-sort the bank
+lists for each reply. ``RatesCache.refresh`` reloads the snapshot only when
+the SnapshotStore version or the file's mtime changes, and precomputes per
+currency what the handlers show:
+
+    cbu, change      - CBU rate and its day-over-day change from history
+    best_buy/sell    - highest buy and lowest sell over all banks
+    top_buy/sell     - the TOP_BANKS best banks each way, already sorted
+
+Nothing else from the file is kept. The bot's rate watcher calls
+``refresh`` off the event loop every few seconds; handlers only read
+``cache.snapshot``, which is swapped in one assignment. Each snapshot also
+carries ``rendered``, the bot's finished replies for it, so they go away
+with the snapshot they were built from.
+"""
+
+import os
+import time
+
+from snapshot_store import SnapshotStore
+
+TOP_BANKS = 5
+
+
+class CurrencyView:
+    __slots__ = ("code", "cbu", "change", "best_buy", "best_sell", "top_buy", "top_sell")
+
+    def __init__(self, code, currency_data, top_n=TOP_BANKS):
+        self.code = code
+        self.cbu = currency_data.get("cbu")
+        history = currency_data.get("history") or []
+        self.change = history[-1]["rate"] - history[-2]["rate"] if len(history) >= 2 else 0
+
+        banks = currency_data.get("banks") or []
+        buys = [b["buy"] for b in banks if b.get("buy") is not None]
+        sells = [b["sell"] for b in banks if b.get("sell") is not None]
+        self.best_buy = max(buys, default=0)
+        self.best_sell = min(sells, default=0)
+        self.top_buy = sorted(banks, key=lambda b: b.get("buy", 0), reverse=True)[:top_n]
+        self.top_sell = sorted(banks, key=lambda b: b.get("sell", float("inf")))[:top_n]
+
+
+class RatesSnapshot:
+    def __init__(self, version, stamp, data, currencies, top_n=TOP_BANKS):
+        self.version = version
+        self.stamp = stamp
+        self.empty = not data
+        self.last_updated = data.get("last_updated", "")
+        self.currencies = {code: CurrencyView(code, data.get(code.lower()) or {}, top_n) for code in currencies}
+        self.loaded_at = time.time()
+        self.rendered = {}  # replies built from this snapshot, filled by the bot
+
+    def cbu_rates(self):
+        return {code: view.cbu for code, view in self.currencies.items()}
+
+
+class RatesCache:
+    def __init__(self, path, currencies, top_n=TOP_BANKS):
+        self.path = str(path)
+        self.store = SnapshotStore(self.path)
+        self.currencies = tuple(currencies)
+        self.top_n = top_n
+        self.snapshot = None
+
+    def stamp(self):
+        """Changes whenever a new rates snapshot is published."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        return self.store.current_version(), mtime
+
+    def refresh(self, force=False):
+        """Reload if the snapshot changed; returns the new RatesSnapshot, or None if unchanged."""
+        stamp = self.stamp()
+        if not force and self.snapshot is not None and stamp == self.snapshot.stamp:
+            return None
+        version, data = self.store.read()
+        self.snapshot = RatesSnapshot(version, stamp, data or {}, self.currencies, self.top_n)
+        return self.snapshot
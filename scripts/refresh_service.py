@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+NeoUZS Refresh Service
+Single-flight HTTP endpoint for on-demand scraper refreshes.
+
+Replaces the exec-per-request path in server.js: all refreshes run inside one
+long-lived Python process that shares a warm aiohttp session.
+
+Endpoints:
+    POST /api/refresh          {"scope": "exchange"} - start or join a refresh
+    GET  /api/refresh/{job_id} - status of a refresh job
+    GET  /api/rates[/{name}]   - cached snapshot reads (see rates_api.py)
+
+Concurrent requests for the same scope join the in-flight run and all get
+the same result; a run of "all" is joined by requests for any scope. Runs
+whose scopes overlap never scrape at the same time: a forced request that
+finds only a background run in flight, or an "all" request that finds
+per-scope runs, queues a new run behind them. A scope that was force-refreshed less than
+MIN_REFRESH_INTERVAL seconds ago is not scraped again; the caller gets 429
+with the last job. Failed runs do not count, so the next request retries. Slow scopes answer 202 immediately with a job ID to poll.
+Background runs started by stale reads (rates_api.py) neither count towards
+that limit nor send rate alert pushes; after one finishes, successful or
+not, stale reads do not start another for the same scope for
+MIN_REFRESH_INTERVAL seconds.
+
+Usage:
+    python scripts/refresh_service.py --port 3060
+"""
+
+import argparse
+import asyncio
+import collections
+import time
+import uuid
+
+import aiohttp
+from aiohttp import web
+
+import rates_api
+import tracing
+from scraper import load_existing_data, save_output, scrape_scope
+
+SCOPES = ("exchange", "savings", "news", "reliability")
+VALID_SCOPES = SCOPES + ("all",)
+
+# Scopes that usually take longer than a client should hold a request open.
+SLOW_SCOPES = {"savings", "news", "all"}
+
+# Seconds after a successful run during which another forced refresh of the
+# same scope is refused, and after any run during which stale reads do not start a
+# background one.
+MIN_REFRESH_INTERVAL = 30
+
+MAX_FINISHED_JOBS = 100
+
+
+def covered_scopes(scope):
+    return SCOPES if scope == "all" else (scope,)
+
+
+class RefreshJob:
+    __slots__ = ("id", "scope", "force", "status", "created_at", "finished_at", "updated_keys", "error", "future")
+
+    def __init__(self, scope, force=True):
+        self.id = uuid.uuid4().hex
+        self.scope = scope
+        self.force = force
+        self.status = "running"
+        self.created_at = time.time()
+        self.finished_at = None
+        self.updated_keys = []
+        self.error = None
+        self.future = asyncio.get_running_loop().create_future()
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "scope": self.scope,
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "updated_keys": self.updated_keys,
+            "error": self.error,
+        }
+
+
+class RefreshCoordinator:
+    """Runs at most one refresh per scope and shares its result with every caller."""
+
+    def __init__(self, session, min_interval=MIN_REFRESH_INTERVAL):
+        self.session = session
+        self.min_interval = min_interval
+        self._inflight = {}
+        self._last_finished = {}
+        self._last_attempt = {}
+        self._jobs = collections.OrderedDict()
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """Call ``callback(job)`` after every successful run."""
+        self._listeners.append(callback)
+
+    def get_job(self, job_id):
+        return self._jobs.get(job_id)
+
+    def retry_after(self, scope):
+        """Seconds until ``scope`` may be force-refreshed again (0 if it may run now)."""
+        last = self._last_finished.get(scope)
+        if not last:
+            return 0
+        return max(0.0, last.finished_at + self.min_interval - time.time())
+
+    def refresh(self, scope, force=True):
+        """Return ``(job, started)`` for ``scope``.
+
+        ``started`` is False when the caller joined an in-flight run or was
+        rate-limited; in the latter case ``job`` is the last successful forced run.
+        A run of ``scope`` or of "all" is joined unless the caller forces and
+        that run does not; a new run first waits for every in-flight run it
+        overlaps with. Non-forced runs (stale-while-revalidate) let each source keep its own
+        TTL check, send no notifications and are skipped (returning the last
+        run) for ``min_interval`` after any run of the scope.
+        """
+        for job in (self._inflight.get(scope), self._inflight.get("all")):
+            if job and (job.force or not force):
+                return job, False
+        if force and self.retry_after(scope) > 0:
+            return self._last_finished[scope], False
+        last = self._last_attempt.get(scope)
+        if not force and last and time.time() - last.finished_at < self.min_interval:
+            # Back off after a background run, so a scope whose refresh keeps
+            # failing is not scraped again on every read.
+            return last, False
+
+        wanted = set(covered_scopes(scope))
+        ahead = [job for job in self._inflight.values() if wanted & set(covered_scopes(job.scope))]
+        job = RefreshJob(scope, force)
+        self._inflight[scope] = job
+        self._remember(job)
+        asyncio.ensure_future(self._run(job, ahead))
+        return job, True
+
+    def _remember(self, job):
+        self._jobs[job.id] = job
+        while len(self._jobs) > MAX_FINISHED_JOBS:
+            self._jobs.popitem(last=False)
+
+    async def _run(self, job, ahead=()):
+        if ahead:
+            print(f"[refresh] {job.scope} queued behind {len(ahead)} run(s) (job {job.id})")
+            # Their futures always get a result, even when the run failed.
+            await asyncio.gather(*(other.future for other in ahead))
+        print(f"[refresh] {job.scope} started (job {job.id})")
+        try:
+            with tracing.run(f"refresh-{job.scope}"):
+                # Reading and committing the snapshot take the store's file
+                # lock and dump the whole file; keep them off the event loop
+                # that serves /api/rates and the other jobs.
+                existing_data = await asyncio.to_thread(load_existing_data)
+                output_data = await scrape_scope(self.session, job.scope, existing_data,
+                                                 force=job.force, notify=job.force)
+                # Merged into the latest snapshot under the store's lock, so
+                # concurrent scopes keep each other's keys.
+                await asyncio.to_thread(save_output, output_data)
+
+            job.status = "done"
+            job.updated_keys = sorted(output_data.keys())
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"[refresh] {job.scope} failed: {e}")
+        finally:
+            job.finished_at = time.time()
+            # A queued follow-up may already have taken this job's slot.
+            if self._inflight.get(job.scope) is job:
+                del self._inflight[job.scope]
+            for scope in {job.scope, *covered_scopes(job.scope)}:
+                self._last_attempt[scope] = job
+                if job.force and job.status == "done":
+                    self._last_finished[scope] = job
+            job.future.set_result(job)
+
+        if job.status == "done":
+            for callback in self._listeners:
+                try:
+                    callback(job)
+                except Exception as e:
+                    print(f"[refresh] listener failed: {e}")
+        print(f"[refresh] {job.scope} {job.status} in {job.finished_at - job.created_at:.1f}s")
+
+
+# ==================== HTTP HANDLERS ====================
+
+def _job_response(job, status=200, **extra):
+    body = {"success": job.status != "failed", **job.to_dict(), **extra}
+    if job.status == "failed":
+        body["message"] = job.error
+        status = 500
+    return web.json_response(body, status=status)
+
+
+async def handle_refresh(request):
+    coordinator = request.app["coordinator"]
+    scope = "exchange"
+    if request.can_read_body:
+        try:
+            payload = await request.json()
+        except ValueError as e:
+            return web.json_response({"error": f"Invalid JSON body: {e}"}, status=400)
+        if not isinstance(payload, dict):
+            return web.json_response({"error": "Request body must be a JSON object"}, status=400)
+        scope = payload.get("scope") or scope
+
+    if scope not in VALID_SCOPES:
+        return web.json_response({"error": f"Unknown scope: {scope}"}, status=400)
+
+    job, started = coordinator.refresh(scope)
+
+    if not started and job.status != "running":
+        retry_after = coordinator.retry_after(scope)
+        response = _job_response(job, status=429, rate_limited=True, retry_after=round(retry_after, 1))
+        response.headers["Retry-After"] = str(max(1, int(retry_after + 0.5)))
+        return response
+
+    if scope in SLOW_SCOPES:
+        return web.json_response(
+            {"success": True, "coalesced": not started, "status_url": f"/api/refresh/{job.id}", **job.to_dict()},
+            status=202,
+        )
+
+    await asyncio.shield(job.future)
+    return _job_response(job, coalesced=not started, message="Scraper executed successfully")
+
+
+async def handle_job_status(request):
+    job = request.app["coordinator"].get_job(request.match_info["job_id"])
+    if not job:
+        return web.json_response({"error": "Unknown job"}, status=404)
+    if job.status == "failed":
+        return _job_response(job)
+    return web.json_response({"success": True, **job.to_dict()})
+
+
+@web.middleware
+async def cors_middleware(request, handler):
+    if request.method == "OPTIONS":
+        response = web.Response(status=204)
+    else:
+        response = await handler(request)
+    response.headers["Access-Control-Allow-Origin"] = "*"
+    response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
+    response.headers["Access-Control-Allow-Headers"] = "Content-Type"
+    return response
+
+
+async def _client_session(app):
+    async with aiohttp.ClientSession() as session:
+        coordinator = RefreshCoordinator(session, app["min_interval"])
+        store = app["rates_store"]
+
+        def on_refreshed(job):
+            store.mark_refreshed(job.scope)
+            store.reload_if_changed()
+
+        coordinator.add_listener(on_refreshed)
+        app["coordinator"] = coordinator
+        yield
+
+
+def create_app(min_interval=MIN_REFRESH_INTERVAL):
+    app = web.Application(middlewares=[cors_middleware])
+    app["min_interval"] = min_interval
+    app.cleanup_ctx.append(_client_session)
+    app.router.add_post("/api/refresh", handle_refresh)
+    app.router.add_get("/api/refresh/{job_id}", handle_job_status)
+    rates_api.setup(app)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-flight refresh service for the NeoUZS scraper")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3060)
+    parser.add_argument("--min-interval", type=float, default=MIN_REFRESH_INTERVAL,
+                        help="Seconds before the same scope may be force-refreshed again")
+    args = parser.parse_args()
+
+    web.run_app(create_app(args.min_interval), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
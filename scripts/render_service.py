@@ -0,0 +1,117 @@
+"""
+Rate card rendering off the bot's event loop.
+
+``generate_rate_card`` is pure-Python Pillow work that holds the GIL for
+the whole render, so calling it inside a handler (or in a thread) stalls
+every other chat while a card is drawn. ``RenderService`` runs renders in a
+ProcessPoolExecutor instead, one render per core at a time:
+
+    max_pending   renders queued or running at once; past that ``render``
+                  raises RenderBusy at once instead of queueing, so a burst of
+                  /usd commands cannot build an unbounded backlog
+    timeout       seconds a caller waits for its card before giving up
+                  (asyncio.TimeoutError); the worker finishes the job anyway
+                  and its slot is freed only then
+
+Callers fall back to a text reply on either error. The pool is created on
+the first render, so PIL is imported in the workers and never in the bot
+process. If a worker dies the pool is rebuilt on the next render.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+RENDER_TIMEOUT = 20
+PENDING_PER_WORKER = 2
+
+
+class RenderBusy(Exception):
+    pass
+
+
+def rate_card(**kwargs):
+    """Runs in a worker process: render one rate card.
+
+    Returns ``(image, report)``: the encoded bytes and encode_card's report
+    (format, size, quality, bytes, encode time, whether it fit the budget).
+    """
+    import rate_card_generator
+    return rate_card_generator.generate_rate_card(**kwargs, with_report=True)
+
+
+def encode_summary(report):
+    """One line describing a rate_card encode report, for logs."""
+    if report["quality"]:
+        setting = f"quality {report['quality']}"
+    elif report["colors"]:
+        setting = f"{report['colors']} colors"
+    else:
+        setting = "lossless"
+    text = (f"{report['format']} {report['width']}x{report['height']}, {report['bytes']} bytes "
+            f"({setting}, {report['encodes']} encodes, {report['ms']} ms)")
+    return text + (", over budget" if report["over_budget"] else "")
+
+
+def _call_soon(loop, callback):
+    try:
+        loop.call_soon_threadsafe(callback)
+    except RuntimeError:
+        pass  # loop already closed (bot shutting down)
+
+
+class RenderService:
+    def __init__(self, workers=None, max_pending=None, timeout=RENDER_TIMEOUT):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * PENDING_PER_WORKER
+        self.timeout = timeout
+        self.pending = 0
+        self.counts = {"rendered": 0, "rejected": 0, "timeouts": 0, "failed": 0}
+        self._executor = None
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def _release(self):
+        self.pending -= 1
+
+    async def render(self, func, **kwargs):
+        """Run ``func(**kwargs)`` in a worker; ``func`` must be a picklable module-level function."""
+        if self.pending >= self.max_pending:
+            self.counts["rejected"] += 1
+            raise RenderBusy(f"{self.pending} renders pending")
+        loop = asyncio.get_running_loop()
+        try:
+            job = self._pool().submit(func, **kwargs)
+        except BrokenProcessPool:
+            self._executor = None
+            job = self._pool().submit(func, **kwargs)
+        self.pending += 1
+        # Count the slot until the worker is really done, not until we stop waiting.
+        job.add_done_callback(lambda _: _call_soon(loop, self._release))
+        try:
+            result = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(job)), self.timeout)
+        except asyncio.TimeoutError:
+            job.cancel()
+            self.counts["timeouts"] += 1
+            raise
+        except BrokenProcessPool:
+            self._executor = None
+            self.counts["failed"] += 1
+            raise
+        except Exception:
+            self.counts["failed"] += 1
+            raise
+        self.counts["rendered"] += 1
+        return result
+
+    def stats(self):
+        return {"workers": self.workers, "pending": self.pending, "max_pending": self.max_pending, **self.counts}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
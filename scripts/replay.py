@@ -0,0 +1,85 @@
+"""
+Record and replay HTTP responses for deterministic scraper runs.
+
+``scraper.py --record DIR`` saves every successful response body;
+``scraper.py --replay DIR`` serves responses from DIR and never touches the
+network (a URL that was not recorded behaves like a failed fetch). Profiling
+and benchmarks use replay so two runs parse exactly the same bytes.
+
+Layout of DIR:
+
+    <key>.body   - raw response body
+    index.json   - {key: {"url": ..., "bytes": ...}} for humans and tools
+
+The key is a SHA-1 of the URL with credential query parameters (``key``,
+``apiKey``, ...) removed, so recordings neither depend on nor leak API keys.
+"""
+
+import hashlib
+import json
+import os
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+SECRET_PARAMS = {"key", "apikey", "api-key", "api_key", "token", "access_token"}
+
+record_dir = None
+replay_dir = None
+
+
+def configure(record=None, replay=None):
+    global record_dir, replay_dir
+    record_dir = record
+    replay_dir = replay
+    for directory in (record, replay):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+
+def replaying():
+    return replay_dir is not None
+
+
+def normalize_url(url):
+    """Drop credential query parameters from ``url``."""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if k.lower() not in SECRET_PARAMS]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+def key_for(url):
+    return hashlib.sha1(normalize_url(url).encode("utf-8")).hexdigest()
+
+
+def save(directory, url, content):
+    """Store ``content`` as the recorded response for ``url`` in ``directory``."""
+    key = key_for(url)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"{key}.body"), "wb") as f:
+        f.write(content)
+
+    index_path = os.path.join(directory, "index.json")
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+    index[key] = {"url": normalize_url(url), "bytes": len(content)}
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, index_path)
+
+
+def load(directory, url):
+    """Return the recorded body for ``url``, or None if it was not recorded."""
+    try:
+        with open(os.path.join(directory, f"{key_for(url)}.body"), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def record(url, content):
+    if record_dir and content:
+        save(record_dir, url, content)
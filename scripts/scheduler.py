@@ -0,0 +1,87 @@
+"""
+TTL-driven scheduler for the long-running scraper daemon.
+
+Each source is registered once with its freshness window (TTL). The scheduler
+keeps a single heap of due times and starts a source's job as soon as its TTL
+expires, measured from the end of the previous run. A source never runs twice
+at the same time; a failed run is retried after ``retry_delay`` (capped at the
+source's TTL) instead of waiting a full window.
+"""
+
+import asyncio
+import heapq
+import time
+
+
+class TTLScheduler:
+    def __init__(self, retry_delay=60):
+        self.retry_delay = retry_delay
+        self._jobs = {}
+        self._heap = []
+        self._running = set()
+        self._wakeup = None
+
+    def add(self, name, ttl, job, last_run_ts=None):
+        """Register ``job`` (an async callable) to run every ``ttl`` seconds.
+
+        ``last_run_ts`` is the wall-clock time the source was last refreshed,
+        e.g. the ``last_updated_ts`` already in rates.json, so a daemon
+        restart does not refetch sources that are still fresh.
+        """
+        self._jobs[name] = {"ttl": ttl, "job": job}
+        delay = 0.0
+        if last_run_ts:
+            delay = max(0.0, last_run_ts + ttl - time.time())
+        self._push(name, delay)
+
+    def _push(self, name, delay):
+        heapq.heappush(self._heap, (time.monotonic() + delay, name))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def next_due(self):
+        """Return ``{name: seconds_until_due}`` for every scheduled source."""
+        now = time.monotonic()
+        return {name: max(0.0, due - now) for due, name in sorted(self._heap)}
+
+    async def _run_job(self, name):
+        entry = self._jobs[name]
+        started = time.monotonic()
+        try:
+            await entry["job"]()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[scheduler] {name} failed after {time.monotonic() - started:.1f}s: {e}")
+            self._push(name, min(entry["ttl"], self.retry_delay))
+        else:
+            print(f"[scheduler] {name} refreshed in {time.monotonic() - started:.1f}s, next in {entry['ttl']}s")
+            self._push(name, entry["ttl"])
+        finally:
+            self._running.discard(name)
+
+    async def run(self):
+        """Run forever, starting each source when it becomes due."""
+        self._wakeup = asyncio.Event()
+        tasks = set()
+        try:
+            while True:
+                self._wakeup.clear()
+                now = time.monotonic()
+                while self._heap and self._heap[0][0] <= now:
+                    _, name = heapq.heappop(self._heap)
+                    if name in self._running:
+                        continue
+                    self._running.add(name)
+                    task = asyncio.ensure_future(self._run_job(name))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+
+                timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for task in tasks:
+                task.cancel()
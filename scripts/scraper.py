@@ -5,12 +5,16 @@ import random
 import datetime
 import os
 import time
-from bs4 import BeautifulSoup
 from bank_mapping import get_bank_logo
-import firebase_admin
-from firebase_admin import credentials, messaging, firestore
-import feedparser
-from dateutil import parser as date_parser
+from models import BankRate, Deposit, NewsItem, HistoryPoint, BankReliability, to_dicts, from_dicts
+from snapshot_store import SnapshotStore
+from fetch_pipeline import fetch_and_parse
+from lazy_imports import lazy, print_startup_profile, print_deferred_imports
+import tracing
+import replay
+import profiling
+import push_topics
+import token_cache
 import hashlib
 import argparse
 import re
@@ -18,6 +22,16 @@ from functools import partial
 
 OUTPUT_FILE = "public/rates.json"
 
+# Heavy dependencies are imported on first use: a reliability run needs none of
+# them and an exchange run without FIREBASE_CREDENTIALS never loads Firebase.
+bs4 = lazy("bs4")
+feedparser = lazy("feedparser")
+date_parser = lazy("dateutil.parser")
+firebase_admin = lazy("firebase_admin")
+credentials = lazy("firebase_admin.credentials")
+firestore = lazy("firebase_admin.firestore")
+card_prerender = lazy("card_prerender")
+
 # List of popular banks to prioritize
 POPULAR_BANKS_NAMES = ["Kapitalbank", "Hamkorbank", "Ipak Yuli Bank", "O‘zbekiston Milliy banki", "O‘zsanoatqurilishbank"]
 
@@ -54,6 +68,18 @@ CURRENCY_CONFIG = {
     }
 }
 
+# Freshness window (seconds) per source. The one-shot scopes skip sources that
+# are still inside their window; the daemon refreshes each one when it expires.
+SOURCE_TTLS = {
+    "rates": 60,             # CBU + bank.uz quotes (CBU itself is fetched once a day)
+    "weather": 3600,
+    "gold_bars": 3600,
+    "metals_history": 1800,  # Polygon gold / silver / bitcoin
+    "news": 1800,
+    "savings": 86400,
+    "reliability": 86400,
+}
+
 SOURCE_RELIABILITY = {
     "CBU": {"tier": "official", "score": 1.0, "label": "OFFICIAL"},
     "IMF": {"tier": "official", "score": 1.0, "label": "OFFICIAL"},
@@ -71,29 +97,71 @@ def get_reliability(source_name):
 def get_uzt_time():
     return datetime.datetime.now(datetime.timezone(datetime.timedelta(hours=5)))
 
+def make_soup(markup):
+    """Build a BeautifulSoup tree (traced as the "soup" stage)."""
+    with tracing.span("soup", bytes=len(markup)):
+        return bs4.BeautifulSoup(markup, 'html.parser')
+
+def make_record(cls, source, **fields):
+    """Build a ``cls`` record, or log the bad field and return None.
+
+    Records raise TypeError for a missing, unknown or wrongly typed field;
+    one bad entry must not take the rest of its page or feed down with it.
+    """
+    try:
+        return cls(**fields)
+    except TypeError as e:
+        print(f"Skipping {source} entry: {e}")
+        return None
+
 async def async_fetch_url(session, url, retries=3, delay=2, use_proxy=False):
     """Asynchronously fetches a URL with retries."""
+    if replay.replaying():
+        with tracing.span("fetch", host=tracing.host_of(url), cache_hit=False, replayed=True) as span:
+            content = replay.load(replay.replay_dir, url)
+            if content is None:
+                print(f"No recording for {url}.")
+                span.set(outcome="failed")
+            else:
+                span.set(bytes=len(content))
+            return content
+
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
         "Accept-Language": "en-US,en;q=0.9,uz;q=0.8,ru;q=0.7",
         "Referer": "https://www.google.com/"
     }
-    for i in range(retries):
-        try:
-            # Increased timeout to 30s and disabled SSL verification to avoid handshake errors
-            async with session.get(url, headers=headers, timeout=30, ssl=False) as response:
-                if response.status == 200:
-                    return await response.read()
-                elif response.status == 403:
-                    print(f"403 Forbidden at {url}. Retrying in {delay}s...")
-                    await asyncio.sleep(delay)
-                else:
-                    print(f"Status {response.status} at {url}.")
-        except Exception as e:
-            print(f"Error fetching {url}: {e}")
-        await asyncio.sleep(delay)
-    return None
+    with tracing.span("fetch", host=tracing.host_of(url), cache_hit=False) as span:
+        for i in range(retries):
+            span.set(retries=i)
+            try:
+                # Increased timeout to 30s and disabled SSL verification to avoid handshake errors
+                async with session.get(url, headers=headers, timeout=30, ssl=False) as response:
+                    if response.status == 200:
+                        content = await response.read()
+                        span.set(bytes=len(content), status=200)
+                        replay.record(url, content)
+                        return content
+                    elif response.status == 403:
+                        print(f"403 Forbidden at {url}. Retrying in {delay}s...")
+                        await asyncio.sleep(delay)
+                    else:
+                        print(f"Status {response.status} at {url}.")
+                    span.set(status=response.status)
+            except Exception as e:
+                print(f"Error fetching {url}: {e}")
+                span.set(error=str(e) or type(e).__name__)
+            await asyncio.sleep(delay)
+        span.set(outcome="failed")
+        return None
+
+async def async_fetch_pages(session, jobs):
+    """Fetch and parse ``[(url, parse), ...]`` through the bounded pipeline.
+
+    A job's result is None if its page could not be fetched or parsed.
+    """
+    return await fetch_and_parse(partial(async_fetch_url, session), jobs)
 
 async def async_fetch_cbu_rate(session, currency_code="USD", date_str=None):
     if date_str:
@@ -124,27 +192,27 @@ async def async_fetch_cbu_history_full(session, currency_code="USD", days=30):
         date_str = date_obj.strftime("%Y-%m-%d")
         rate = await async_fetch_cbu_rate(session, currency_code, date_str)
         if rate:
-            history.append({"date": date_str, "rate": rate})
+            history.append(HistoryPoint(date=date_str, rate=rate))
         await asyncio.sleep(0.1)
-    history.sort(key=lambda x: x['date'])
-    return history
+    history.sort(key=lambda x: x.date)
+    return to_dicts(history)
 
 async def async_update_history(session, existing_history, currency_code, today_rate, today_date_str):
     if not existing_history:
         return await async_fetch_cbu_history_full(session, currency_code)
-    history = list(existing_history)
+    history = from_dicts(HistoryPoint, existing_history)
     exists = False
     for item in history:
-        if item['date'] == today_date_str:
-            item['rate'] = today_rate
+        if item.date == today_date_str:
+            item.rate = today_rate
             exists = True
             break
     if not exists:
-        history.append({"date": today_date_str, "rate": today_rate})
-    history.sort(key=lambda x: x['date'])
+        history.append(HistoryPoint(date=today_date_str, rate=today_rate))
+    history.sort(key=lambda x: x.date)
     if len(history) > 30:
         history = history[-30:]
-    return history
+    return to_dicts(history)
 
 def parse_rate(rate_str):
     try:
@@ -180,7 +248,7 @@ def parse_bank_list(container):
 
 def parse_bank_uz_content(content, currency_code, cbu_rate, config):
     try:
-        soup = BeautifulSoup(content, 'html.parser')
+        soup = make_soup(content)
         left_containers = soup.find_all(class_='bc-inner-block-left')
         right_containers = soup.find_all(class_='bc-inner-blocks-right')
 
@@ -215,19 +283,20 @@ def parse_bank_uz_content(content, currency_code, cbu_rate, config):
             buy = target_buy_list.get(name)
             sell = target_sell_list.get(name)
             if buy and sell:
-                combined_banks.append({
-                    "name": name,
-                    "buy": buy,
-                    "sell": sell,
-                    "logo": get_bank_logo(name),
-                    "is_mock": False,
-                    "featured": False
-                })
+                bank = make_record(BankRate, f"bank.uz {currency_code}",
+                    name=name,
+                    buy=buy,
+                    sell=sell,
+                    logo=get_bank_logo(name),
+                    is_mock=False,
+                    featured=False
+                )
+                if bank: combined_banks.append(bank)
 
         popular_selected = []
         def find_bank(partial_name):
             for b in combined_banks:
-                if partial_name.lower() in b['name'].lower():
+                if partial_name.lower() in b.name.lower():
                     return b
             return None
 
@@ -243,8 +312,8 @@ def parse_bank_uz_content(content, currency_code, cbu_rate, config):
             cbu_rate = config["fallback_rate"]
 
         def calculate_deviation(bank):
-            dev_buy = abs(bank['buy'] - cbu_rate)
-            dev_sell = abs(bank['sell'] - cbu_rate)
+            dev_buy = abs(bank.buy - cbu_rate)
+            dev_sell = abs(bank.sell - cbu_rate)
             return max(dev_buy, dev_sell)
 
         sorted_by_dev = sorted(combined_banks, key=calculate_deviation, reverse=True)
@@ -257,7 +326,7 @@ def parse_bank_uz_content(content, currency_code, cbu_rate, config):
 
         featured_list = popular_selected + deviants_selected
         for bank in featured_list:
-            bank["featured"] = True
+            bank.featured = True
 
         return combined_banks
     except Exception as e:
@@ -270,16 +339,11 @@ async def async_fetch_bank_uz_rates(session, currency_code, cbu_rate):
     url = config["bank_uz_url"]
     print(f"Scraping {url} for {currency_code}...")
 
-    content = await async_fetch_url(session, url)
-    if not content:
-        print(f"Failed to fetch {url}.")
-        return None
-
-    # Offload parsing to thread pool
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(
-        None, partial(parse_bank_uz_content, content, currency_code, cbu_rate, config)
-    )
+    # None if the page could not be fetched or parsed; the pipeline logs which.
+    [banks] = await async_fetch_pages(session, [
+        (url, partial(parse_bank_uz_content, currency_code=currency_code, cbu_rate=cbu_rate, config=config))
+    ])
+    return banks
 
 def generate_mock_banks(currency_code, base_rate):
     config = CURRENCY_CONFIG.get(currency_code)
@@ -296,14 +360,14 @@ def generate_mock_banks(currency_code, base_rate):
         variance_sell = random.randint(variance_min, variance_max)
         buy_rate = base_rate - variance_buy
         sell_rate = base_rate + variance_sell
-        results.append({
-            "name": bank["name"],
-            "buy": int(buy_rate),
-            "sell": int(sell_rate),
-            "logo": get_bank_logo(bank["name"]),
-            "is_mock": True,
-            "featured": i < 5
-        })
+        results.append(BankRate(
+            name=bank["name"],
+            buy=int(buy_rate),
+            sell=int(sell_rate),
+            logo=get_bank_logo(bank["name"]),
+            is_mock=True,
+            featured=i < 5
+        ))
     return results
 
 async def async_process_currency(session, currency_code, existing_data):
@@ -323,6 +387,7 @@ async def async_process_currency(session, currency_code, existing_data):
         last_updated = existing_currency_data.get('cbu_last_updated')
         if last_updated == today_str:
             should_fetch_cbu = False
+            tracing.cache_hit(host="cbu.uz")
             cbu_rate = existing_currency_data.get('cbu')
             cbu_last_updated = last_updated
             history_data = existing_currency_data.get('history', [])
@@ -361,10 +426,10 @@ async def async_process_currency(session, currency_code, existing_data):
         "cbu": cbu_rate,
         "cbu_last_updated": cbu_last_updated,
         "history": history_data,
-        "banks": final_banks
+        "banks": to_dicts(final_banks)
     }
 
-async def async_fetch_iqair_data(session, existing_data):
+async def async_fetch_iqair_data(session, existing_data, force=False):
     print("--- Processing IQAir Weather Data ---")
     api_key = os.environ.get("IQAIR_API_KEY")
     if not api_key:
@@ -382,13 +447,14 @@ async def async_fetch_iqair_data(session, existing_data):
     if not api_key:
         return existing_data.get("weather") if existing_data else None
 
-    if existing_data and existing_data.get("weather"):
+    if not force and existing_data and existing_data.get("weather"):
         last_weather_update = existing_data["weather"].get("last_updated_ts")
         if last_weather_update:
              try:
                 last_time = datetime.datetime.fromtimestamp(last_weather_update)
                 now = datetime.datetime.now()
-                if (now - last_time).total_seconds() < 3600:
+                if (now - last_time).total_seconds() < SOURCE_TTLS["weather"]:
+                    tracing.cache_hit()
                     return existing_data["weather"]
              except Exception:
                 pass
@@ -491,20 +557,20 @@ def parse_savings_card(card):
                     is_online = True
 
         if rate_val > 0:
-            return {
-                "bank_name": bank_name,
-                "deposit_name": deposit_name,
-                "rate": rate_val,
-                "duration": duration_str,
-                "min_amount": min_amount_str,
-                "is_online": is_online,
-                "logo": get_bank_logo(bank_name)
-            }
+            return make_record(Deposit, "savings",
+                bank_name=bank_name,
+                deposit_name=deposit_name,
+                rate=rate_val,
+                duration=duration_str,
+                min_amount=min_amount_str,
+                is_online=is_online,
+                logo=get_bank_logo(bank_name)
+            )
     except Exception: pass
     return None
 
 def parse_savings_html(content):
-    soup = BeautifulSoup(content, 'html.parser')
+    soup = make_soup(content)
     cards = soup.find_all(class_='table-card-offers-bottom')
     results = []
     for card in cards:
@@ -512,6 +578,8 @@ def parse_savings_html(content):
         if res: results.append(res)
     return results
 
+SAVINGS_URL = "https://bank.uz/uz/deposits/sumovye-vklady"
+
 async def async_fetch_savings_rates(session, existing_data, force=False):
     print("--- Processing Savings Data ---")
     if not force and existing_data and existing_data.get("savings"):
@@ -519,12 +587,14 @@ async def async_fetch_savings_rates(session, existing_data, force=False):
         if last_ts:
             last_time = datetime.datetime.fromtimestamp(last_ts)
             now = datetime.datetime.now()
-            if (now - last_time).total_seconds() < 86400:
+            if (now - last_time).total_seconds() < SOURCE_TTLS["savings"]:
+                tracing.cache_hit()
                 return existing_data["savings"]
 
-    url = "https://bank.uz/uz/deposits/sumovye-vklady"
-    content = await async_fetch_url(session, url)
-    if not content:
+    url = SAVINGS_URL
+    [savings_list] = await async_fetch_pages(session, [(url, parse_savings_html)])
+    if savings_list is None:
+        # Fetch or parse failed (logged by the pipeline).
         # Fallback: if existing data exists, return it.
         # If not, return an empty structure so we don't end up with null in rates.json
         if existing_data and existing_data.get("savings"):
@@ -535,18 +605,16 @@ async def async_fetch_savings_rates(session, existing_data, force=False):
             "data": []
         }
 
-    loop = asyncio.get_running_loop()
-    savings_list = await loop.run_in_executor(None, parse_savings_html, content)
-    savings_list.sort(key=lambda x: x['rate'], reverse=True)
+    savings_list.sort(key=lambda x: x.rate, reverse=True)
 
     return {
         "last_updated": datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
         "last_updated_ts": datetime.datetime.now().timestamp(),
-        "data": savings_list
+        "data": to_dicts(savings_list)
     }
 
 def parse_usd_savings_html(content):
-    soup = BeautifulSoup(content, 'html.parser')
+    soup = make_soup(content)
     cards = soup.find_all(class_='table-card-offers-bottom')
     results = []
     for card in cards:
@@ -574,19 +642,23 @@ def parse_usd_savings_html(content):
             elif 'usd' in deposit_name.lower() or 'dollar' in deposit_name.lower(): currency = "USD"
 
             if rate_val > 0:
-                results.append({
-                    "bank_name": bank_name,
-                    "deposit_name": deposit_name,
-                    "rate": rate_val,
-                    "duration": duration_str,
-                    "min_amount": min_amount_str,
-                    "is_online": is_online,
-                    "currency": currency,
-                    "logo": get_bank_logo(bank_name)
-                })
+                deposit = make_record(Deposit, "USD savings",
+                    bank_name=bank_name,
+                    deposit_name=deposit_name,
+                    rate=rate_val,
+                    duration=duration_str,
+                    min_amount=min_amount_str,
+                    is_online=is_online,
+                    currency=currency,
+                    logo=get_bank_logo(bank_name)
+                )
+                if deposit: results.append(deposit)
         except Exception: continue
     return results
 
+USD_SAVINGS_URL = "https://bank.uz/uz/deposits/valyutnye-vklady"
+USD_SAVINGS_PAGES = 5
+
 async def async_fetch_usd_savings_rates(session, existing_data, force=False):
     print("--- Processing USD Savings Data ---")
     if not force and existing_data and existing_data.get("savings_usd"):
@@ -594,18 +666,19 @@ async def async_fetch_usd_savings_rates(session, existing_data, force=False):
         if last_ts:
             last_time = datetime.datetime.fromtimestamp(last_ts)
             now = datetime.datetime.now()
-            if (now - last_time).total_seconds() < 86400:
+            if (now - last_time).total_seconds() < SOURCE_TTLS["savings"]:
+                tracing.cache_hit()
                 return existing_data["savings_usd"]
 
-    base_url = "https://bank.uz/uz/deposits/valyutnye-vklady"
-    tasks = []
-    for page_num in range(1, 6):
+    base_url = USD_SAVINGS_URL
+    jobs = []
+    for page_num in range(1, USD_SAVINGS_PAGES + 1):
         url = base_url if page_num == 1 else f"{base_url}?PAGEN_3={page_num}"
-        tasks.append(async_fetch_url(session, url))
+        jobs.append((url, parse_usd_savings_html))
 
-    responses = await asyncio.gather(*tasks)
-    # Check if all responses are None, which means fetch failed entirely
-    if all(r is None for r in responses):
+    pages = await async_fetch_pages(session, jobs)
+    # Check if all pages are None, which means every fetch or parse failed
+    if all(p is None for p in pages):
          if existing_data and existing_data.get("savings_usd"):
             return existing_data.get("savings_usd")
          # Return empty structure instead of None
@@ -615,29 +688,118 @@ async def async_fetch_usd_savings_rates(session, existing_data, force=False):
             "data": []
         }
 
-    loop = asyncio.get_running_loop()
     savings_list = []
-    for content in responses:
-        if not content: continue
-        page_results = await loop.run_in_executor(None, parse_usd_savings_html, content)
-        savings_list.extend(page_results)
+    for page_results in pages:
+        if page_results: savings_list.extend(page_results)
 
     # Deduplicate
     seen = set()
     unique_list = []
     for item in savings_list:
-        key = f"{item['bank_name']}-{item['deposit_name']}"
+        key = f"{item.bank_name}-{item.deposit_name}"
         if key not in seen:
             seen.add(key)
             unique_list.append(item)
-    unique_list.sort(key=lambda x: x['rate'], reverse=True)
+    unique_list.sort(key=lambda x: x.rate, reverse=True)
 
     return {
         "last_updated": datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
         "last_updated_ts": datetime.datetime.now().timestamp(),
-        "data": unique_list
+        "data": to_dicts(unique_list)
     }
 
+NEWS_SOURCES = [
+    {"name": "Gazeta.uz", "rss": "https://www.gazeta.uz/en/rss/", "default_cat": "general", "lang": "EN"},
+    {"name": "Kapital.uz", "rss": "https://kapital.uz/feed/", "default_cat": "business", "lang": "RU"},
+    {"name": "UzDaily", "rss": "https://uzdaily.uz/en/rss", "default_cat": "business", "lang": "EN"},
+    {"name": "Spot.uz", "rss": "https://www.spot.uz/rss", "default_cat": "business", "lang": "RU"},
+    {"name": "Spot.uz", "rss": "https://www.spot.uz/oz/rss/", "default_cat": "business", "lang": "UZ"},
+]
+
+RSS_ENTRIES_PER_FEED = 10
+
+CBU_NEWS_URL = "https://cbu.uz/en/press_center/news/"
+IMF_NEWS_URL = "https://www.imf.org/en/Countries/UZB"
+WORLDBANK_NEWS_URL = "https://www.worldbank.org/en/country/uzbekistan"
+
+NEWS_CATEGORIES = {
+    "economy": ["gdp", "inflation", "cpi", "fiscal", "budget", "imf", "world bank", "adb", "growth", "tax", "reform", "debt", "ввп", "инфляция", "бюджет", "мвф", "всемирный банк", "рост", "налог", "реформа", "долг", "экономика"],
+    "banking": ["cbu", "central bank", "deposit", "loan", "interest rate", "mortgage", "atm", "visa", "mastercard", "fintech", "цб", "центробанк", "банк", "вклад", "кредит", "ставка", "ипотека", "банкомат", "финтех", "cb"],
+    "markets": ["stock", "exchange", "uzse", "ipo", "dividend", "commodity", "gold", "silver", "oil", "gas", "bitcoin", "crypto", "биржа", "акции", "рфб", "ipo", "дивиденд", "сырье", "золото", "серебро", "нефть", "газ", "биткоин", "крипто", "рынок"],
+    "business": ["startup", "investment", "profit", "revenue", "merger", "acquisition", "export", "import", "trade", "company", "стартап", "инвестиции", "прибыль", "выручка", "слияние", "поглощение", "экспорт", "импорт", "торговля", "компания", "бизнес"],
+    "regulation": ["law", "decree", "president", "parliament", "cabinet", "policy", "rule", "license", "ban", "permit", "закон", "указ", "президент", "парламент", "кабмин", "политика", "правило", "лицензия", "запрет", "разрешение"]
+}
+
+def determine_category(title, summary, default):
+    text = (title + " " + summary).lower()
+    for cat, keywords in NEWS_CATEGORIES.items():
+        for keyword in keywords:
+            if keyword in text:
+                return cat.capitalize()
+    return default.capitalize()
+
+def parse_rss_feed(content, source):
+    """Parse one RSS feed from NEWS_SOURCES into NewsItem records."""
+    news_items = []
+    try:
+        feed = feedparser.parse(content)
+        for entry in feed.entries[:RSS_ENTRIES_PER_FEED]:
+            id_str = f"{source['name']}-{entry.link}"
+            item_id = hashlib.md5(id_str.encode()).hexdigest()
+            published_at = ""
+            published_ts = 0
+            if hasattr(entry, 'published'):
+                try:
+                    dt = date_parser.parse(entry.published)
+                    published_at = dt.isoformat()
+                    published_ts = dt.timestamp()
+                except: pass
+
+            image_url = None
+            if hasattr(entry, 'media_content'):
+                 for media in entry.media_content:
+                     if 'url' in media:
+                         image_url = media['url']
+                         break
+            if not image_url and hasattr(entry, 'summary'):
+                s = make_soup(entry.summary)
+                img = s.find('img')
+                if img and img.get('src'): image_url = img['src']
+
+            full_content = ""
+            if hasattr(entry, 'content') and entry.content:
+                full_content = make_soup(entry.content[0].get('value', '')).get_text(strip=True)
+            elif hasattr(entry, 'summary'):
+                full_content = make_soup(entry.summary).get_text(strip=True)
+            if len(full_content) > 2000: full_content = full_content[:2000] + "..."
+            summary_clean = full_content[:200] + "..." if len(full_content) > 200 else full_content
+            category = determine_category(entry.title, summary_clean, source["default_cat"])
+            reliability = get_reliability(source["name"])
+
+            item = make_record(NewsItem, source["name"],
+                id=item_id, title=entry.title, summary=summary_clean, full_content=full_content,
+                source=source["name"], source_url=entry.link, category=category, language=source["lang"],
+                published_at=published_at, published_ts=published_ts, image_url=image_url,
+                is_breaking=False, reliability_tier=reliability["tier"], reliability_score=reliability["score"],
+                reliability_label=reliability["label"]
+            )
+            if item: news_items.append(item)
+    except Exception: pass
+    return news_items
+
+def merge_news(all_news, extra_lists):
+    """Append items from ``extra_lists`` whose title (first 50 chars) is not already present."""
+    all_news = list(all_news)
+    for res in extra_lists:
+        if res:
+            # Dedupe
+            existing_titles = {item.title.lower()[:50] for item in all_news}
+            for item in res:
+                if item.title.lower()[:50] not in existing_titles:
+                    all_news.append(item)
+                    existing_titles.add(item.title.lower()[:50])
+    return all_news
+
 async def async_fetch_news(session, existing_data, force=False):
     print("--- Processing News Feed ---")
     if not force and existing_data and existing_data.get("news"):
@@ -646,108 +808,35 @@ async def async_fetch_news(session, existing_data, force=False):
             try:
                 last_time = datetime.datetime.fromtimestamp(last_ts)
                 now = datetime.datetime.now()
-                if (now - last_time).total_seconds() < 1800:
+                if (now - last_time).total_seconds() < SOURCE_TTLS["news"]:
+                    tracing.cache_hit()
                     return existing_data["news"]
             except Exception:
                 pass
 
-    sources = [
-        {"name": "Gazeta.uz", "rss": "https://www.gazeta.uz/en/rss/", "default_cat": "general", "lang": "EN"},
-        {"name": "Kapital.uz", "rss": "https://kapital.uz/feed/", "default_cat": "business", "lang": "RU"},
-        {"name": "UzDaily", "rss": "https://uzdaily.uz/en/rss", "default_cat": "business", "lang": "EN"},
-        {"name": "Spot.uz", "rss": "https://www.spot.uz/rss", "default_cat": "business", "lang": "RU"},
-        {"name": "Spot.uz", "rss": "https://www.spot.uz/oz/rss/", "default_cat": "business", "lang": "UZ"},
+    # RSS feeds and the official news pages share one fetch -> parse pipeline;
+    # WorldNewsAPI is plain JSON and runs alongside it.
+    jobs = [(s["rss"], partial(parse_rss_feed, source=s)) for s in NEWS_SOURCES]
+    jobs += [
+        (CBU_NEWS_URL, parse_cbu_news_html),
+        (IMF_NEWS_URL, parse_imf_news_html),
+        (WORLDBANK_NEWS_URL, parse_worldbank_news_html),
     ]
-
-    CATEGORIES = {
-        "economy": ["gdp", "inflation", "cpi", "fiscal", "budget", "imf", "world bank", "adb", "growth", "tax", "reform", "debt", "ввп", "инфляция", "бюджет", "мвф", "всемирный банк", "рост", "налог", "реформа", "долг", "экономика"],
-        "banking": ["cbu", "central bank", "deposit", "loan", "interest rate", "mortgage", "atm", "visa", "mastercard", "fintech", "цб", "центробанк", "банк", "вклад", "кредит", "ставка", "ипотека", "банкомат", "финтех", "cb"],
-        "markets": ["stock", "exchange", "uzse", "ipo", "dividend", "commodity", "gold", "silver", "oil", "gas", "bitcoin", "crypto", "биржа", "акции", "рфб", "ipo", "дивиденд", "сырье", "золото", "серебро", "нефть", "газ", "биткоин", "крипто", "рынок"],
-        "business": ["startup", "investment", "profit", "revenue", "merger", "acquisition", "export", "import", "trade", "company", "стартап", "инвестиции", "прибыль", "выручка", "слияние", "поглощение", "экспорт", "импорт", "торговля", "компания", "бизнес"],
-        "regulation": ["law", "decree", "president", "parliament", "cabinet", "policy", "rule", "license", "ban", "permit", "закон", "указ", "президент", "парламент", "кабмин", "политика", "правило", "лицензия", "запрет", "разрешение"]
-    }
-
-    def determine_category(title, summary, default):
-        text = (title + " " + summary).lower()
-        for cat, keywords in CATEGORIES.items():
-            for keyword in keywords:
-                if keyword in text:
-                    return cat.capitalize()
-        return default.capitalize()
-
-    # Async fetch RSS
-    rss_tasks = [async_fetch_url(session, s["rss"]) for s in sources]
-    rss_contents = await asyncio.gather(*rss_tasks)
+    print("--- Fetching RSS, CBU, IMF and World Bank News ---")
+    results, worldnews = await asyncio.gather(
+        async_fetch_pages(session, jobs),
+        async_fetch_worldnews_api(session),
+    )
+    rss_results = results[:len(NEWS_SOURCES)]
+    cbu_news, imf_news, worldbank_news = results[len(NEWS_SOURCES):]
 
     all_news = []
+    for items in rss_results:
+        if items: all_news.extend(items)
+    all_news = merge_news(all_news, (worldnews, cbu_news, imf_news, worldbank_news))
 
-    for i, content in enumerate(rss_contents):
-        if not content: continue
-        source = sources[i]
-        try:
-            feed = feedparser.parse(content)
-            for entry in feed.entries[:10]:
-                id_str = f"{source['name']}-{entry.link}"
-                item_id = hashlib.md5(id_str.encode()).hexdigest()
-                published_at = ""
-                published_ts = 0
-                if hasattr(entry, 'published'):
-                    try:
-                        dt = date_parser.parse(entry.published)
-                        published_at = dt.isoformat()
-                        published_ts = dt.timestamp()
-                    except: pass
-
-                image_url = None
-                if hasattr(entry, 'media_content'):
-                     for media in entry.media_content:
-                         if 'url' in media:
-                             image_url = media['url']
-                             break
-                if not image_url and hasattr(entry, 'summary'):
-                    s = BeautifulSoup(entry.summary, 'html.parser')
-                    img = s.find('img')
-                    if img and img.get('src'): image_url = img['src']
-
-                full_content = ""
-                if hasattr(entry, 'content') and entry.content:
-                    full_content = BeautifulSoup(entry.content[0].get('value', ''), 'html.parser').get_text(strip=True)
-                elif hasattr(entry, 'summary'):
-                    full_content = BeautifulSoup(entry.summary, 'html.parser').get_text(strip=True)
-                if len(full_content) > 2000: full_content = full_content[:2000] + "..."
-                summary_clean = full_content[:200] + "..." if len(full_content) > 200 else full_content
-                category = determine_category(entry.title, summary_clean, source["default_cat"])
-                reliability = get_reliability(source["name"])
-
-                all_news.append({
-                    "id": item_id, "title": entry.title, "summary": summary_clean, "full_content": full_content,
-                    "source": source["name"], "source_url": entry.link, "category": category, "language": source["lang"],
-                    "published_at": published_at, "published_ts": published_ts, "image_url": image_url,
-                    "is_breaking": False, "reliability_tier": reliability["tier"], "reliability_score": reliability["score"],
-                    "reliability_label": reliability["label"]
-                })
-        except Exception: pass
-
-    # Fetch additional sources concurrently
-    extra_tasks = [
-        async_fetch_worldnews_api(session),
-        async_fetch_cbu_news(session),
-        async_fetch_imf_news(session),
-        async_fetch_worldbank_news(session)
-    ]
-    extra_results = await asyncio.gather(*extra_tasks)
-    
-    for res in extra_results:
-        if res:
-            # Dedupe
-            existing_titles = {item["title"].lower()[:50] for item in all_news}
-            for item in res:
-                if item["title"].lower()[:50] not in existing_titles:
-                    all_news.append(item)
-                    existing_titles.add(item["title"].lower()[:50])
-
-    all_news.sort(key=lambda x: x["published_ts"], reverse=True)
-    final_news = all_news[:60]
+    all_news.sort(key=lambda x: x.published_ts, reverse=True)
+    final_news = to_dicts(all_news[:60])
 
     # Check if we have any news. If not, try to fallback to existing data
     if not final_news and existing_data and existing_data.get("news"):
@@ -759,13 +848,9 @@ async def async_fetch_news(session, existing_data, force=False):
         "items": final_news
     }
 
-async def async_fetch_cbu_news(session):
-    print("--- Fetching CBU News ---")
-    url = "https://cbu.uz/en/press_center/news/"
-    content = await async_fetch_url(session, url)
-    if not content: return []
+def parse_cbu_news_html(content):
     try:
-        soup = BeautifulSoup(content, 'html.parser')
+        soup = make_soup(content)
         news_items = []
         for link in soup.find_all('a', href=True):
             href = link.get('href', '')
@@ -787,35 +872,32 @@ async def async_fetch_cbu_news(session):
                 full_url = href if href.startswith('http') else f"https://cbu.uz{href}"
                 clean_title = re.sub(r'\s*\d{1,2}\s+(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+\d{4}\s*$', '', title).strip()
                 reliability = get_reliability("CBU")
-                news_items.append({
-                    "id": hashlib.md5(f"cbu-{href}".encode()).hexdigest(),
-                    "title": clean_title, "summary": clean_title, "full_content": "", "source": "CBU", "source_url": full_url,
-                    "category": "Banking", "language": "EN", "published_at": date_str, "published_ts": published_ts, "image_url": None,
-                    "is_breaking": False, "is_official": True, "reliability_tier": reliability["tier"], "reliability_score": reliability["score"],
-                    "reliability_label": reliability["label"]
-                })
+                item = make_record(NewsItem, "CBU news",
+                    id=hashlib.md5(f"cbu-{href}".encode()).hexdigest(),
+                    title=clean_title, summary=clean_title, full_content="", source="CBU", source_url=full_url,
+                    category="Banking", language="EN", published_at=date_str, published_ts=published_ts, image_url=None,
+                    is_breaking=False, is_official=True, reliability_tier=reliability["tier"], reliability_score=reliability["score"],
+                    reliability_label=reliability["label"]
+                )
+                if item: news_items.append(item)
         # Dedupe
         seen = set()
         unique = []
         for item in news_items:
-            if item["source_url"] not in seen:
-                seen.add(item["source_url"])
+            if item.source_url not in seen:
+                seen.add(item.source_url)
                 unique.append(item)
-        unique.sort(key=lambda x: x["published_ts"], reverse=True)
+        unique.sort(key=lambda x: x.published_ts, reverse=True)
         return unique[:10]
     except Exception: return []
 
-async def async_fetch_imf_news(session):
-    print("--- Fetching IMF News ---")
-    url = "https://www.imf.org/en/Countries/UZB"
-    content = await async_fetch_url(session, url)
-    if not content: return []
+def parse_imf_news_html(content):
     try:
-        soup = BeautifulSoup(content, 'html.parser')
+        soup = make_soup(content)
         news_items = []
         for link in soup.find_all('a', href=True):
             href = link.get('href', '')
-            if any(p in href for p in ['/news/', '/publications/', '/en/News/']) and 'Countries/UZB' not in href and href != url:
+            if any(p in href for p in ['/news/', '/publications/', '/en/News/']) and 'Countries/UZB' not in href and href != IMF_NEWS_URL:
                 title = link.get_text(strip=True)
                 if not title or len(title) < 15 or title.lower() in ['read more', 'view all']: continue
                 full_url = href if href.startswith('http') else f"https://www.imf.org{href}"
@@ -832,31 +914,28 @@ async def async_fetch_imf_news(session):
                     published_ts = datetime.datetime.now().timestamp() - len(news_items) * 86400
                     date_str = datetime.datetime.now().isoformat()
                 reliability = get_reliability("IMF")
-                news_items.append({
-                    "id": hashlib.md5(f"imf-{href}".encode()).hexdigest(),
-                    "title": title[:200], "summary": f"IMF report on Uzbekistan: {title[:150]}", "full_content": "",
-                    "source": "IMF", "source_url": full_url, "category": "Economy", "language": "EN",
-                    "published_at": date_str, "published_ts": published_ts, "image_url": None,
-                    "is_breaking": False, "is_official": True, "reliability_tier": reliability["tier"], "reliability_score": reliability["score"],
-                    "reliability_label": reliability["label"]
-                })
+                item = make_record(NewsItem, "IMF news",
+                    id=hashlib.md5(f"imf-{href}".encode()).hexdigest(),
+                    title=title[:200], summary=f"IMF report on Uzbekistan: {title[:150]}", full_content="",
+                    source="IMF", source_url=full_url, category="Economy", language="EN",
+                    published_at=date_str, published_ts=published_ts, image_url=None,
+                    is_breaking=False, is_official=True, reliability_tier=reliability["tier"], reliability_score=reliability["score"],
+                    reliability_label=reliability["label"]
+                )
+                if item: news_items.append(item)
         seen = set()
         unique = []
         for item in news_items:
-            if item["source_url"] not in seen:
-                seen.add(item["source_url"])
+            if item.source_url not in seen:
+                seen.add(item.source_url)
                 unique.append(item)
-        unique.sort(key=lambda x: x["published_ts"], reverse=True)
+        unique.sort(key=lambda x: x.published_ts, reverse=True)
         return unique[:5]
     except Exception: return []
 
-async def async_fetch_worldbank_news(session):
-    print("--- Fetching World Bank News ---")
-    url = "https://www.worldbank.org/en/country/uzbekistan"
-    content = await async_fetch_url(session, url)
-    if not content: return []
+def parse_worldbank_news_html(content):
     try:
-        soup = BeautifulSoup(content, 'html.parser')
+        soup = make_soup(content)
         news_items = []
         for link in soup.find_all('a', href=True):
             href = link.get('href', '')
@@ -877,21 +956,22 @@ async def async_fetch_worldbank_news(session):
                     published_ts = datetime.datetime.now().timestamp() - len(news_items) * 86400
                     date_str = datetime.datetime.now().isoformat()
                 reliability = get_reliability("World Bank")
-                news_items.append({
-                    "id": hashlib.md5(f"wb-{href}".encode()).hexdigest(),
-                    "title": title[:200], "summary": f"World Bank report on Uzbekistan: {title[:150]}", "full_content": "",
-                    "source": "World Bank", "source_url": full_url, "category": "Economy", "language": "EN",
-                    "published_at": date_str, "published_ts": published_ts, "image_url": None,
-                    "is_breaking": False, "is_official": True, "reliability_tier": reliability["tier"], "reliability_score": reliability["score"],
-                    "reliability_label": reliability["label"]
-                })
+                item = make_record(NewsItem, "World Bank news",
+                    id=hashlib.md5(f"wb-{href}".encode()).hexdigest(),
+                    title=title[:200], summary=f"World Bank report on Uzbekistan: {title[:150]}", full_content="",
+                    source="World Bank", source_url=full_url, category="Economy", language="EN",
+                    published_at=date_str, published_ts=published_ts, image_url=None,
+                    is_breaking=False, is_official=True, reliability_tier=reliability["tier"], reliability_score=reliability["score"],
+                    reliability_label=reliability["label"]
+                )
+                if item: news_items.append(item)
         seen = set()
         unique = []
         for item in news_items:
-            if item["source_url"] not in seen:
-                seen.add(item["source_url"])
+            if item.source_url not in seen:
+                seen.add(item.source_url)
                 unique.append(item)
-        unique.sort(key=lambda x: x["published_ts"], reverse=True)
+        unique.sort(key=lambda x: x.published_ts, reverse=True)
         return unique[:5]
     except Exception: return []
 
@@ -915,24 +995,21 @@ async def async_fetch_worldnews_api(session):
             full_text = item.get("text", "")[:2000]
             summary = full_text[:200] + "..." if len(full_text) > 200 else full_text
             reliability = get_reliability("WorldNews")
-            parsed_news.append({
-                "id": hashlib.md5(f"worldnews-{item.get('id', item.get('url', ''))}".encode()).hexdigest(),
-                "title": item.get("title", ""), "summary": summary, "full_content": full_text,
-                "source": "WorldNews", "source_url": item.get("url", ""), "category": "General", "language": "EN",
-                "published_at": item.get("publish_date", ""), "published_ts": published_ts, "image_url": item.get("image"),
-                "is_breaking": False, "is_worldnews_api": True, "reliability_tier": reliability["tier"], "reliability_score": reliability["score"],
-                "reliability_label": reliability["label"]
-            })
+            news_item = make_record(NewsItem, "WorldNews",
+                id=hashlib.md5(f"worldnews-{item.get('id', item.get('url', ''))}".encode()).hexdigest(),
+                title=item.get("title", ""), summary=summary, full_content=full_text,
+                source="WorldNews", source_url=item.get("url", ""), category="General", language="EN",
+                published_at=item.get("publish_date", ""), published_ts=published_ts, image_url=item.get("image"),
+                is_breaking=False, is_worldnews_api=True, reliability_tier=reliability["tier"], reliability_score=reliability["score"],
+                reliability_label=reliability["label"]
+            )
+            if news_item: parsed_news.append(news_item)
         return parsed_news
     except Exception: return []
 
-async def async_fetch_gold_bar_prices(session):
-    print("--- Processing Gold Bar Prices ---")
-    url = "https://bank.uz/uz/gold-bars"
-    content = await async_fetch_url(session, url)
-    if not content: return None
+def parse_gold_bars_html(content):
     try:
-        soup = BeautifulSoup(content, 'html.parser')
+        soup = make_soup(content)
         table = soup.find('table', class_='table-table-bordered')
         if not table: return None
         gold_bars = []
@@ -956,13 +1033,22 @@ async def async_fetch_gold_bar_prices(session):
         return gold_bars
     except Exception: return None
 
+GOLD_BARS_URL = "https://bank.uz/uz/gold-bars"
+
+async def async_fetch_gold_bar_prices(session):
+    print("--- Processing Gold Bar Prices ---")
+    url = GOLD_BARS_URL
+    [gold_bars] = await async_fetch_pages(session, [(url, parse_gold_bars_html)])
+    return gold_bars
+
 async def async_fetch_polygon_history(session, ticker, key_name, existing_data, force):
     print(f"--- Processing {key_name} ---")
     if not force and existing_data and existing_data.get(key_name):
         last_ts = existing_data[key_name].get("last_updated_ts")
         if last_ts:
             try:
-                if (datetime.datetime.now() - datetime.datetime.fromtimestamp(last_ts)).total_seconds() < 1800:
+                if (datetime.datetime.now() - datetime.datetime.fromtimestamp(last_ts)).total_seconds() < SOURCE_TTLS["metals_history"]:
+                    tracing.cache_hit()
                     return existing_data[key_name]
             except: pass
     
@@ -988,29 +1074,29 @@ async def async_fetch_polygon_history(session, ticker, key_name, existing_data,
             if not ts: continue
             date_str = datetime.datetime.fromtimestamp(ts / 1000, tz=datetime.timezone.utc).strftime("%Y-%m-%d")
             price = float(item.get("c"))
-            entry = {"date": date_str}
-            if "BTC" in ticker: entry["price_usd"] = price
-            else: entry["price_usd_per_oz"] = price
+            entry = HistoryPoint(date=date_str)
+            if "BTC" in ticker: entry.price_usd = price
+            else: entry.price_usd_per_oz = price
             history_data.append(entry)
 
-        history_data.sort(key=lambda x: x['date'])
+        history_data.sort(key=lambda x: x.date)
         
         # Calculate change percent
         key = "price_usd" if "BTC" in ticker else "price_usd_per_oz"
         for i in range(len(history_data)):
             if i > 0:
-                prev = history_data[i-1][key]
-                curr = history_data[i][key]
-                history_data[i]["change_percent"] = round(((curr - prev) / prev) * 100, 2)
+                prev = getattr(history_data[i-1], key)
+                curr = getattr(history_data[i], key)
+                history_data[i].change_percent = round(((curr - prev) / prev) * 100, 2)
             else:
-                history_data[i]["change_percent"] = 0.0
+                history_data[i].change_percent = 0.0
 
         if len(history_data) > 30: history_data = history_data[-30:]
         
         return {
             "last_updated": datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
             "last_updated_ts": datetime.datetime.now().timestamp(),
-            "data": history_data,
+            "data": to_dicts(history_data),
             "source": "Polygon.io",
             "note": "Real market data"
         }
@@ -1088,184 +1174,377 @@ def process_bank_reliability(existing_data, force=False):
     if not force and existing_data and existing_data.get("bank_reliability"):
         last_ts = existing_data["bank_reliability"].get("last_updated_ts")
         if last_ts:
-             if (datetime.datetime.now() - datetime.datetime.fromtimestamp(last_ts)).total_seconds() < 86400:
+             if (datetime.datetime.now() - datetime.datetime.fromtimestamp(last_ts)).total_seconds() < SOURCE_TTLS["reliability"]:
+                 tracing.cache_hit()
                  return existing_data["bank_reliability"]
 
-    all_banks = get_all_ranked_banks()
-    reliability_data = []
-    for bank_name, ranking_info in all_banks.items():
-        try:
-            score = calculate_composite_score(bank_name, ranking_info)
-            tier_info = get_score_tier(score)
-            indicators = calculate_indicator_scores(bank_name, ranking_info)
-            reliability_data.append({
-                "name": bank_name, "score": score, "tier": tier_info["tier"], "tier_label": tier_info["label"],
-                "tier_color": tier_info["color"], "bank_type": get_bank_type(bank_name),
-                "license_year": get_bank_license_year(bank_name), "cerr_rank": ranking_info["rank"],
-                "cerr_category": ranking_info["category"], "rank_change": ranking_info["change"],
-                "indicators": indicators, "logo": get_bank_logo(bank_name)
-            })
-        except: continue
-    reliability_data.sort(key=lambda x: x["score"], reverse=True)
-    for i, bank in enumerate(reliability_data): bank["overall_rank"] = i + 1
+    with tracing.span("score") as span:
+        all_banks = get_all_ranked_banks()
+        reliability_data = []
+        for bank_name, ranking_info in all_banks.items():
+            try:
+                score = calculate_composite_score(bank_name, ranking_info)
+                tier_info = get_score_tier(score)
+                indicators = calculate_indicator_scores(bank_name, ranking_info)
+                bank = make_record(BankReliability, "reliability",
+                    name=bank_name, score=score, tier=tier_info["tier"], tier_label=tier_info["label"],
+                    tier_color=tier_info["color"], bank_type=get_bank_type(bank_name),
+                    license_year=get_bank_license_year(bank_name), cerr_rank=ranking_info["rank"],
+                    cerr_category=ranking_info["category"], rank_change=ranking_info["change"],
+                    indicators=indicators, logo=get_bank_logo(bank_name)
+                )
+                if bank: reliability_data.append(bank)
+            except: continue
+        reliability_data.sort(key=lambda x: x.score, reverse=True)
+        for i, bank in enumerate(reliability_data): bank.overall_rank = i + 1
+        span.set(banks=len(reliability_data))
 
     return {
         "last_updated": datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
         "last_updated_ts": datetime.datetime.now().timestamp(),
         "data_sources": {"cbu": "https://cbu.uz/en/credit-organizations/banks/head-offices/", "cerr": "https://cerr.uz"},
-        "scoring_weights": SCORING_WEIGHTS, "indicators_list": CERR_INDICATORS, "banks": reliability_data
+        "scoring_weights": SCORING_WEIGHTS, "indicators_list": CERR_INDICATORS, "banks": to_dicts(reliability_data)
     }
 
-def send_notifications(new_data, old_data):
+def rate_alerts(new_data, old_data):
+    """Best buy/sell moves between two snapshots that are worth a push
+    notification, as ``[(topic, line), ...]`` (see push_topics.py)."""
+    currencies = ['usd', 'eur', 'rub', 'kzt']
+    thresholds = {'usd': 50, 'eur': 50, 'rub': 5, 'kzt': 2}
+    alerts = []
+
+    for curr in currencies:
+        # Check if key exists in both
+        if not old_data or curr not in old_data or not old_data[curr]: continue
+        if not new_data or curr not in new_data or not new_data[curr]: continue
+
+        new_banks = new_data[curr].get('banks', [])
+        old_banks = old_data[curr].get('banks', [])
+        if not new_banks or not old_banks: continue
+
+        new_best_buy = max([b['buy'] for b in new_banks]) if new_banks else 0
+        new_best_sell = min([b['sell'] for b in new_banks]) if new_banks else 0
+        old_best_buy = max([b['buy'] for b in old_banks]) if old_banks else 0
+        old_best_sell = min([b['sell'] for b in old_banks]) if old_banks else 0
+
+        if new_best_buy == 0 or old_best_buy == 0: continue
+
+        threshold = thresholds.get(curr, 50)
+        if new_best_buy > old_best_buy + threshold:
+            alerts.append((push_topics.topic(curr, "buy_up"),
+                           f"{curr.upper()} Buy Rate UP: {old_best_buy} -> {new_best_buy} UZS"))
+        if new_best_sell < old_best_sell - threshold:
+            alerts.append((push_topics.topic(curr, "sell_down"),
+                           f"{curr.upper()} Sell Rate DOWN: {old_best_sell} -> {new_best_sell} UZS"))
+    return alerts
+
+def firestore_client():
+    if not firebase_admin._apps:
+        cred_dict = json.loads(os.environ.get("FIREBASE_CREDENTIALS"))
+        cred = credentials.Certificate(cred_dict)
+        firebase_admin.initialize_app(cred)
+    return firestore.client()
+
+async def send_notifications(new_data, old_data):
     """
-    Checks for significant rate changes and sends notifications via Firebase.
+    Checks for significant rate changes and publishes each one to its FCM
+    topic (see push_topics.py). Returns a report dict, or None if nothing was sent.
     """
     print("--- Checking for Rate Changes ---")
     if not os.environ.get("FIREBASE_CREDENTIALS"):
         print("No FIREBASE_CREDENTIALS env var found. Skipping notifications.")
-        return
+        return None
+
+    alerts = rate_alerts(new_data, old_data)
+    if not alerts:
+        return None
+    print("Sending notifications: " + "; ".join(f"[{topic}] {line}" for topic, line in alerts))
 
     try:
-        if not firebase_admin._apps:
-            cred_dict = json.loads(os.environ.get("FIREBASE_CREDENTIALS"))
-            cred = credentials.Certificate(cred_dict)
-            firebase_admin.initialize_app(cred)
-        db = firestore.client()
-
-        currencies = ['usd', 'eur', 'rub', 'kzt']
-        thresholds = {'usd': 50, 'eur': 50, 'rub': 5, 'kzt': 2}
-        alerts = []
-
-        for curr in currencies:
-            # Check if key exists in both
-            if not old_data or curr not in old_data or not old_data[curr]: continue
-            if not new_data or curr not in new_data or not new_data[curr]: continue
-
-            new_banks = new_data[curr].get('banks', [])
-            old_banks = old_data[curr].get('banks', [])
-            if not new_banks or not old_banks: continue
-
-            new_best_buy = max([b['buy'] for b in new_banks]) if new_banks else 0
-            new_best_sell = min([b['sell'] for b in new_banks]) if new_banks else 0
-            old_best_buy = max([b['buy'] for b in old_banks]) if old_banks else 0
-            old_best_sell = min([b['sell'] for b in old_banks]) if old_banks else 0
-
-            if new_best_buy == 0 or old_best_buy == 0: continue
-
-            threshold = thresholds.get(curr, 50)
-            if new_best_buy > old_best_buy + threshold:
-                alerts.append(f"{curr.upper()} Buy Rate UP: {old_best_buy} -> {new_best_buy} UZS")
-            if new_best_sell < old_best_sell - threshold:
-                 alerts.append(f"{curr.upper()} Sell Rate DOWN: {old_best_sell} -> {new_best_sell} UZS")
-
-        if alerts:
-            message_body = "\n".join(alerts)
-            print(f"Sending notification: {message_body}")
-            tokens_ref = db.collection(u'fcm_tokens')
-            docs = tokens_ref.stream()
-            tokens = [doc.to_dict()['token'] for doc in docs]
-            if not tokens: return
-
-            batch_size = 500
-            for i in range(0, len(tokens), batch_size):
-                batch_tokens = tokens[i:i + batch_size]
-                message = messaging.MulticastMessage(
-                    notification=messaging.Notification(
-                        title='NeoUZS Rate Alert 🚀',
-                        body=message_body,
-                    ),
-                    tokens=batch_tokens,
-                )
-                response = messaging.send_multicast(message)
-                print(f'Batch {i//batch_size + 1}: {response.success_count} messages sent successfully')
+        db = await asyncio.to_thread(firestore_client)
+        report = await push_topics.publish_alerts(db, token_cache.TokenCache(), alerts, 'NeoUZS Rate Alert 🚀')
     except Exception as e:
         print(f"Error sending notifications: {e}")
+        return None
+    print(f"Notifications: {report}")
+    return report
+
+async def traced_notifications(new_data, old_data):
+    with tracing.span("notify", source="fcm") as span:
+        report = await send_notifications(new_data, old_data)
+        if report:
+            span.set(**{k: v for k, v in report.items() if k != "failed_topics"})
+
+async def prerender_cards():
+    """Render the Telegram bot's rate cards for the snapshot just committed."""
+    with tracing.span("prerender", source="rate_cards") as span:
+        try:
+            report = await asyncio.to_thread(card_prerender.prerender_cards, OUTPUT_FILE)
+        except Exception as e:
+            print(f"Rate card pre-render failed: {e}")
+            return
+        print(f"Rate cards: {report}")
+        span.set(**{k: v for k, v in report.items() if k != "skipped"})
+
+CURRENCIES = ["USD", "RUB", "EUR", "KZT", "GBP"]
+
+DEFAULT_KEYS = ["usd", "rub", "eur", "kzt", "gbp", "weather", "savings", "news",
+                "gold_bars", "gold_history", "silver_history", "bitcoin_history", "bank_reliability"]
+
+def load_existing_data(path=OUTPUT_FILE):
+    return SnapshotStore(path).read()[1]
+
+def save_output(output_data, output_path=None):
+    """Write a partial output file, or merge into the latest rates.json snapshot.
+
+    Returns the merged snapshot (or None for partial output).
+    """
+    if output_path:
+        print(f"Saving partial output to {output_path}")
+        with tracing.span("serialize", source=os.path.basename(output_path)) as span:
+            text = json.dumps(output_data, indent=2)
+            with open(output_path, "w") as f:
+                f.write(text)
+            span.set(bytes=len(text))
+        return None
+
+    def merge(current):
+        current.update(output_data)
+        current["last_updated"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+        for key in DEFAULT_KEYS:
+            if key not in current: current[key] = None
+        return current
+
+    with tracing.span("serialize", source=os.path.basename(OUTPUT_FILE)) as span:
+        version, final_output = SnapshotStore(OUTPUT_FILE).commit(merge)
+        span.set(version=version)
+    print(f"Data saved to {OUTPUT_FILE} (version {version})")
+    return final_output
+
+async def fetch_exchange_rates(session, existing_data):
+    results = await asyncio.gather(*[
+        tracing.traced(f"rates.{c.lower()}", async_process_currency(session, c, existing_data)) for c in CURRENCIES
+    ])
+    return {c.lower(): res for c, res in zip(CURRENCIES, results)}
+
+async def fetch_metals_history(session, existing_data, force=False):
+    results = await asyncio.gather(
+        tracing.traced("gold_history", async_fetch_polygon_history(session, "C:XAUUSD", "gold_history", existing_data, force)),
+        tracing.traced("silver_history", async_fetch_polygon_history(session, "C:XAGUSD", "silver_history", existing_data, force)),
+        tracing.traced("bitcoin_history", async_fetch_polygon_history(session, "X:BTCUSD", "bitcoin_history", existing_data, force)),
+    )
+    return {"gold_history": results[0], "silver_history": results[1], "bitcoin_history": results[2]}
+
+async def fetch_savings(session, existing_data, force=False):
+    res = await asyncio.gather(
+        tracing.traced("savings", async_fetch_savings_rates(session, existing_data, force)),
+        tracing.traced("savings_usd", async_fetch_usd_savings_rates(session, existing_data, force)),
+    )
+    return {"savings": res[0], "savings_usd": res[1]}
+
+async def scrape_exchange(session, existing_data, force=False):
+    results = await asyncio.gather(
+        tracing.traced("weather", async_fetch_iqair_data(session, existing_data)),
+        fetch_exchange_rates(session, existing_data),
+        tracing.traced("gold_bars", async_fetch_gold_bar_prices(session)),
+        fetch_metals_history(session, existing_data, force),
+    )
+    output_data = {"weather": results[0]}
+    output_data.update(results[1])
+    output_data["gold_bars"] = results[2]
+    output_data.update(results[3])
+    return output_data
+
+async def scrape_news(session, existing_data, force=False):
+    return {"news": await tracing.traced("news", async_fetch_news(session, existing_data, force))}
+
+async def scrape_reliability(session, existing_data, force=False):
+    # to_thread (not run_in_executor) so the "score" span sees this run's tracer.
+    return {"bank_reliability": await tracing.traced(
+        "reliability", asyncio.to_thread(process_bank_reliability, existing_data, force))}
+
+# Scopes in output order. They share nothing but the read-only existing_data,
+# so "all" runs them concurrently on the same session.
+SCOPE_RUNNERS = {
+    "exchange": scrape_exchange,
+    "savings": fetch_savings,
+    "news": scrape_news,
+    "reliability": scrape_reliability,
+}
+
+async def run_scope(session, name, existing_data, force=False, notify=True):
+    with tracing.tags(scope=name):
+        output_data = await SCOPE_RUNNERS[name](session, existing_data, force)
+        # Check for notifications (only for exchange scope)
+        # We use output_data as new_data and existing_data as old_data
+        if name == "exchange" and notify and existing_data:
+            await traced_notifications(output_data, existing_data)
+    return output_data
+
+async def scrape_scope(session, scope, existing_data, force=False, notify=True):
+    """Run one scope ("exchange", "savings", "news", "reliability" or "all") and return its output keys.
+
+    ``notify=False`` skips the rate alert pushes of the exchange scope.
+    """
+    if scope == "all":
+        scopes = list(SCOPE_RUNNERS)
+    elif scope in SCOPE_RUNNERS:
+        return await run_scope(session, scope, existing_data, force, notify)
+    else:
+        print(f"Unknown scope: {scope}")
+        return {}
+
+    started = time.monotonic()
+
+    async def run(name):
+        try:
+            return name, await run_scope(session, name, existing_data, force, notify)
+        except Exception as e:
+            # One failing scope must not throw away the others' results.
+            print(f"Scope {name} failed: {e}")
+            return name, {}
+
+    results = {}
+    for next_done in asyncio.as_completed([run(name) for name in scopes]):
+        name, result = await next_done
+        results[name] = result
+        print(f"--- Scope {name} finished after {time.monotonic() - started:.1f}s ---")
+
+    output_data = {}
+    for name in scopes:
+        output_data.update(results.get(name, {}))
+    return output_data
+
+def _last_updated_ts(state, *keys):
+    stamps = [(state.get(k) or {}).get("last_updated_ts") for k in keys if isinstance(state.get(k), dict)]
+    stamps = [ts for ts in stamps if ts]
+    return min(stamps) if stamps else None
+
+async def run_daemon(metrics_dir=tracing.METRICS_DIR):
+    """Keep one warm session and refresh every source when its TTL expires.
+
+    The merged state lives in memory and is written back to rates.json after
+    each source finishes, so readers see fresh data source by source.
+    """
+    from scheduler import TTLScheduler
+
+    state = load_existing_data()
+    scheduler = TTLScheduler()
+
+    def traced_job(name, job):
+        async def run():
+            with tracing.run(f"daemon-{name}", metrics_dir):
+                with tracing.tags(scope=name):
+                    await job()
+        return run
+
+    async def commit(update):
+        nonlocal state
+        # The commit waits on the store's file lock and dumps the whole file.
+        state = await asyncio.to_thread(save_output, update)
+
+    async with aiohttp.ClientSession() as session:
+        async def refresh_rates():
+            update = await fetch_exchange_rates(session, state)
+            changed = any(state.get(key) != block for key, block in update.items())
+            if state:
+                await traced_notifications(update, state)
+            # Commit anyway so the snapshot's timestamp shows the rates were
+            # checked, but only pre-render when the rates moved: cards carry
+            # that timestamp, so every commit would otherwise re-render all of
+            # them, and most minutes nobody asks for a card.
+            await commit(update)
+            if changed:
+                await prerender_cards()
+
+        async def refresh_weather():
+            await commit({"weather": await async_fetch_iqair_data(session, state, force=True)})
+
+        async def refresh_gold_bars():
+            gold_bars = await async_fetch_gold_bar_prices(session)
+            if gold_bars is None:
+                raise RuntimeError("no gold bar prices")
+            await commit({"gold_bars": gold_bars})
+
+        async def refresh_metals_history():
+            await commit(await fetch_metals_history(session, state, force=True))
+
+        async def refresh_news():
+            await commit({"news": await async_fetch_news(session, state, force=True)})
+
+        async def refresh_savings():
+            await commit(await fetch_savings(session, state, force=True))
+
+        async def refresh_reliability():
+            await commit({"bank_reliability": await asyncio.to_thread(process_bank_reliability, state, True)})
+
+        scheduler.add("rates", SOURCE_TTLS["rates"], traced_job("rates", refresh_rates))
+        scheduler.add("weather", SOURCE_TTLS["weather"], traced_job("weather", refresh_weather), _last_updated_ts(state, "weather"))
+        scheduler.add("gold_bars", SOURCE_TTLS["gold_bars"], traced_job("gold_bars", refresh_gold_bars))
+        scheduler.add("metals_history", SOURCE_TTLS["metals_history"], traced_job("metals_history", refresh_metals_history),
+                      _last_updated_ts(state, "gold_history", "silver_history", "bitcoin_history"))
+        scheduler.add("news", SOURCE_TTLS["news"], traced_job("news", refresh_news), _last_updated_ts(state, "news"))
+        scheduler.add("savings", SOURCE_TTLS["savings"], traced_job("savings", refresh_savings), _last_updated_ts(state, "savings", "savings_usd"))
+        scheduler.add("reliability", SOURCE_TTLS["reliability"], traced_job("reliability", refresh_reliability), _last_updated_ts(state, "bank_reliability"))
+
+        print("--- Scraper daemon started ---")
+        for name, delay in scheduler.next_due().items():
+            print(f"  {name}: due in {delay:.0f}s")
+        await scheduler.run()
 
 async def main():
     parser = argparse.ArgumentParser()
+    parser.add_argument("mode", nargs="?", default="once", choices=["once", "daemon"],
+                        help="'once' runs a single scope and exits; 'daemon' keeps refreshing every source on its TTL")
     parser.add_argument("--force", action="store_true")
     parser.add_argument("--scope", type=str, default="exchange")
     parser.add_argument("--output", type=str, help="Output file path for partial update")
+    parser.add_argument("--metrics-dir", type=str, default=tracing.METRICS_DIR,
+                        help="Where run reports (runs/*.json) and Prometheus metrics (*.prom) are written")
+    parser.add_argument("--profile", choices=sorted(profiling.PROFILERS),
+                        help="Run the scope under cProfile (cpu) or tracemalloc (mem) and write hotspot reports")
+    parser.add_argument("--record", metavar="DIR", help="Save every fetched response to DIR")
+    parser.add_argument("--replay", metavar="DIR", help="Serve responses recorded in DIR instead of the network")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="Report import time per module at startup and the deferred imports each run triggers")
     args = parser.parse_args()
 
-    # Load existing data
-    existing_data = {}
-    if os.path.exists(OUTPUT_FILE):
-        try:
-            with open(OUTPUT_FILE, "r") as f:
-                existing_data = json.load(f)
-        except: pass
+    if args.startup_profile:
+        print_startup_profile("scraper")
 
-    output_data = {}
-    
-    async with aiohttp.ClientSession() as session:
-        # SCOPE: EXCHANGE
-        if args.scope == "exchange" or args.scope == "all":
-            # Weather
-            weather_task = async_fetch_iqair_data(session, existing_data)
-
-            # Currencies
-            currency_tasks = [async_process_currency(session, c, existing_data) for c in ["USD", "RUB", "EUR", "KZT", "GBP"]]
-
-            # Metals
-            gold_bars_task = async_fetch_gold_bar_prices(session)
-            gold_hist_task = async_fetch_polygon_history(session, "C:XAUUSD", "gold_history", existing_data, args.force)
-            silver_hist_task = async_fetch_polygon_history(session, "C:XAGUSD", "silver_history", existing_data, args.force)
-            btc_hist_task = async_fetch_polygon_history(session, "X:BTCUSD", "bitcoin_history", existing_data, args.force)
-
-            results = await asyncio.gather(weather_task, *currency_tasks, gold_bars_task, gold_hist_task, silver_hist_task, btc_hist_task)
-
-            output_data["weather"] = results[0]
-            output_data["usd"] = results[1]
-            output_data["rub"] = results[2]
-            output_data["eur"] = results[3]
-            output_data["kzt"] = results[4]
-            output_data["gbp"] = results[5]
-            output_data["gold_bars"] = results[6]
-            output_data["gold_history"] = results[7]
-            output_data["silver_history"] = results[8]
-            output_data["bitcoin_history"] = results[9]
-
-            # Check for notifications (only for exchange scope)
-            # We use output_data as new_data and existing_data as old_data
-            if existing_data:
-                send_notifications(output_data, existing_data)
-
-        # SCOPE: SAVINGS
-        if args.scope == "savings" or args.scope == "all":
-            savings_task = async_fetch_savings_rates(session, existing_data, args.force)
-            savings_usd_task = async_fetch_usd_savings_rates(session, existing_data, args.force)
-            res = await asyncio.gather(savings_task, savings_usd_task)
-            output_data["savings"] = res[0]
-            output_data["savings_usd"] = res[1]
-
-        # SCOPE: NEWS
-        if args.scope == "news" or args.scope == "all":
-            output_data["news"] = await async_fetch_news(session, existing_data, args.force)
-
-        # SCOPE: RELIABILITY
-        if args.scope == "reliability" or args.scope == "all":
-            output_data["bank_reliability"] = process_bank_reliability(existing_data, args.force)
-
-    # OUTPUT HANDLING
-    if args.output:
-        print(f"Saving partial output to {args.output}")
-        with open(args.output, "w") as f:
-            json.dump(output_data, f, indent=2)
-    else:
-        final_output = existing_data.copy()
-        final_output.update(output_data)
-        final_output["last_updated"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-        
-        default_keys = ["usd", "rub", "eur", "kzt", "gbp", "weather", "savings", "news",
-                       "gold_bars", "gold_history", "silver_history", "bitcoin_history", "bank_reliability"]
-        for key in default_keys:
-            if key not in final_output: final_output[key] = None
-
-        os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
-        with open(OUTPUT_FILE, "w") as f:
-            json.dump(final_output, f, indent=2)
-        print(f"Data saved to {OUTPUT_FILE}")
+    if args.record and args.replay:
+        parser.error("--record and --replay are mutually exclusive")
+    replay.configure(record=args.record, replay=args.replay)
+    if args.replay:
+        # Mock banks are randomized; make replayed runs repeatable.
+        random.seed(0)
+
+    if args.mode == "daemon":
+        if args.profile:
+            parser.error("--profile only applies to one-shot runs")
+        await run_daemon(args.metrics_dir)
+        return
+
+    profiler = profiling.start(args.profile, asyncio.get_running_loop()) if args.profile else None
+
+    with tracing.run(args.scope, args.metrics_dir):
+        # Load existing data
+        existing_data = load_existing_data()
+
+        async with aiohttp.ClientSession() as session:
+            output_data = await scrape_scope(session, args.scope, existing_data, args.force)
+
+        # OUTPUT HANDLING
+        save_output(output_data, args.output)
+        if not args.output and args.scope in ("exchange", "all"):
+            await prerender_cards()
+
+    if profiler:
+        for path in profiling.finish(profiler, os.path.join(args.metrics_dir, "profiles"), args.scope):
+            print(f"Profile written to {path}")
+
+    if args.startup_profile:
+        print_deferred_imports()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,175 @@
+"""
+Versioned, lock-protected snapshots of rates.json.
+
+Every writer (scraper.py one-shot runs, the daemon, the refresh service and
+merge_rates.py) commits through ``SnapshotStore.commit``, which
+
+1. takes an advisory lock (``rates.json.lock``) so writers run one at a time,
+2. re-reads the current version and applies the writer's update to it, so
+   parallel scrapers merge into each other's output instead of overwriting it,
+3. writes the result as ``rates.<n>.json`` and refreshes the plain
+   ``rates.json`` copy used by the web app,
+4. atomically swaps the ``rates.current`` pointer to the new version, and
+5. deletes all but the newest ``keep`` versions.
+
+Readers never take the lock: they follow the pointer to a complete,
+immutable version file (or read ``rates.json``, which is only ever replaced
+atomically). If ``rates.json`` was written after the pointer by something
+outside the store (``npm run dev``/``build`` run scripts/fetch-rates.js,
+which downloads it in place), the plain file wins and the next commit
+builds on it.
+"""
+
+import contextlib
+import json
+import os
+import re
+import time
+
+KEEP_VERSIONS = 5
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Hold an exclusive advisory lock on ``path`` (created if missing)."""
+    with open(path, "a+b") as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after ~10s; keep waiting for the writer.
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _replace(src, dst, attempts=10):
+    # On Windows os.replace fails while a reader has dst open; retry briefly.
+    for i in range(attempts):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if i == attempts - 1:
+                raise
+            time.sleep(0.05 * (i + 1))
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    _replace(tmp_path, path)
+
+
+class SnapshotStore:
+    def __init__(self, path, keep=KEEP_VERSIONS):
+        self.path = path
+        self.keep = keep
+        self.directory = os.path.dirname(path) or "."
+        stem, ext = os.path.splitext(os.path.basename(path))
+        self.stem = stem
+        self.ext = ext
+        self.pointer_path = os.path.join(self.directory, f"{stem}.current")
+        self.lock_path = f"{path}.lock"
+        self._version_re = re.compile(rf"^{re.escape(stem)}\.(\d+){re.escape(ext)}$")
+
+    def version_path(self, version):
+        return os.path.join(self.directory, f"{self.stem}.{version}{self.ext}")
+
+    def current_version(self):
+        """Return the version the pointer refers to, or None."""
+        try:
+            with open(self.pointer_path, "r", encoding="utf-8") as f:
+                match = self._version_re.match(f.read().strip())
+        except OSError:
+            return None
+        return int(match.group(1)) if match else None
+
+    def _plain_is_newer(self):
+        # commit() writes the plain file before the pointer, so a plain file
+        # newer than the pointer was replaced outside the store.
+        try:
+            return os.stat(self.path).st_mtime_ns > os.stat(self.pointer_path).st_mtime_ns
+        except OSError:
+            return False
+
+    def _read_plain(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None, {}
+        return (data.get("snapshot_version", 0) if isinstance(data, dict) else 0), data
+
+    def read(self, retries=3):
+        """Return ``(version, data)`` for the current snapshot without locking.
+
+        Reads the plain file when there is no pointer (e.g. a fresh checkout
+        of the data branch) or the plain file is newer than it, and returns
+        ``(0, {})`` if nothing exists.
+        """
+        for _ in range(retries):
+            version = self.current_version()
+            if version is None:
+                break
+            if self._plain_is_newer():
+                plain_version, data = self._read_plain()
+                if plain_version is not None:
+                    # Never go below the pointer, so the next commit still
+                    # gets a new version number.
+                    return max(version, plain_version), data
+                # Still being downloaded; the pointer's version is complete.
+            try:
+                with open(self.version_path(version), "r", encoding="utf-8") as f:
+                    return version, json.load(f)
+            except FileNotFoundError:
+                # Garbage-collected between reading the pointer and the file.
+                continue
+        version, data = self._read_plain()
+        return version or 0, data
+
+    def commit(self, update):
+        """Apply ``update(current_data) -> new_data`` under the lock and publish it.
+
+        Returns ``(version, new_data)``.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with file_lock(self.lock_path):
+            version, current = self.read()
+            new_data = update(dict(current))
+            version = max(version, new_data.get("snapshot_version", 0)) + 1
+            new_data["snapshot_version"] = version
+
+            text = json.dumps(new_data, indent=2)
+            _write_atomic(self.version_path(version), text)
+            _write_atomic(self.path, text)
+            _write_atomic(self.pointer_path, os.path.basename(self.version_path(version)) + "\n")
+            self._collect_garbage(version)
+        return version, new_data
+
+    def _collect_garbage(self, current):
+        for name in os.listdir(self.directory):
+            match = self._version_re.match(name)
+            if match and int(match.group(1)) <= current - self.keep:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
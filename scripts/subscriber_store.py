@@ -0,0 +1,198 @@
+"""
+Telegram bot subscribers and price alerts in SQLite.
+
+Replaces ``data/subscribers.json``, which every command read and rewrote
+whole (so two commands at once could lose each other's write). Each method
+here is one transaction touching only the rows of one user, through the
+primary key or an index, so a command costs the same with ten users or a
+million. The database runs in WAL mode: the alert watcher can read while a
+command writes.
+
+Tables:
+
+    users   (user_id, subscribed, username, first_name)
+    alerts  (id, user_id, currency, operator, value, created, armed,
+             triggered_at, triggered_rate)
+            unique (user_id, currency, operator, value), index on
+            (currency, operator, value) for the alert engine
+
+``migrate_json`` imports an existing subscribers.json once (a ``meta`` row
+records it); the JSON file is left in place.
+
+Methods are blocking; the bot calls them through ``asyncio.to_thread``.
+"""
+
+import contextlib
+import json
+import os
+import sqlite3
+
+MAX_ALERTS_PER_USER = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id    TEXT PRIMARY KEY,
+    subscribed INTEGER NOT NULL DEFAULT 0,
+    username   TEXT,
+    first_name TEXT
+);
+CREATE TABLE IF NOT EXISTS alerts (
+    id             INTEGER PRIMARY KEY,
+    user_id        TEXT NOT NULL,
+    currency       TEXT NOT NULL,
+    operator       TEXT NOT NULL,
+    value          REAL NOT NULL,
+    created        TEXT,
+    armed          INTEGER NOT NULL DEFAULT 1,
+    triggered_at   TEXT,
+    triggered_rate REAL,
+    UNIQUE (user_id, currency, operator, value)
+);
+CREATE INDEX IF NOT EXISTS alerts_currency ON alerts (currency, operator, value);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+ALERT_COLUMNS = "currency, operator, value, created, armed, triggered_at, triggered_rate"
+
+
+def _alert(row):
+    currency, operator, value, created, armed, triggered_at, triggered_rate = row
+    alert = {"currency": currency, "operator": operator, "value": value, "created": created,
+             "armed": bool(armed)}
+    if triggered_at is not None:
+        alert["triggered_at"] = triggered_at
+        alert["triggered_rate"] = triggered_rate
+    return alert
+
+
+class SubscriberStore:
+    def __init__(self, path):
+        self.path = str(path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            # WAL is a property of the database file; it has to be set outside a transaction.
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    @contextlib.contextmanager
+    def _connect(self, write=False):
+        # One connection per call: the bot calls in from worker threads.
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    # ----- users -----
+
+    def get_user(self, user_id):
+        """``{"subscribed": bool, "alerts": [...]}`` for ``user_id`` (empty if unknown)."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT subscribed FROM users WHERE user_id = ?", (str(user_id),)).fetchone()
+            alerts = self._alerts(conn, user_id)
+        return {"subscribed": bool(row and row[0]), "alerts": alerts}
+
+    def set_subscribed(self, user_id, subscribed, username=None, first_name=None):
+        """Set the daily-summary flag; returns False if it already had that value."""
+        with self._connect(write=True) as conn:
+            row = conn.execute("SELECT subscribed FROM users WHERE user_id = ?", (str(user_id),)).fetchone()
+            if bool(row and row[0]) == subscribed:
+                return False
+            if subscribed:
+                conn.execute(
+                    "INSERT INTO users (user_id, subscribed, username, first_name) VALUES (?, 1, ?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET subscribed = 1, username = excluded.username, "
+                    "first_name = excluded.first_name", (str(user_id), username, first_name))
+            else:
+                conn.execute("UPDATE users SET subscribed = 0 WHERE user_id = ?", (str(user_id),))
+            return True
+
+    # ----- alerts -----
+
+    def _alerts(self, conn, user_id):
+        rows = conn.execute(f"SELECT {ALERT_COLUMNS} FROM alerts WHERE user_id = ? ORDER BY id",
+                            (str(user_id),))
+        return [_alert(row) for row in rows]
+
+    def list_alerts(self, user_id):
+        with self._connect() as conn:
+            return self._alerts(conn, user_id)
+
+    def add_alert(self, user_id, alert, limit=MAX_ALERTS_PER_USER):
+        """Store ``alert``; returns "added", "duplicate" or "limit"."""
+        with self._connect(write=True) as conn:
+            count = conn.execute("SELECT COUNT(*) FROM alerts WHERE user_id = ?", (str(user_id),)).fetchone()[0]
+            if count >= limit:
+                return "limit"
+            conn.execute("INSERT OR IGNORE INTO users (user_id) VALUES (?)", (str(user_id),))
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO alerts (user_id, currency, operator, value, created, armed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (str(user_id), alert["currency"], alert["operator"], float(alert["value"]),
+                 alert.get("created"), int(alert.get("armed", True)))).rowcount
+            return "added" if inserted else "duplicate"
+
+    def delete_alert(self, user_id, position):
+        """Delete the user's ``position``-th alert (0-based, in creation order); returns it or None."""
+        if position < 0:
+            return None
+        with self._connect(write=True) as conn:
+            row = conn.execute(f"SELECT id, {ALERT_COLUMNS} FROM alerts WHERE user_id = ? "
+                               "ORDER BY id LIMIT 1 OFFSET ?", (str(user_id), position)).fetchone()
+            if row is None:
+                return None
+            conn.execute("DELETE FROM alerts WHERE id = ?", (row[0],))
+            return _alert(row[1:])
+
+    def all_alerts(self):
+        """``[(user_id, alert), ...]`` for every alert, e.g. to build the AlertEngine."""
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT user_id, {ALERT_COLUMNS} FROM alerts").fetchall()
+        return [(row[0], _alert(row[1:])) for row in rows]
+
+    def update_alert_states(self, alerts):
+        """Persist ``armed`` / ``triggered_at`` / ``triggered_rate`` of ``[(user_id, alert), ...]``."""
+        with self._connect(write=True) as conn:
+            conn.executemany(
+                "UPDATE alerts SET armed = ?, triggered_at = ?, triggered_rate = ? "
+                "WHERE user_id = ? AND currency = ? AND operator = ? AND value = ?",
+                ((int(a.get("armed", True)), a.get("triggered_at"), a.get("triggered_rate"),
+                  str(user_id), a["currency"], a["operator"], float(a["value"])) for user_id, a in alerts))
+
+    # ----- migration -----
+
+    def migrate_json(self, json_path):
+        """Import ``json_path`` (the old subscribers.json) once; returns the number of users imported."""
+        with self._connect(write=True) as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_json'").fetchone():
+                return 0
+            try:
+                with open(json_path, "r", encoding="utf-8") as f:
+                    users = json.load(f).get("users", {})
+            except FileNotFoundError:
+                users = {}
+            for user_id, user in users.items():
+                conn.execute(
+                    "INSERT OR IGNORE INTO users (user_id, subscribed, username, first_name) VALUES (?, ?, ?, ?)",
+                    (str(user_id), int(bool(user.get("subscribed"))), user.get("username"), user.get("first_name")))
+                conn.executemany(
+                    "INSERT OR IGNORE INTO alerts (user_id, currency, operator, value, created, armed, "
+                    "triggered_at, triggered_rate) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    ((str(user_id), a["currency"], a["operator"], float(a["value"]), a.get("created"),
+                      int(a.get("armed", True)), a.get("triggered_at"), a.get("triggered_rate"))
+                     for a in user.get("alerts", [])))
+            conn.execute("INSERT INTO meta (key, value) VALUES ('migrated_json', ?)", (str(json_path),))
+            return len(users)
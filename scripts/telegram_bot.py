@@ -14,15 +14,19 @@ Commands:
 import io
 import os
 import sys
-import json
 import asyncio
 import logging
 from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
 
-# Rate card image generator
-from rate_card_generator import generate_rate_card
+from rates_cache import RatesCache
+from lazy_imports import print_startup_profile
+from alert_engine import AlertEngine, alert_key
+from subscriber_store import SubscriberStore, MAX_ALERTS_PER_USER
+# Rate cards are drawn in worker processes; PIL is never imported here.
+from render_service import RenderService, RenderBusy, encode_summary, rate_card
+from card_cache import CardCache, card_inputs, card_rates
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
@@ -55,8 +59,15 @@ if not BOT_TOKEN:
 SCRIPT_DIR = Path(__file__).parent
 PROJECT_ROOT = SCRIPT_DIR.parent
 RATES_FILE = PROJECT_ROOT / "public" / "rates.json"
+SUBSCRIBERS_DB = PROJECT_ROOT / "data" / "subscribers.sqlite"
+# Pre-SQLite subscriber file, imported once into SUBSCRIBERS_DB
 SUBSCRIBERS_FILE = PROJECT_ROOT / "data" / "subscribers.json"
 
+# How often the rate watcher checks for a new rates snapshot
+RATES_POLL_SECONDS = 5
+# Pause between alert messages (Telegram allows ~30 messages/second)
+ALERT_SEND_INTERVAL = 0.04
+
 # Currency emojis
 CURRENCY_EMOJI = {
     "USD": "🇺🇸",
@@ -67,33 +78,60 @@ CURRENCY_EMOJI = {
 }
 
 
-def load_rates():
-    """Load current exchange rates from rates.json."""
-    try:
-        with open(RATES_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception as e:
-        logger.error(f"Failed to load rates: {e}")
+rates_cache = RatesCache(RATES_FILE, CURRENCY_EMOJI)
+render_service = RenderService()
+card_cache = CardCache()
+# card key -> future of the Telegram file_id, while the first request for a card renders and uploads it
+_card_uploads = {}
+
+
+def refresh_rates():
+    """Reload the rates cache if a new snapshot was published and pre-render its replies."""
+    snapshot = rates_cache.refresh()
+    if snapshot is not None and not snapshot.empty:
+        warm_responses(snapshot)
+    return snapshot
+
+
+async def current_rates():
+    """The cached rates snapshot (loaded here only before the watcher's first refresh), or None."""
+    snapshot = rates_cache.snapshot
+    if snapshot is None:
+        try:
+            await asyncio.to_thread(refresh_rates)
+        except Exception as e:
+            logger.error(f"Failed to load rates: {e}")
+        snapshot = rates_cache.snapshot
+    if snapshot is None or snapshot.empty:
         return None
+    return snapshot
 
 
-def load_subscribers():
-    """Load subscriber data."""
-    try:
-        with open(SUBSCRIBERS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception as e:
-        logger.error(f"Failed to load subscribers: {e}")
-        return {"users": {}}
+_store = None
 
 
-def save_subscribers(data):
-    """Save subscriber data."""
-    try:
-        with open(SUBSCRIBERS_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
-    except Exception as e:
-        logger.error(f"Failed to save subscribers: {e}")
+def get_store():
+    """The subscriber/alert database; imports data/subscribers.json the first time."""
+    global _store
+    if _store is None:
+        store = SubscriberStore(SUBSCRIBERS_DB)
+        migrated = store.migrate_json(SUBSCRIBERS_FILE)
+        if migrated:
+            logger.info(f"Imported {migrated} users from {SUBSCRIBERS_FILE.name}")
+        _store = store
+    return _store
+
+
+_alert_engine = None
+
+
+def get_alert_engine():
+    """The price alert index, built from the subscriber store on first use."""
+    global _alert_engine
+    if _alert_engine is None:
+        _alert_engine = AlertEngine.from_alerts(get_store().all_alerts())
+        logger.info(f"Indexed {len(_alert_engine)} price alerts")
+    return _alert_engine
 
 
 def format_rate(value):
@@ -103,6 +141,231 @@ def format_rate(value):
     return f"{value:,.2f}".replace(",", " ")
 
 
+# ==================== RENDERED RESPONSES ====================
+# Replies that depend only on the rates snapshot are built once per snapshot
+# and kept in ``snapshot.rendered`` as (text, reply_markup); a new snapshot
+# starts with an empty cache and is warmed by the rate watcher.
+
+BANKS_KEYBOARD = InlineKeyboardMarkup([[
+    InlineKeyboardButton("🇺🇸 USD", callback_data="banks_usd"),
+    InlineKeyboardButton("🇪🇺 EUR", callback_data="banks_eur"),
+    InlineKeyboardButton("🇷🇺 RUB", callback_data="banks_rub"),
+]])
+
+
+def render_rates(snapshot, currency=None):
+    """/rates"""
+    last_updated = snapshot.last_updated or "Unknown"
+    
+    lines = [f"📊 **CBU Official Rates**", f"🕐 {last_updated}", ""]
+    
+    for currency in ["USD", "EUR", "RUB", "KZT", "GBP"]:
+        cbu_rate = snapshot.currencies[currency].cbu
+        emoji = CURRENCY_EMOJI.get(currency, "💱")
+        
+        if cbu_rate:
+            lines.append(f"{emoji} **{currency}**: {format_rate(cbu_rate)} UZS")
+        else:
+            lines.append(f"{emoji} **{currency}**: N/A")
+    
+    lines.append("")
+    lines.append("🔗 brklyn498.github.io/Neouzsusd")
+    return "\n".join(lines), None
+
+
+def render_banks(snapshot, currency):
+    """/banks <currency>"""
+    view = snapshot.currencies[currency]
+    emoji = CURRENCY_EMOJI.get(currency, "💱")
+    
+    # Pre-sorted when the snapshot was loaded
+    best_buy = view.top_buy[:5]
+    best_sell = view.top_sell[:5]
+    
+    lines = [f"{emoji} **{currency} Bank Rates**", ""]
+    
+    lines.append("📈 **BEST BUY** (You get more UZS):")
+    for i, bank in enumerate(best_buy, 1):
+        name = bank.get("name", "Unknown")[:15]
+        buy = format_rate(bank.get("buy"))
+        lines.append(f"   {i}. {name}: **{buy}**")
+    
+    lines.append("")
+    lines.append("📉 **BEST SELL** (You pay less UZS):")
+    for i, bank in enumerate(best_sell, 1):
+        name = bank.get("name", "Unknown")[:15]
+        sell = format_rate(bank.get("sell"))
+        lines.append(f"   {i}. {name}: **{sell}**")
+    
+    lines.append("")
+    lines.append(f"🕐 {snapshot.last_updated}")
+    lines.append("🔗 brklyn498.github.io/Neouzsusd")
+    return "\n".join(lines), BANKS_KEYBOARD
+
+
+def render_rates_all(snapshot, currency=None):
+    """The rates_all button."""
+    lines = ["📊 **CBU Official Rates**", ""]
+    for currency in ["USD", "EUR", "RUB", "KZT", "GBP"]:
+        cbu_rate = snapshot.currencies[currency].cbu
+        emoji = CURRENCY_EMOJI.get(currency, "💱")
+        lines.append(f"{emoji} **{currency}**: {format_rate(cbu_rate)} UZS")
+    lines.append(f"\n🕐 {snapshot.last_updated}")
+    return "\n".join(lines), None
+
+
+def render_rate(snapshot, currency):
+    """The rate_<currency> buttons."""
+    view = snapshot.currencies[currency]
+    emoji = CURRENCY_EMOJI.get(currency, "💱")
+    text = (f"{emoji} **{currency}/UZS**\n\n📊 CBU: {format_rate(view.cbu)}\n"
+            f"📈 Best Buy: {format_rate(view.best_buy)}\n📉 Best Sell: {format_rate(view.best_sell)}")
+    return text, None
+
+
+def render_top_banks(snapshot, currency):
+    """The banks_<currency> buttons."""
+    view = snapshot.currencies[currency]
+    emoji = CURRENCY_EMOJI.get(currency, "💱")
+    
+    lines = [f"{emoji} **{currency} Top Banks**", ""]
+    lines.append("📈 **Buy**:")
+    for b in view.top_buy[:3]:
+        lines.append(f"  • {b['name'][:12]}: {format_rate(b['buy'])}")
+    lines.append("📉 **Sell**:")
+    for b in view.top_sell[:3]:
+        lines.append(f"  • {b['name'][:12]}: {format_rate(b['sell'])}")
+    return "\n".join(lines), BANKS_KEYBOARD
+
+
+RENDERERS = {
+    "rates": (render_rates, False),
+    "banks": (render_banks, True),
+    "rates_all": (render_rates_all, False),
+    "rate": (render_rate, True),
+    "top_banks": (render_top_banks, True),
+}
+
+
+def rendered(snapshot, kind, currency=None):
+    """``(text, reply_markup)`` for ``kind`` from the snapshot's cache, rendering it on a miss."""
+    key = (kind, currency)
+    response = snapshot.rendered.get(key)
+    if response is None:
+        render, _ = RENDERERS[kind]
+        response = snapshot.rendered[key] = render(snapshot, currency)
+    return response
+
+
+def warm_responses(snapshot):
+    """Render every cached reply for a freshly loaded snapshot."""
+    for kind, (_, per_currency) in RENDERERS.items():
+        for currency in (snapshot.currencies if per_currency else [None]):
+            rendered(snapshot, kind, currency)
+
+
+# ==================== RATE CARDS ====================
+
+async def send_rate_card(message, currency, inputs):
+    """Reply with the rate card for ``inputs``; returns False if no card could be sent.
+    
+    Sends the Telegram file_id of an earlier upload if there is one, else the
+    cached image, else renders it. Requests that arrive while a card is being
+    rendered and uploaded wait for that upload and send its file_id; while it
+    is being pre-rendered (prerender_cards) they wait for the render and the
+    first of them uploads it.
+    """
+    key = card_cache.key(inputs)
+    caption = f"🌆 {currency}/UZS Rate Card | brklyn498.github.io/Neouzsusd"
+    
+    entry = card_cache.get_cached(key) or await asyncio.to_thread(card_cache.get, key)
+    file_id = entry and entry["file_id"]
+    while not file_id and key in _card_uploads:
+        file_id = await asyncio.shield(_card_uploads[key])
+        entry = card_cache.get_cached(key) or entry
+    if file_id:
+        try:
+            await message.reply_photo(photo=file_id, caption=caption)
+            return True
+        except Exception as e:
+            logger.warning(f"Cached rate card upload rejected, sending it again: {e}")
+            await asyncio.to_thread(card_cache.set_file_id, key, None)
+    
+    upload = _card_uploads[key] = asyncio.get_running_loop().create_future()
+    generating_msg = None
+    try:
+        image = entry and entry["image"]
+        if not image:
+            # Send "generating..." message
+            generating_msg = await message.reply_text("🎨 Generating synthwave rate card...")
+            # Generate synthwave image in the render pool
+            image, report = await render_service.render(rate_card, **inputs)
+            logger.info(f"Rendered {currency} rate card: {encode_summary(report)}")
+            await asyncio.to_thread(card_cache.put, key, image)
+        
+        sent = await message.reply_photo(photo=io.BytesIO(image), caption=caption)
+        file_id = sent.photo[-1].file_id if sent and sent.photo else None
+        if file_id:
+            await asyncio.to_thread(card_cache.set_file_id, key, file_id)
+        upload.set_result(file_id)
+        
+        # Delete "generating" message
+        if generating_msg:
+            try:
+                await generating_msg.delete()
+            except Exception as e:
+                logger.warning(f"Could not delete progress message: {e}")
+        return True
+    except RenderBusy as e:
+        logger.warning(f"Rate card skipped, render pool busy: {e}")
+    except asyncio.TimeoutError:
+        logger.error(f"Rate card for {currency} timed out after {render_service.timeout}s")
+    except Exception as e:
+        logger.error(f"Failed to generate rate card: {e}")
+    finally:
+        if not upload.done():
+            upload.set_result(None)
+        if _card_uploads.get(key) is upload:
+            del _card_uploads[key]
+    
+    if generating_msg:
+        await generating_msg.edit_text(f"❌ Failed to generate image. Showing text instead...")
+    return False
+
+
+async def prerender_cards(snapshot):
+    """Render the cards of a newly loaded snapshot so the first /usd after an update is a cache hit."""
+    limit = asyncio.Semaphore(render_service.workers)
+    
+    async def prerender(view):
+        inputs = card_inputs(snapshot, view)
+        key = card_cache.key(inputs)
+        if key in _card_uploads or await asyncio.to_thread(card_cache.get, key) or key in _card_uploads:
+            return False
+        # A /usd arriving now waits for this render instead of starting its own.
+        pending = _card_uploads[key] = asyncio.get_running_loop().create_future()
+        try:
+            async with limit:
+                image, report = await render_service.render(rate_card, **inputs)
+            await asyncio.to_thread(card_cache.put, key, image)
+            return report
+        finally:
+            pending.set_result(None)
+            if _card_uploads.get(key) is pending:
+                del _card_uploads[key]
+    
+    views = [view for view in snapshot.currencies.values() if view.cbu]
+    results = await asyncio.gather(*[prerender(view) for view in views], return_exceptions=True)
+    failed = [r for r in results if isinstance(r, BaseException)]
+    reports = [r for r in results if isinstance(r, dict)]
+    if reports or failed:
+        over_budget = sum(1 for r in reports if r["over_budget"])
+        logger.info(f"Pre-rendered {len(reports)} rate cards for snapshot {snapshot.version}"
+                    + (f" ({sum(r['bytes'] for r in reports)} bytes, "
+                       f"{sum(r['ms'] for r in reports):.1f} ms encoding, {over_budget} over budget)" if reports else "")
+                    + (f", {len(failed)} failed: {failed[0]!r}" if failed else ""))
+
+
 # ==================== COMMAND HANDLERS ====================
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -184,20 +447,13 @@ async def subscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /subscribe command - subscribe to daily updates."""
     user_id = str(update.effective_user.id)
     
-    subscribers = load_subscribers()
-    
-    if user_id not in subscribers["users"]:
-        subscribers["users"][user_id] = {"subscribed": False, "alerts": []}
+    changed = await asyncio.to_thread(get_store().set_subscribed, user_id, True,
+                                      update.effective_user.username, update.effective_user.first_name)
     
-    if subscribers["users"][user_id].get("subscribed"):
+    if not changed:
         await update.message.reply_text("✅ You're already subscribed to daily updates!")
         return
     
-    subscribers["users"][user_id]["subscribed"] = True
-    subscribers["users"][user_id]["username"] = update.effective_user.username
-    subscribers["users"][user_id]["first_name"] = update.effective_user.first_name
-    save_subscribers(subscribers)
-    
     await update.message.reply_text(
         "✅ **Subscribed!**\n\n"
         "You'll receive daily rate summaries at 8:00 AM (Tashkent time).\n\n"
@@ -211,15 +467,10 @@ async def unsubscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE
     """Handle /unsubscribe command."""
     user_id = str(update.effective_user.id)
     
-    subscribers = load_subscribers()
-    
-    if user_id not in subscribers["users"] or not subscribers["users"][user_id].get("subscribed"):
+    if not await asyncio.to_thread(get_store().set_subscribed, user_id, False):
         await update.message.reply_text("ℹ️ You're not subscribed to daily updates.")
         return
     
-    subscribers["users"][user_id]["subscribed"] = False
-    save_subscribers(subscribers)
-    
     await update.message.reply_text(
         "🔕 **Unsubscribed**\n\n"
         "You won't receive daily updates anymore.\n"
@@ -265,16 +516,6 @@ async def alert_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Invalid operator. Use `>` or `<`.", parse_mode="Markdown")
         return
     
-    subscribers = load_subscribers()
-    
-    if user_id not in subscribers["users"]:
-        subscribers["users"][user_id] = {"subscribed": False, "alerts": []}
-    
-    # Limit alerts per user
-    if len(subscribers["users"][user_id].get("alerts", [])) >= 10:
-        await update.message.reply_text("❌ Maximum 10 alerts per user. Use /deletealert to remove old ones.")
-        return
-    
     alert = {
         "currency": currency,
         "operator": operator,
@@ -282,11 +523,17 @@ async def alert_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "created": datetime.now().strftime("%Y-%m-%d %H:%M")
     }
     
-    if "alerts" not in subscribers["users"][user_id]:
-        subscribers["users"][user_id]["alerts"] = []
+    result = await asyncio.to_thread(get_store().add_alert, user_id, alert)
+    if result == "limit":
+        await update.message.reply_text(f"❌ Maximum {MAX_ALERTS_PER_USER} alerts per user. "
+                                        "Use /deletealert to remove old ones.")
+        return
+    if result == "duplicate":
+        await update.message.reply_text("ℹ️ You already have this alert. Use /myalerts to see all alerts.")
+        return
     
-    subscribers["users"][user_id]["alerts"].append(alert)
-    save_subscribers(subscribers)
+    alert["armed"] = True
+    get_alert_engine().add(user_id, alert)
     
     emoji = CURRENCY_EMOJI.get(currency, "💱")
     op_text = "rises above" if operator in [">", ">="] else "falls below"
@@ -305,10 +552,9 @@ async def myalerts_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /myalerts command - list user's alerts."""
     user_id = str(update.effective_user.id)
     
-    subscribers = load_subscribers()
-    user_data = subscribers.get("users", {}).get(user_id, {})
-    alerts = user_data.get("alerts", [])
-    subscribed = user_data.get("subscribed", False)
+    user_data = await asyncio.to_thread(get_store().get_user, user_id)
+    alerts = user_data["alerts"]
+    subscribed = user_data["subscribed"]
     
     if not alerts and not subscribed:
         await update.message.reply_text(
@@ -352,16 +598,13 @@ async def deletealert_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         await update.message.reply_text("❌ Invalid number.", parse_mode="Markdown")
         return
     
-    subscribers = load_subscribers()
-    user_data = subscribers.get("users", {}).get(user_id, {})
-    alerts = user_data.get("alerts", [])
+    removed = await asyncio.to_thread(get_store().delete_alert, user_id, index)
     
-    if index < 0 or index >= len(alerts):
+    if removed is None:
         await update.message.reply_text(f"❌ Alert #{index + 1} not found. Use /myalerts to see your alerts.")
         return
     
-    removed = alerts.pop(index)
-    save_subscribers(subscribers)
+    get_alert_engine().remove(user_id, removed)
     
     await update.message.reply_text(
         f"🗑️ **Alert Deleted**\n\n"
@@ -373,94 +616,44 @@ async def deletealert_command(update: Update, context: ContextTypes.DEFAULT_TYPE
 
 async def rates_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /rates command - show all CBU rates."""
-    rates_data = load_rates()
+    snapshot = await current_rates()
     
-    if not rates_data:
+    if not snapshot:
         await update.message.reply_text("❌ Failed to load rates. Please try again later.")
         return
     
-    last_updated = rates_data.get("last_updated", "Unknown")
-    
-    lines = [f"📊 **CBU Official Rates**", f"🕐 {last_updated}", ""]
-    
-    for currency in ["USD", "EUR", "RUB", "KZT", "GBP"]:
-        currency_data = rates_data.get(currency.lower(), {})
-        cbu_rate = currency_data.get("cbu")
-        emoji = CURRENCY_EMOJI.get(currency, "💱")
-        
-        if cbu_rate:
-            lines.append(f"{emoji} **{currency}**: {format_rate(cbu_rate)} UZS")
-        else:
-            lines.append(f"{emoji} **{currency}**: N/A")
-    
-    lines.append("")
-    lines.append("🔗 brklyn498.github.io/Neouzsusd")
-    
-    await update.message.reply_text("\n".join(lines), parse_mode="Markdown")
+    text, _ = rendered(snapshot, "rates")
+    await update.message.reply_text(text, parse_mode="Markdown")
 
 
 async def currency_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle individual currency commands (/usd, /eur, etc.) - sends synthwave image."""
     command = update.message.text.split()[0].replace("/", "").upper()
     
-    rates_data = load_rates()
-    if not rates_data:
+    snapshot = await current_rates()
+    if not snapshot:
         await update.message.reply_text("❌ Failed to load rates.")
         return
     
-    currency_data = rates_data.get(command.lower(), {})
-    cbu_rate = currency_data.get("cbu")
-    banks = currency_data.get("banks", [])
-    history = currency_data.get("history", [])
+    view = snapshot.currencies.get(command)
+    cbu_rate = view.cbu if view else None
     
     if not cbu_rate:
         await update.message.reply_text(f"❌ No data for {command}.")
         return
     
-    # Find best rates
-    best_buy = max([b["buy"] for b in banks], default=0) if banks else 0
-    best_sell = min([b["sell"] for b in banks], default=0) if banks else 0
+    change = view.change
     
-    # Calculate change from yesterday
-    change = 0
-    if len(history) >= 2:
-        today = history[-1]["rate"] if history else cbu_rate
-        yesterday = history[-2]["rate"] if len(history) > 1 else today
-        change = today - yesterday
-    
-    # Send "generating..." message
-    generating_msg = await update.message.reply_text("🎨 Generating synthwave rate card...")
+    if await send_rate_card(update.message, command, card_inputs(snapshot, view)):
+        return
     
-    try:
-        # Generate synthwave image
-        img_bytes = generate_rate_card(
-            currency=command,
-            rate=cbu_rate,
-            change=change,
-            best_buy=best_buy,
-            best_sell=best_sell
-        )
-        
-        # Send image
-        await update.message.reply_photo(
-            photo=io.BytesIO(img_bytes),
-            caption=f"🌆 {command}/UZS Rate Card | brklyn498.github.io/Neouzsusd",
-        )
-        
-        # Delete "generating" message
-        await generating_msg.delete()
-        
-    except Exception as e:
-        logger.error(f"Failed to generate rate card: {e}")
-        await generating_msg.edit_text(f"❌ Failed to generate image. Showing text instead...")
-        
-        # Fallback to text
-        emoji = CURRENCY_EMOJI.get(command, "💱")
-        text = f"{emoji} **{command}/UZS**: {format_rate(cbu_rate)} UZS"
-        if change != 0:
-            arrow = "📈" if change > 0 else "📉"
-            text += f"\n{arrow} Change: {'+' if change > 0 else ''}{change:.2f}"
-        await update.message.reply_text(text, parse_mode="Markdown")
+    # Fallback to text
+    emoji = CURRENCY_EMOJI.get(command, "💱")
+    text = f"{emoji} **{command}/UZS**: {format_rate(cbu_rate)} UZS"
+    if change != 0:
+        arrow = "📈" if change > 0 else "📉"
+        text += f"\n{arrow} Change: {'+' if change > 0 else ''}{change:.2f}"
+    await update.message.reply_text(text, parse_mode="Markdown")
 
 
 async def banks_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -478,54 +671,19 @@ async def banks_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def send_banks_message(message, currency):
     """Send bank rates message (used by command and callback)."""
-    rates_data = load_rates()
-    if not rates_data:
+    snapshot = await current_rates()
+    if not snapshot:
         await message.reply_text("❌ Failed to load rates.")
         return
     
-    currency_data = rates_data.get(currency.lower(), {})
-    banks = currency_data.get("banks", [])
+    view = snapshot.currencies[currency]
     
-    if not banks:
+    if not view.top_buy:
         await message.reply_text(f"❌ No bank data for {currency}.")
         return
     
-    emoji = CURRENCY_EMOJI.get(currency, "💱")
-    
-    # Sort for best buy (highest) and best sell (lowest)
-    best_buy = sorted(banks, key=lambda x: x.get("buy", 0), reverse=True)[:5]
-    best_sell = sorted(banks, key=lambda x: x.get("sell", float('inf')))[:5]
-    
-    lines = [f"{emoji} **{currency} Bank Rates**", ""]
-    
-    lines.append("📈 **BEST BUY** (You get more UZS):")
-    for i, bank in enumerate(best_buy, 1):
-        name = bank.get("name", "Unknown")[:15]
-        buy = format_rate(bank.get("buy"))
-        lines.append(f"   {i}. {name}: **{buy}**")
-    
-    lines.append("")
-    lines.append("📉 **BEST SELL** (You pay less UZS):")
-    for i, bank in enumerate(best_sell, 1):
-        name = bank.get("name", "Unknown")[:15]
-        sell = format_rate(bank.get("sell"))
-        lines.append(f"   {i}. {name}: **{sell}**")
-    
-    lines.append("")
-    lines.append(f"🕐 {rates_data.get('last_updated', '')}")
-    lines.append("🔗 brklyn498.github.io/Neouzsusd")
-    
-    keyboard = [[
-        InlineKeyboardButton("🇺🇸 USD", callback_data="banks_usd"),
-        InlineKeyboardButton("🇪🇺 EUR", callback_data="banks_eur"),
-        InlineKeyboardButton("🇷🇺 RUB", callback_data="banks_rub"),
-    ]]
-    
-    await message.reply_text(
-        "\n".join(lines),
-        parse_mode="Markdown",
-        reply_markup=InlineKeyboardMarkup(keyboard)
-    )
+    text, reply_markup = rendered(snapshot, "banks", currency)
+    await message.reply_text(text, parse_mode="Markdown", reply_markup=reply_markup)
 
 
 # ==================== CALLBACK HANDLERS ====================
@@ -538,68 +696,82 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     data = query.data
     
     if data == "rates_all":
-        # Re-send rates
-        rates_data = load_rates()
-        if rates_data:
-            lines = ["📊 **CBU Official Rates**", ""]
-            for currency in ["USD", "EUR", "RUB", "KZT", "GBP"]:
-                currency_data = rates_data.get(currency.lower(), {})
-                cbu_rate = currency_data.get("cbu")
-                emoji = CURRENCY_EMOJI.get(currency, "💱")
-                lines.append(f"{emoji} **{currency}**: {format_rate(cbu_rate)} UZS")
-            lines.append(f"\n🕐 {rates_data.get('last_updated', '')}")
-            await query.edit_message_text("\n".join(lines), parse_mode="Markdown")
-    
+        kind, currency = "rates_all", None
     elif data.startswith("rate_"):
-        currency = data.split("_")[1].upper()
-        rates_data = load_rates()
-        if rates_data:
-            currency_data = rates_data.get(currency.lower(), {})
-            cbu_rate = currency_data.get("cbu")
-            banks = currency_data.get("banks", [])
-            best_buy = max([b["buy"] for b in banks], default=0) if banks else 0
-            best_sell = min([b["sell"] for b in banks], default=0) if banks else 0
-            emoji = CURRENCY_EMOJI.get(currency, "💱")
-            
-            text = f"{emoji} **{currency}/UZS**\n\n📊 CBU: {format_rate(cbu_rate)}\n📈 Best Buy: {format_rate(best_buy)}\n📉 Best Sell: {format_rate(best_sell)}"
-            await query.edit_message_text(text, parse_mode="Markdown")
-    
+        kind, currency = "rate", data.split("_")[1].upper()
     elif data.startswith("banks_"):
-        currency = data.split("_")[1].upper()
-        rates_data = load_rates()
-        if rates_data:
-            currency_data = rates_data.get(currency.lower(), {})
-            banks = currency_data.get("banks", [])
-            emoji = CURRENCY_EMOJI.get(currency, "💱")
-            
-            best_buy = sorted(banks, key=lambda x: x.get("buy", 0), reverse=True)[:3]
-            best_sell = sorted(banks, key=lambda x: x.get("sell", float('inf')))[:3]
-            
-            lines = [f"{emoji} **{currency} Top Banks**", ""]
-            lines.append("📈 **Buy**:")
-            for b in best_buy:
-                lines.append(f"  • {b['name'][:12]}: {format_rate(b['buy'])}")
-            lines.append("📉 **Sell**:")
-            for b in best_sell:
-                lines.append(f"  • {b['name'][:12]}: {format_rate(b['sell'])}")
-            
-            keyboard = [[
-                InlineKeyboardButton("🇺🇸 USD", callback_data="banks_usd"),
-                InlineKeyboardButton("🇪🇺 EUR", callback_data="banks_eur"),
-                InlineKeyboardButton("🇷🇺 RUB", callback_data="banks_rub"),
-            ]]
-            
-            await query.edit_message_text(
-                "\n".join(lines),
-                parse_mode="Markdown",
-                reply_markup=InlineKeyboardMarkup(keyboard)
-            )
+        kind, currency = "top_banks", data.split("_")[1].upper()
+    else:
+        return
+    
+    snapshot = await current_rates()
+    if snapshot and (currency is None or currency in snapshot.currencies):
+        text, reply_markup = rendered(snapshot, kind, currency)
+        await query.edit_message_text(text, parse_mode="Markdown", reply_markup=reply_markup)
+
+
+# ==================== PRICE ALERTS ====================
+
+def format_triggered(alerts):
+    lines = ["🔔 **Price Alert**", ""]
+    for alert, rate in alerts:
+        emoji = CURRENCY_EMOJI.get(alert["currency"], "💱")
+        op_text = "above" if alert["operator"] in [">", ">="] else "below"
+        lines.append(f"{emoji} {alert['currency']}/UZS is {op_text} {format_rate(alert['value'])}: "
+                     f"now **{format_rate(rate)}**")
+    lines += ["", "Use /myalerts to manage your alerts."]
+    return "\n".join(lines)
+
+
+async def check_alerts(application, snapshot):
+    """Evaluate every price alert against ``snapshot`` and notify the users whose alerts fired."""
+    engine = get_alert_engine()
+    fired = engine.evaluate(snapshot.cbu_rates())
+    changed = [alert_key(user_id, alert) for user_id, alerts in fired.items() for alert, _ in alerts]
+    changed += engine.rearmed
+    if changed:
+        # Copied on the loop so the worker thread never sees a half-applied evaluate()
+        rows = [(key[0], dict(engine.alerts[key])) for key in changed]
+        await asyncio.to_thread(get_store().update_alert_states, rows)
+    for user_id, alerts in fired.items():
+        try:
+            await application.bot.send_message(chat_id=int(user_id), text=format_triggered(alerts),
+                                               parse_mode="Markdown")
+        except Exception as e:
+            logger.warning(f"Could not deliver price alert to {user_id}: {e}")
+        await asyncio.sleep(ALERT_SEND_INTERVAL)
+    if changed:
+        logger.info(f"Price alerts: {len(changed) - len(engine.rearmed)} fired for {len(fired)} users, "
+                    f"{len(engine.rearmed)} re-armed")
+
+
+async def watch_rates(application):
+    """Reload the rates cache and check the price alerts whenever a new snapshot
+    is published, and pre-render the rate cards when its rates moved."""
+    checked = None
+    while True:
+        try:
+            await asyncio.to_thread(refresh_rates)
+            # A handler may have loaded the snapshot first; check it all the same.
+            snapshot = rates_cache.snapshot
+            if snapshot is not checked and not snapshot.empty:
+                previous, checked = checked, snapshot
+                await check_alerts(application, snapshot)
+                if previous is None or card_rates(previous) != card_rates(snapshot):
+                    await prerender_cards(snapshot)
+        except Exception as e:
+            logger.error(f"Rates refresh / price alert check failed: {e}")
+        await asyncio.sleep(RATES_POLL_SECONDS)
 
 
 # ==================== MAIN ====================
 
 def main():
     """Start the bot."""
+    if "--startup-profile" in sys.argv[1:]:
+        print_startup_profile("telegram_bot")
+        return
+
     if not BOT_TOKEN:
         logger.error("TELEGRAM_BOT_TOKEN not found in environment variables!")
         sys.exit(1)
@@ -644,8 +816,18 @@ def main():
         ]
         await application.bot.set_my_commands(commands)
         logger.info("Bot command menu set successfully!")
+        # Open the subscriber store (and migrate subscribers.json) off the event loop
+        await asyncio.to_thread(get_alert_engine)
+        application.bot_data["alert_watcher"] = asyncio.create_task(watch_rates(application))
+    
+    async def post_shutdown(application: Application) -> None:
+        watcher = application.bot_data.get("alert_watcher")
+        if watcher:
+            watcher.cancel()
+        render_service.shutdown()
     
     app.post_init = post_init
+    app.post_shutdown = post_shutdown
     
     # Start polling
     logger.info("Bot is running! Press Ctrl+C to stop.")
@@ -0,0 +1,249 @@
+"""
+Local SQLite copy of the Firestore ``fcm_tokens`` collection.
+
+Sending an alert used to stream the whole collection. The cache instead
+asks Firestore only for documents whose ``updatedAt`` is at or after the
+newest one it has seen (minus CURSOR_OVERLAP, for client clocks and writes
+that land out of order), and upserts them. Unsubscribing writes a
+tombstone (``deleted: true`` with a fresh ``updatedAt``) instead of
+deleting the document, so deletions arrive through the same incremental
+query; push_fanout tombstones invalid tokens the same way.
+
+Documents deleted outright (older clients) and documents without
+``updatedAt`` never match that query, so every FULL_SYNC_INTERVAL the cache
+reads the whole collection once and tombstones whatever it no longer
+contains. Local tombstones are dropped after TOMBSTONE_KEEP.
+
+The cache is also the topic subscription registry (see push_topics.py):
+``topics`` holds the topics a token's document asks for (NULL when the
+document has no ``topics`` field, i.e. the defaults) and ``fcm_topics``
+the topics FCM has actually been told about, so only the difference has
+to be sent to FCM's topic management API.
+
+``sync`` only needs ``db.collection(name)`` with ``where`` / ``order_by`` /
+``select`` / ``stream``, so it runs unchanged against the Firestore
+emulator (set FIRESTORE_EMULATOR_HOST) or a local stand-in.
+
+    python scripts/token_cache.py          # sync once and print the counts
+    python scripts/token_cache.py --full   # force a full resync
+"""
+
+import argparse
+import contextlib
+import datetime
+import os
+import sqlite3
+import time
+
+from lazy_imports import lazy
+
+base_query = lazy("google.cloud.firestore_v1.base_query")
+
+TOKENS_COLLECTION = "fcm_tokens"
+DEFAULT_PATH = os.environ.get("FCM_TOKEN_CACHE") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "fcm_tokens.sqlite")
+
+CURSOR_OVERLAP = 10 * 60
+FULL_SYNC_INTERVAL = 7 * 24 * 3600
+TOMBSTONE_KEEP = 30 * 24 * 3600
+WRITE_CHUNK = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tokens (
+    token      TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL,
+    deleted    INTEGER NOT NULL DEFAULT 0,
+    topics     TEXT,
+    fcm_topics TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value REAL
+);
+"""
+
+# Columns added after the first release of the cache file.
+MIGRATIONS = {
+    "topics": "ALTER TABLE tokens ADD COLUMN topics TEXT",
+    "fcm_topics": "ALTER TABLE tokens ADD COLUMN fcm_topics TEXT NOT NULL DEFAULT ''",
+}
+
+UPSERT = """
+INSERT INTO tokens (token, updated_at, deleted, topics) VALUES (?, ?, ?, ?)
+ON CONFLICT(token) DO UPDATE SET updated_at = excluded.updated_at, deleted = excluded.deleted,
+                                 topics = excluded.topics
+WHERE excluded.updated_at >= tokens.updated_at
+"""
+
+
+def _topics(value):
+    """Canonical form of a document's ``topics`` list: sorted, comma separated."""
+    if not isinstance(value, (list, tuple)):
+        return None
+    return ",".join(sorted({str(t) for t in value if t}))
+
+
+def split_topics(value):
+    return set(value.split(",")) if value else set()
+
+
+def _timestamp(value):
+    """Epoch seconds of a Firestore timestamp / datetime, 0 if missing."""
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return value.timestamp()
+    if isinstance(value, (int, float)):
+        return float(value)
+    return 0.0
+
+
+class TokenCache:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(tokens)")}
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(statement)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # One connection per call: the cache is used from worker threads.
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _meta(self, conn, key):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, conn, key, value):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def stats(self):
+        with self._connect() as conn:
+            live, deleted = conn.execute(
+                "SELECT COUNT(*) - COALESCE(SUM(deleted), 0), COALESCE(SUM(deleted), 0) FROM tokens").fetchone()
+            return {"live": live, "tombstones": deleted, "cursor": self._meta(conn, "cursor"),
+                    "last_full_sync": self._meta(conn, "last_full_sync")}
+
+    def sync(self, db, collection=TOKENS_COLLECTION, full=False):
+        """Pull changes from Firestore; returns ``{"mode", "read", "tombstoned", "seconds"}``."""
+        started = time.perf_counter()
+        now = time.time()
+        with self._connect() as conn:
+            cursor = self._meta(conn, "cursor")
+            last_full = self._meta(conn, "last_full_sync") or 0
+        full = full or cursor is None or now - last_full > FULL_SYNC_INTERVAL
+
+        query = db.collection(collection)
+        if not full:
+            # Clamped: the cursor is 0 until a document with updatedAt has been
+            # seen, and fromtimestamp() rejects negative values on Windows.
+            since = datetime.datetime.fromtimestamp(max(cursor - CURSOR_OVERLAP, 0), tz=datetime.timezone.utc)
+            query = query.where(filter=base_query.FieldFilter("updatedAt", ">=", since)).order_by("updatedAt")
+        query = query.select(["token", "updatedAt", "deleted", "topics"])
+
+        read = 0
+        newest = cursor or 0.0
+        tombstoned = 0
+        with self._connect() as conn:
+            if full:
+                conn.execute("CREATE TEMP TABLE seen (token TEXT PRIMARY KEY)")
+            rows = []
+            for doc in query.stream():
+                data = doc.to_dict() or {}
+                token = data.get("token") or doc.id
+                updated = _timestamp(data.get("updatedAt"))
+                newest = max(newest, updated)
+                rows.append((token, updated, 1 if data.get("deleted") else 0, _topics(data.get("topics"))))
+                read += 1
+                if len(rows) >= WRITE_CHUNK:
+                    self._write(conn, rows, full)
+                    rows = []
+            self._write(conn, rows, full)
+
+            if full:
+                tombstoned = conn.execute(
+                    "UPDATE tokens SET deleted = 1, updated_at = ? "
+                    "WHERE deleted = 0 AND token NOT IN (SELECT token FROM seen)", (now,)).rowcount
+                conn.execute("DROP TABLE seen")
+                self._set_meta(conn, "last_full_sync", now)
+            # Keep tombstones FCM still has topic subscriptions for until
+            # push_topics has unsubscribed them.
+            conn.execute("DELETE FROM tokens WHERE deleted = 1 AND fcm_topics = '' AND updated_at < ?",
+                         (now - TOMBSTONE_KEEP,))
+            self._set_meta(conn, "cursor", newest)
+
+        return {"mode": "full" if full else "incremental", "read": read, "tombstoned": tombstoned,
+                "seconds": round(time.perf_counter() - started, 3)}
+
+    def _write(self, conn, rows, full):
+        if not rows:
+            return
+        conn.executemany(UPSERT, rows)
+        if full:
+            conn.executemany("INSERT OR IGNORE INTO seen (token) VALUES (?)", ((r[0],) for r in rows))
+
+    def tokens(self):
+        """All live tokens, oldest registration first."""
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute("SELECT token FROM tokens WHERE deleted = 0 ORDER BY rowid")]
+
+    def tombstone(self, tokens):
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany("UPDATE tokens SET deleted = 1, updated_at = ? WHERE token = ?",
+                             ((now, t) for t in tokens))
+
+    def subscription_changes(self, default_topics, known_topics=None):
+        """``[(token, wanted, subscribed)]`` for every token whose FCM topics are out of date.
+
+        ``wanted`` is the set of topics the token should be in (``default_topics``
+        when its document has no ``topics`` field, nothing once it is deleted),
+        limited to ``known_topics`` if given, and ``subscribed`` the set FCM
+        currently has it in. Unknown topics never reach FCM, so they are
+        dropped before comparing.
+        """
+        default = ",".join(sorted(default_topics))
+        known = set(known_topics) if known_topics is not None else None
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT token, CASE WHEN deleted THEN '' ELSE COALESCE(topics, ?) END AS wanted, fcm_topics "
+                "FROM tokens WHERE wanted != fcm_topics", (default,)).fetchall()
+        changes = []
+        for token, wanted, subscribed in rows:
+            wanted, subscribed = split_topics(wanted), split_topics(subscribed)
+            if known is not None:
+                wanted &= known
+            if wanted != subscribed:
+                changes.append((token, wanted, subscribed))
+        return changes
+
+    def set_subscribed(self, subscribed):
+        """Record ``{token: topics}`` as what FCM now has each token subscribed to."""
+        with self._connect() as conn:
+            conn.executemany("UPDATE tokens SET fcm_topics = ? WHERE token = ?",
+                             ((",".join(sorted(topics)), token) for token, topics in subscribed.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync the local FCM token cache from Firestore")
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("--full", action="store_true", help="Read the whole collection")
+    args = parser.parse_args()
+
+    from scraper import firestore_client
+    cache = TokenCache(args.path)
+    print(cache.sync(firestore_client(), full=args.full))
+    print(cache.stats())
+
+
+if __name__ == "__main__":
+    main()
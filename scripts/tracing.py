@@ -0,0 +1,265 @@
+"""
+Structured spans and per-run metrics for the scraper.
+
+A run (one ``scraper.py`` invocation, one daemon job or one refresh-service
+job) is opened with ``tracing.run(label)``. Inside it, ``span(stage, **tags)``
+times a step: stages are ``source`` (one whole source), ``fetch``, ``parse``,
+``score``, ``notify`` and ``serialize``. Tags describe the step: ``scope``,
+``source``, ``host``, ``bytes``, ``retries``, ``cache_hit`` and ``outcome``.
+``scope`` and ``source`` are inherited from the enclosing ``tags()`` /
+``traced()`` block through a context variable, so concurrent scopes and
+sources keep their own labels. Outside a run, spans are no-ops.
+
+When the run ends it writes, under ``METRICS_DIR``:
+
+    runs/<timestamp>-<label>.json  - the run report (every span plus per-stage
+                                     totals); the newest HISTORY_KEEP are kept
+    scraper_<label>.prom           - Prometheus text format, for the
+                                     node_exporter textfile collector
+"""
+
+import contextlib
+import contextvars
+import datetime
+import json
+import os
+import re
+import time
+from urllib.parse import urlsplit
+
+METRICS_DIR = "metrics"
+HISTORY_KEEP = 200
+
+_tracer = contextvars.ContextVar("tracer", default=None)
+_tags = contextvars.ContextVar("span_tags", default={})
+
+# Objects with span_started(span) / span_finished(span), e.g. the memory
+# profiler in profiling.py. Called from whichever thread runs the span.
+_observers = []
+
+
+def add_observer(observer):
+    _observers.append(observer)
+
+
+def remove_observer(observer):
+    if observer in _observers:
+        _observers.remove(observer)
+
+
+class Span:
+    __slots__ = ("stage", "start", "duration", "tags")
+
+    def __init__(self, stage, start, tags):
+        self.stage = stage
+        self.start = start
+        self.duration = 0.0
+        self.tags = tags
+
+    def set(self, **tags):
+        self.tags.update(tags)
+
+    def to_dict(self):
+        return {"stage": self.stage, "start_s": round(self.start, 4),
+                "duration_s": round(self.duration, 4), **self.tags}
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **tags):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+def host_of(url):
+    return urlsplit(url).hostname or ""
+
+
+class Tracer:
+    """Collects the spans of one run and renders its reports."""
+
+    def __init__(self, label):
+        self.label = label
+        self.started_at = time.time()
+        self.duration = None
+        self.outcome = None
+        self.spans = []
+        self._t0 = time.perf_counter()
+
+    def elapsed(self):
+        return time.perf_counter() - self._t0
+
+    def finish(self, outcome):
+        self.duration = self.elapsed()
+        self.outcome = outcome
+
+    def stage_totals(self):
+        """Aggregate spans per (scope, stage, source)."""
+        totals = {}
+        for s in self.spans:
+            key = (s.tags.get("scope", ""), s.stage, s.tags.get("source", ""))
+            t = totals.get(key)
+            if t is None:
+                t = totals[key] = {"scope": key[0], "stage": key[1], "source": key[2], "count": 0,
+                                   "seconds": 0.0, "max_seconds": 0.0, "bytes": 0, "retries": 0,
+                                   "errors": 0, "cache_hits": 0}
+            t["count"] += 1
+            t["seconds"] += s.duration
+            t["max_seconds"] = max(t["max_seconds"], s.duration)
+            t["bytes"] += s.tags.get("bytes") or 0
+            t["retries"] += s.tags.get("retries") or 0
+            if s.tags.get("outcome") not in ("ok", "cached"):
+                t["errors"] += 1
+            if s.tags.get("cache_hit"):
+                t["cache_hits"] += 1
+        rows = sorted(totals.values(), key=lambda t: t["seconds"], reverse=True)
+        for t in rows:
+            t["seconds"] = round(t["seconds"], 4)
+            t["max_seconds"] = round(t["max_seconds"], 4)
+        return rows
+
+    def report(self):
+        return {
+            "label": self.label,
+            "started_at": datetime.datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds"),
+            "started_ts": self.started_at,
+            "duration_s": round(self.duration or self.elapsed(), 4),
+            "outcome": self.outcome,
+            "stages": self.stage_totals(),
+            "spans": [s.to_dict() for s in sorted(self.spans, key=lambda s: s.start)],
+        }
+
+    def prometheus(self):
+        run = _label_value(self.label)
+        lines = [
+            "# HELP neouzs_scraper_run_duration_seconds Wall time of the last run.",
+            "# TYPE neouzs_scraper_run_duration_seconds gauge",
+            f'neouzs_scraper_run_duration_seconds{{run="{run}"}} {self.duration or self.elapsed():.4f}',
+            "# HELP neouzs_scraper_run_success Whether the last run finished without an exception.",
+            "# TYPE neouzs_scraper_run_success gauge",
+            f'neouzs_scraper_run_success{{run="{run}"}} {1 if self.outcome == "ok" else 0}',
+            "# HELP neouzs_scraper_run_timestamp_seconds Start time of the last run.",
+            "# TYPE neouzs_scraper_run_timestamp_seconds gauge",
+            f'neouzs_scraper_run_timestamp_seconds{{run="{run}"}} {self.started_at:.0f}',
+        ]
+        metrics = (
+            ("stage_seconds", "seconds", "Time spent in each stage during the last run."),
+            ("stage_max_seconds", "max_seconds", "Slowest single span of each stage during the last run."),
+            ("stage_spans", "count", "Number of spans of each stage during the last run."),
+            ("stage_errors", "errors", "Spans of each stage that did not end ok."),
+            ("stage_bytes", "bytes", "Bytes fetched or parsed by each stage."),
+            ("stage_retries", "retries", "Fetch retries by each stage."),
+            ("stage_cache_hits", "cache_hits", "Sources skipped because they were still fresh."),
+        )
+        totals = self.stage_totals()
+        for name, field, help_text in metrics:
+            lines.append(f"# HELP neouzs_scraper_{name} {help_text}")
+            lines.append(f"# TYPE neouzs_scraper_{name} gauge")
+            for t in totals:
+                labels = (f'run="{run}",scope="{_label_value(t["scope"])}",'
+                          f'stage="{t["stage"]}",source="{_label_value(t["source"])}"')
+                lines.append(f"neouzs_scraper_{name}{{{labels}}} {t[field]}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, directory=METRICS_DIR):
+        """Write the run report, the Prometheus file and prune the history."""
+        runs_dir = os.path.join(directory, "runs")
+        os.makedirs(runs_dir, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", self.label)
+        stamp = datetime.datetime.fromtimestamp(self.started_at).strftime("%Y%m%dT%H%M%S")
+        report_path = os.path.join(runs_dir, f"{stamp}-{slug}.json")
+        _write_atomic(report_path, json.dumps(self.report(), indent=2, ensure_ascii=False))
+        _write_atomic(os.path.join(directory, f"scraper_{slug}.prom"), self.prometheus())
+
+        history = sorted(f for f in os.listdir(runs_dir) if f.endswith(".json"))
+        for name in history[:-HISTORY_KEEP]:
+            try:
+                os.remove(os.path.join(runs_dir, name))
+            except OSError:
+                pass
+        return report_path
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+@contextlib.contextmanager
+def run(label, directory=METRICS_DIR):
+    """Trace everything inside the block as one run and write its reports at the end."""
+    tracer = Tracer(label)
+    token = _tracer.set(tracer)
+    outcome = "error"
+    try:
+        yield tracer
+        outcome = "ok"
+    finally:
+        _tracer.reset(token)
+        tracer.finish(outcome)
+        try:
+            path = tracer.write(directory)
+            print(f"--- Run report for {label}: {tracer.duration:.1f}s, {len(tracer.spans)} spans -> {path} ---")
+        except Exception as e:
+            print(f"Could not write run report for {label}: {e}")
+
+
+@contextlib.contextmanager
+def tags(**values):
+    """Inherit ``values`` (e.g. scope, source) into every span opened inside the block."""
+    token = _tags.set({**_tags.get(), **values})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+@contextlib.contextmanager
+def span(stage, **values):
+    """Time ``stage``; the yielded span accepts more tags via ``.set()``.
+
+    ``outcome`` defaults to "ok", or "error"/"cancelled" if the block raises.
+    """
+    tracer = _tracer.get()
+    if tracer is None:
+        yield NULL_SPAN
+        return
+    s = Span(stage, tracer.elapsed(), {**_tags.get(), **values})
+    for observer in _observers:
+        observer.span_started(s)
+    started = time.perf_counter()
+    try:
+        yield s
+    except BaseException as e:
+        s.tags.setdefault("outcome", "cancelled" if type(e).__name__ == "CancelledError" else "error")
+        s.tags.setdefault("error", str(e) or type(e).__name__)
+        raise
+    else:
+        s.tags.setdefault("outcome", "ok")
+    finally:
+        s.duration = time.perf_counter() - started
+        tracer.spans.append(s)
+        for observer in _observers:
+            observer.span_finished(s)
+
+
+def cache_hit(**values):
+    """Record that the current source was served from existing data (still fresh)."""
+    with span("fetch", cache_hit=True, outcome="cached", **values):
+        pass
+
+
+async def traced(source, awaitable):
+    """Await ``awaitable`` in a "source" span, tagging everything inside with ``source``."""
+    with tags(source=source):
+        with span("source"):
+            return await awaitable
@@ -1,21 +1,18 @@
 import http from 'http';
-import { exec } from 'child_process';
-import path from 'path';
-import { fileURLToPath } from 'url';
-
-const __filename = fileURLToPath(import.meta.url);
-const __dirname = path.dirname(__filename);
 
 // Parse command line arguments for port
 const args = process.argv.slice(2);
 const portArg = args.find(arg => arg.startsWith('--port='));
 const PORT = portArg ? parseInt(portArg.split('=')[1]) : 3050;
 
+// Python refresh service (scripts/refresh_service.py)
+const REFRESH_SERVICE_URL = process.env.REFRESH_SERVICE_URL || 'http://127.0.0.1:3060';
+
 const server = http.createServer((req, res) => {
     // Set CORS headers to allow requests from the frontend (if not using proxy)
     // But since we are using proxy, strict CORS isn't strictly necessary, but good for safety.
     res.setHeader('Access-Control-Allow-Origin', '*');
-    res.setHeader('Access-Control-Allow-Methods', 'POST, OPTIONS');
+    res.setHeader('Access-Control-Allow-Methods', 'GET, POST, OPTIONS');
     res.setHeader('Access-Control-Allow-Headers', 'Content-Type');
 
     if (req.method === 'OPTIONS') {
@@ -24,47 +21,27 @@ const server = http.createServer((req, res) => {
         return;
     }
 
-    if (req.method === 'POST' && req.url === '/api/refresh') {
-        let body = '';
-        req.on('data', chunk => {
-            body += chunk.toString();
+    if (req.url === '/api/refresh' || req.url.startsWith('/api/refresh/')) {
+        // Forward to the Python refresh service, which runs at most one scrape
+        // per scope and shares the result with every concurrent caller.
+        const upstream = http.request(`${REFRESH_SERVICE_URL}${req.url}`, {
+            method: req.method,
+            headers: { 'Content-Type': 'application/json' }
+        }, upstreamRes => {
+            res.writeHead(upstreamRes.statusCode, {
+                'Content-Type': 'application/json',
+                ...(upstreamRes.headers['retry-after'] ? { 'Retry-After': upstreamRes.headers['retry-after'] } : {})
+            });
+            upstreamRes.pipe(res);
         });
 
-        req.on('end', () => {
-            let scope = 'exchange';
-            try {
-                if (body) {
-                    const parsed = JSON.parse(body);
-                    if (parsed.scope) scope = parsed.scope;
-                }
-            } catch (e) {
-                console.error("Error parsing request body:", e);
-            }
-
-            console.log(`Received refresh request for scope: ${scope}. Running scraper...`);
-
-            // Execute the python script with --force flag and --scope
-            const scriptPath = path.join(__dirname, 'scripts', 'scraper.py');
-            const command = `python "${scriptPath}" --force --scope ${scope}`;
-
-            exec(command, { windowsHide: true }, (error, stdout, stderr) => {
-                if (error) {
-                    console.error(`Error executing scraper: ${error.message}`);
-                    res.writeHead(500, { 'Content-Type': 'application/json' });
-                    res.end(JSON.stringify({ error: error.message }));
-                    return;
-                }
-
-                if (stderr) {
-                    console.error(`Scraper stderr: ${stderr}`);
-                }
-
-                console.log(`Scraper output: ${stdout}`);
-
-                res.writeHead(200, { 'Content-Type': 'application/json' });
-                res.end(JSON.stringify({ success: true, message: 'Scraper executed successfully' }));
-            });
+        upstream.on('error', error => {
+            console.error(`Error reaching refresh service: ${error.message}`);
+            res.writeHead(502, { 'Content-Type': 'application/json' });
+            res.end(JSON.stringify({ error: error.message }));
         });
+
+        req.pipe(upstream);
     } else {
         res.writeHead(404, { 'Content-Type': 'text/plain' });
         res.end('Not Found');
@@ -1,10 +1,26 @@
 import React, { useState, useEffect } from 'react';
-import { requestForToken, unsubscribeUser, onMessageListener, isFirebaseConfigured } from '../firebase-config';
+import { requestForToken, unsubscribeUser, onMessageListener, updateAlertTopics, isFirebaseConfigured } from '../firebase-config';
+
+// Alert topics are "<currency>_<direction>" (scripts/push_topics.py)
+const ALERT_CURRENCIES = ['usd', 'eur', 'rub', 'kzt'];
+const ALERT_DIRECTIONS = ['buy_up', 'sell_down'];
+const TOPICS_STORAGE_KEY = 'alertCurrencies';
+
+const loadAlertCurrencies = () => {
+  try {
+    const saved = JSON.parse(localStorage.getItem(TOPICS_STORAGE_KEY));
+    if (Array.isArray(saved)) return saved.filter(c => ALERT_CURRENCIES.includes(c));
+  } catch (e) {
+    // Fall through to the default
+  }
+  return ALERT_CURRENCIES;
+};
 
 const NotificationToggle = () => {
   const [isSubscribed, setIsSubscribed] = useState(false);
   const [loading, setLoading] = useState(false);
   const [notification, setNotification] = useState({title: '', body: ''});
+  const [alertCurrencies, setAlertCurrencies] = useState(loadAlertCurrencies);
 
   useEffect(() => {
     // Don't initialize if Firebase is not configured
@@ -51,6 +67,18 @@ const NotificationToggle = () => {
     setLoading(false);
   };
 
+  const toggleCurrency = async (currency) => {
+    const next = alertCurrencies.includes(currency)
+      ? alertCurrencies.filter(c => c !== currency)
+      : ALERT_CURRENCIES.filter(c => c === currency || alertCurrencies.includes(c));
+    setAlertCurrencies(next);
+    localStorage.setItem(TOPICS_STORAGE_KEY, JSON.stringify(next));
+    const topics = next.flatMap(c => ALERT_DIRECTIONS.map(d => `${c}_${d}`));
+    if (!(await updateAlertTopics(topics))) {
+      console.warn('Could not save alert topics');
+    }
+  };
+
   // Don't render if Firebase is not configured
   if (!isFirebaseConfigured) {
     return null;
@@ -71,6 +99,26 @@ const NotificationToggle = () => {
         >
             {loading ? 'PROCESSING...' : (isSubscribed ? '🔕 DISABLE ALERTS' : '🔔 ENABLE ALERTS')}
         </button>
+        {isSubscribed && (
+            <div style={{ marginTop: '0.5rem', display: 'flex', gap: '0.25rem', justifyContent: 'flex-end' }}>
+                {ALERT_CURRENCIES.map(currency => (
+                    <button
+                        key={currency}
+                        onClick={() => toggleCurrency(currency)}
+                        className="brutal-btn"
+                        aria-pressed={alertCurrencies.includes(currency)}
+                        style={{
+                            fontSize: '0.7rem',
+                            padding: '0.25rem 0.5rem',
+                            backgroundColor: alertCurrencies.includes(currency) ? 'var(--accent-cyan)' : 'var(--card-bg)',
+                            color: 'var(--text-color)'
+                        }}
+                    >
+                        {currency.toUpperCase()}
+                    </button>
+                ))}
+            </div>
+        )}
         {notification.title && (
             <div style={{
                 position: 'fixed',
@@ -1,7 +1,7 @@
 // Import the functions you need from the SDKs you need
 import { initializeApp } from "firebase/app";
 import { getMessaging, getToken, onMessage } from "firebase/messaging";
-import { getFirestore, doc, setDoc, deleteDoc } from "firebase/firestore";
+import { getFirestore, doc, setDoc, serverTimestamp } from "firebase/firestore";
 
 // Your web app's Firebase configuration
 const firebaseConfig = {
@@ -36,12 +36,15 @@ export const requestForToken = async () => {
       console.log('current token for client: ', currentToken);
 
       // Use the token as the document ID for efficiency and security
-      // setDoc checks for existence or overwrites, which is fine here
+      // merge keeps the alert topics the device picked
+      // updatedAt is the server's clock: the scraper's token cache syncs
+      // incrementally on it (scripts/token_cache.py)
       await setDoc(doc(db, "fcm_tokens", currentToken), {
         token: currentToken,
         createdAt: new Date(),
-        updatedAt: new Date()
-      });
+        updatedAt: serverTimestamp(),
+        deleted: false
+      }, { merge: true });
       console.log("Token added/updated in Firestore");
 
       return currentToken;
@@ -77,8 +80,12 @@ export const unsubscribeUser = async () => {
     try {
         const currentToken = await getToken(messaging, { vapidKey: import.meta.env.VITE_FIREBASE_VAPID_KEY });
         if (currentToken) {
-             // Directly delete the document using the token as ID
-             await deleteDoc(doc(db, "fcm_tokens", currentToken));
+             // Tombstone instead of deleting, so incremental syncs see the removal
+             await setDoc(doc(db, "fcm_tokens", currentToken), {
+               token: currentToken,
+               deleted: true,
+               updatedAt: serverTimestamp()
+             }, { merge: true });
              console.log("Token removed from Firestore");
              return true;
         }
@@ -88,4 +95,27 @@ export const unsubscribeUser = async () => {
     }
 }
 
+// Alerts are published per topic, e.g. "usd_buy_up" or "eur_sell_down"
+// (scripts/push_topics.py). Devices that never call this get every topic.
+export const updateAlertTopics = async (topics) => {
+    if (!isFirebaseConfigured) {
+      return false;
+    }
+
+    try {
+        const currentToken = await getToken(messaging, { vapidKey: import.meta.env.VITE_FIREBASE_VAPID_KEY });
+        if (currentToken) {
+             await setDoc(doc(db, "fcm_tokens", currentToken), {
+               token: currentToken,
+               topics,
+               updatedAt: serverTimestamp()
+             }, { merge: true });
+             return true;
+        }
+    } catch(err) {
+        console.error("Error updating alert topics:", err);
+    }
+    return false;
+}
+
 export { isFirebaseConfigured };
@@ -10,6 +10,39 @@ const LIVE_RATES_URL = `https://raw.githubusercontent.com/${REPO_NAME}/rates-dat
 
 const isLocalDev = window.location.hostname === 'localhost' || window.location.hostname === '127.0.0.1';
 
+// Slow scopes (savings, news, all) answer 202 with a job to poll
+const REFRESH_POLL_INTERVAL_MS = 2000;
+const REFRESH_POLL_TIMEOUT_MS = 5 * 60 * 1000;
+
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+/**
+ * Polls a refresh job started with 202 until it is done or failed
+ * @param {Object} job - The 202 response body (job_id, status_url, status)
+ * @returns {Promise<string>} Final job status ('done', 'failed' or 'timeout')
+ */
+async function waitForRefreshJob(job) {
+  const statusUrl = job.status_url || `/api/refresh/${job.job_id}`;
+  const deadline = Date.now() + REFRESH_POLL_TIMEOUT_MS;
+  let status = job.status;
+
+  while (status === 'running' && Date.now() < deadline) {
+    await sleep(REFRESH_POLL_INTERVAL_MS);
+    try {
+      const response = await fetch(statusUrl);
+      if (response.status === 404) {
+        // The service restarted and forgot the job; nothing left to wait for
+        return 'failed';
+      }
+      const body = await response.json();
+      status = body.status || (response.ok ? status : 'failed');
+    } catch (err) {
+      // Keep polling through transient errors until the deadline
+    }
+  }
+  return status === 'running' ? 'timeout' : status;
+}
+
 /**
  * Refreshes the exchange rate data by fetching the latest rates.json
  * In dev mode: Local file first (fresher data from scraper), fallback to remote
@@ -26,8 +59,22 @@ export async function refreshRates(scope = 'exchange') {
           headers: { 'Content-Type': 'application/json' },
           body: JSON.stringify({ scope })
         });
-        if (triggerResponse.ok) {
+        if (triggerResponse.status === 429) {
+          // Refreshed moments ago; the current rates.json is already fresh
+          const retryAfter = triggerResponse.headers.get('Retry-After');
+          console.log(`Refresh rate limited, using the last run (retry in ${retryAfter}s).`);
+        } else if (triggerResponse.status === 202) {
+          const job = await triggerResponse.json();
+          const status = await waitForRefreshJob(job);
+          if (status === 'done') {
+            console.log('Backend scraper finished successfully.');
+          } else {
+            console.warn(`Backend refresh ${job.job_id} ended with status: ${status}`);
+          }
+        } else if (triggerResponse.ok) {
           console.log('Backend scraper triggered successfully.');
+        } else {
+          console.warn(`Backend refresh failed with status ${triggerResponse.status}`);
         }
       } catch (err) {
         // Ignore if backend is missing